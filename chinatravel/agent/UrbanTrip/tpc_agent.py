@@ -30,17 +30,16 @@ from agent.tpc_agent.utils import (
 
 # from chinatravel.eval.utils import load_json_file, validate_json, save_json_file
 from chinatravel.data.load_datasets import load_json_file, save_json_file
-from chinatravel.agent.utils import Logger
-from chinatravel.symbol_verification.commonsense_constraint import (
-    func_commonsense_constraints,
-)
+from chinatravel.agent.utils import DEBUG, open_query_log
+from chinatravel.agent.search_state import SearchState
+from chinatravel.symbol_verification.commonsense_constraint import IncrementalCommonsense
 from chinatravel.symbol_verification.hard_constraint import (
     get_symbolic_concepts,
     evaluate_constraints,
     evaluate_constraints_py,
 )
 from chinatravel.symbol_verification.preference import evaluate_preference_py
-from chinatravel.environment.tools.poi.apis import Poi
+from chinatravel.environment.tools.registry import get_tool
 
 from agent.nesy_verifier.verifier.commonsense_constraint_nl import collect_commonsense_constraints_error
 from agent.nesy_verifier.verifier.personal_constraint_nl import collect_personal_error
@@ -62,7 +61,7 @@ class UrbanTrip(BaseAgent):
         self.memory = {}
         self.TIME_CUT = 60 * 5 - 10
         self.debug = kwargs.get("debug", False)
-        self.poi_search = Poi()
+        self.poi_search = get_tool("poi")
 
         self.visited_attractions = set()
         self.visited_restaurants = set()
@@ -76,18 +75,9 @@ class UrbanTrip(BaseAgent):
         if not os.path.exists(self.log_dir):
             os.makedirs(self.log_dir)
 
-        sys.stdout = Logger(
-            "{}/{}.log".format(
-                self.log_dir, query["uid"]
-            ),
-            sys.stdout,
-            self.debug,
-        )
-        sys.stderr = Logger(
-            "{}/{}.error".format(
-                self.log_dir, query["uid"]
-            ),
-            sys.stderr,
+        self.log = open_query_log(
+            "{}/{}.log".format(self.log_dir, query["uid"]),
+            "{}/{}.error".format(self.log_dir, query["uid"]),
             self.debug,
         )
 
@@ -107,7 +97,7 @@ class UrbanTrip(BaseAgent):
             if self.least_plan_logic is not None:
                 plan_out = self.least_plan_logic
 
-                print("The least plan with logic constraints: ", plan_out)
+                self.log.info("The least plan with logic constraints: ", plan_out)
                 succ = True
 
             elif self.least_plan_comm is not None:
@@ -163,6 +153,9 @@ class UrbanTrip(BaseAgent):
         self.search_nodes = 0  # 搜索节点计数
         self.backtrack_count = 0  # 回溯计数
 
+        self.commonsense = IncrementalCommonsense(query)
+        # 计划的累计花费、已访问的 POI 及每天的活动类型
+        self.search_state = SearchState(self.memory["attractions"], self.memory["restaurants"])
         self.constraints_validation_count = 0  # 约束验证计数
         self.commonsense_pass_count = 0  # 常识通过计数
         self.logical_pass_count = 0  # 逻辑通过计数
@@ -250,24 +243,24 @@ class UrbanTrip(BaseAgent):
         source_city = query["start_city"] # 获取出发城市
         target_city = query["target_city"] # 获取目标城市
 
-        print(source_city, "->", target_city)
+        self.log.info(source_city, "->", target_city)
 
-        print("User's Constraints:")
-        print(query['nature_language'])
+        self.log.info("User's Constraints:")
+        self.log.info(query['nature_language'])
 
-        print("Formatted Expression:")
+        self.log.info("Formatted Expression:")
         for key, value in constraints_json.items():
             if value is not None:
-                print(f"{key}: {value}")
+                self.log.info(f"{key}: {value}")
 
-        print("By list:")
-        print(f"{self.requirement_list}")
+        self.log.info("By list:")
+        self.log.info(f"{self.requirement_list}")
 
         query_room_number = self.room_number
         query_room_numbed = self.bed_number
 
-        print(f"query room number: {query_room_number}")
-        print(f"query room numbed: {query_room_numbed}")
+        self.log.info(f"query room number: {query_room_number}")
+        self.log.info(f"query room numbed: {query_room_numbed}")
 
         # 收集去程和返程的城际火车交通选项
         train_go = self.collect_intercity_transport(source_city, target_city, "train")
@@ -317,19 +310,19 @@ class UrbanTrip(BaseAgent):
 
         # 打印调试信息，显示交通选项数量
         if self.debug:
-            print(
+            self.log.info(
                 "from {} to {}: {} flights, {} trains".format(
                     source_city, target_city, flight_go_num, train_go_num
                 )
             )
-            print(
+            self.log.info(
                 "from {} to {}: {} flights, {} trains".format(
                     target_city, source_city, flight_back_num, train_back_num
                 )
             )
 
-            print(go_info.head())
-            print(back_info.head())
+            self.log.info(go_info.head())
+            self.log.info(back_info.head())
 
         # 对去程城际交通进行排序
         ranking_go = self.ranking_intercity_transport_go(go_info, query)
@@ -387,7 +380,7 @@ class UrbanTrip(BaseAgent):
                     if self.intercity_budget is not None and self.intercity_budget < self.intercity_cost:
                         intercity_budget_count += 1
                         print(f"{intercity_budget_msg}（{intercity_budget_count}次）".ljust(80), end='\r', flush=True)
-                        print("intercity budget not satisfied, backtrack...")
+                        self.log.info("intercity budget not satisfied, backtrack...")
                         self.backtrack_count += 1
                         continue
 
@@ -409,7 +402,7 @@ class UrbanTrip(BaseAgent):
                         if not self.too_many_backtrack:
                             if query_room_numbed != None and query_room_numbed != room_type:
                                 self.backtrack_count += 1
-                                print("room_type not match, backtrack...")
+                                self.log.info("room_type not match, backtrack...")
                                 continue
 
                         # 如果查询中指定了房间数量，则使用该数量
@@ -451,10 +444,10 @@ class UrbanTrip(BaseAgent):
                             self.overall_cost = self.intercity_cost + self.hotel_cost
                             if self.overall_budget is not None and self.overall_budget < self.overall_cost:
                                 self.backtrack_count += 1
-                                print("overall cost < intercity + hotel, backtrack...")
+                                self.log.info("overall cost < intercity + hotel, backtrack...")
                                 continue
 
-                        print("search: ...")
+                        self.log.info("search: ...")
                         # 尝试通过 DFS 搜索 POI 计划
                         try:
                             success, plan = self.dfs_poi(
@@ -465,7 +458,7 @@ class UrbanTrip(BaseAgent):
                                 current_position="",
                             )
                         except TimeOutError as e:
-                            print("TimeOutError")
+                            self.log.info("TimeOutError")
                             return False, {"error_info": "TimeOutError"}
                         # exit(0)
 
@@ -478,9 +471,9 @@ class UrbanTrip(BaseAgent):
                                 return True, self.default_plan
 
                             self.backtrack_count += 1
-                            print("search failed given the intercity-transport and hotels, backtrack...")
+                            self.log.info("search failed given the intercity-transport and hotels, backtrack...")
                     # 都不满足，则从所有酒店中选
-                    print("No Hotel satisfies constraint")
+                    self.log.info("No Hotel satisfies constraint")
                     rnbc = 0 # room number bed count
                     ohbc = 0 # over hotel budget count
                     oobc = 0 # over overall budget count
@@ -500,7 +493,7 @@ class UrbanTrip(BaseAgent):
                             if query_room_numbed != None and query_room_numbed != room_type:
                                 self.backtrack_count += 1
                                 rnbc += 1
-                                print("room_type not match, backtrack...")
+                                self.log.info("room_type not match, backtrack...")
                                 continue
 
                         # 如果查询中指定了房间数量，则使用该数量
@@ -544,10 +537,10 @@ class UrbanTrip(BaseAgent):
                             if self.overall_budget is not None and self.overall_budget < self.overall_cost:
                                 self.backtrack_count += 1
                                 oobc += 1
-                                print("overall cost < intercity + hotel, backtrack...")
+                                self.log.info("overall cost < intercity + hotel, backtrack...")
                                 continue
 
-                        print("search: ...")
+                        self.log.info("search: ...")
                         # 尝试通过 DFS 搜索 POI 计划
                         try:
                             success, plan = self.dfs_poi(
@@ -558,7 +551,7 @@ class UrbanTrip(BaseAgent):
                                 current_position="",
                             )
                         except TimeOutError as e:
-                            print("TimeOutError")
+                            self.log.info("TimeOutError")
                             return False, {"error_info": "TimeOutError"}
                         # exit(0)
 
@@ -572,7 +565,7 @@ class UrbanTrip(BaseAgent):
                                 return True, self.default_plan
 
                             self.backtrack_count += 1
-                            print("search failed given the intercity-transport and hotels, backtrack...")
+                            self.log.info("search failed given the intercity-transport and hotels, backtrack...")
                     # 放弃约束
                     if rnbc == len(default_hotel) or ohbc == len(default_hotel) or oobc == len(default_hotel):
                         for hotel_i in default_hotel:
@@ -590,7 +583,7 @@ class UrbanTrip(BaseAgent):
                                 if query_room_numbed != None and query_room_numbed != room_type:
                                     self.backtrack_count += 1
                                     rnbc += 1
-                                    print("room_type not match, backtrack...")
+                                    self.log.info("room_type not match, backtrack...")
                                     continue
 
                             # 如果查询中指定了房间数量，则使用该数量
@@ -633,10 +626,10 @@ class UrbanTrip(BaseAgent):
                                 if self.overall_budget is not None and self.overall_budget < self.overall_cost:
                                     self.backtrack_count += 1
                                     oobc += 1
-                                    print("overall cost < intercity + hotel, backtrack...")
+                                    self.log.info("overall cost < intercity + hotel, backtrack...")
                                     continue
 
-                            print("search: ...")
+                            self.log.info("search: ...")
                             # 尝试通过 DFS 搜索 POI 计划
                             try:
                                 success, plan = self.dfs_poi(
@@ -647,7 +640,7 @@ class UrbanTrip(BaseAgent):
                                     current_position="",
                                 )
                             except TimeOutError as e:
-                                print("TimeOutError")
+                                self.log.info("TimeOutError")
                                 return False, {"error_info": "TimeOutError"}
                             # exit(0)
 
@@ -660,7 +653,7 @@ class UrbanTrip(BaseAgent):
                                     return True, self.default_plan
 
                                 self.backtrack_count += 1
-                                print("search failed given the intercity-transport and hotels, backtrack...")
+                                self.log.info("search failed given the intercity-transport and hotels, backtrack...")
 
                 else:  # 如果旅行天数只有 1 天，则不需要考虑酒店
                     self.hotel_cost = 0
@@ -670,7 +663,7 @@ class UrbanTrip(BaseAgent):
                             poi_plan["go_transport"]["EndTime"],
                     ):
                         self.backtrack_count += 1
-                        print("back_transport BeginTime earlier than go_transport EndTime, backtrack...")
+                        self.log.info("back_transport BeginTime earlier than go_transport EndTime, backtrack...")
                         continue
 
                     # 计算城际交通的总成本（无酒店）
@@ -678,10 +671,10 @@ class UrbanTrip(BaseAgent):
                         self.intercity_cost = poi_plan["go_transport"]["Cost"] + poi_plan["back_transport"]["Cost"] * query["people_number"]
                         if self.intercity_budget is not None and self.intercity_budget < self.intercity_cost:
                             self.backtrack_count += 1
-                            print("[one-day-trip]intercity budget < cost, backtrack...")
+                            self.log.info("[one-day-trip]intercity budget < cost, backtrack...")
                             continue
 
-                    print("search: ...")
+                    self.log.info("search: ...")
                     # 尝试通过 DFS 搜索 POI 计划
                     try:
                         success, plan = self.dfs_poi(
@@ -692,7 +685,7 @@ class UrbanTrip(BaseAgent):
                             current_position="",
                         )
                     except TimeOutError as e:
-                        print("TimeOutError")
+                        self.log.info("TimeOutError")
                         return False, {"error_info": "TimeOutError"}
 
                     # print(success, plan)
@@ -704,18 +697,18 @@ class UrbanTrip(BaseAgent):
                             return True, self.default_plan
 
                         self.backtrack_count += 1
-                        print("search failed given the intercity-transport and hotels, backtrack...")
+                        self.log.info("search failed given the intercity-transport and hotels, backtrack...")
 
         return False, {"error_info": "No solution found."}
 
     def dfs_poi(self, query, poi_plan, plan, current_time, current_position, current_day=0):
-        print("----------------------------------calling dfs_poi-----------------------------------------")
+        self.log.debug("----------------------------------calling dfs_poi-----------------------------------------")
         # print(f"plan: {plan}")
-        print(f"current_day: {current_day}")
-        print(f"current_time: {current_time}")
-        print(f"current_position: {current_position}")
+        self.log.debug(f"current_day: {current_day}")
+        self.log.debug(f"current_time: {current_time}")
+        self.log.debug(f"current_position: {current_position}")
 
-        print(self.backtrack_count)
+        self.log.debug(self.backtrack_count)
         # if self.backtrack_count > 5800 or time.time() - self.time_before_search + 20 > self.TIME_CUT + self.llm_inference_time_count:
         #     self.too_many_backtrack = True
         if time.time() - self.time_before_search + 20 > self.TIME_CUT + self.llm_inference_time_count:
@@ -727,7 +720,7 @@ class UrbanTrip(BaseAgent):
                 self.all_satisfy_flag = True
             if backtrack:
                 self.backtrack_count += 1
-                print("requirements can not be satisfied, backtrack...")
+                self.log.debug("requirements can not be satisfied, backtrack...")
                 return False, plan
 
         self.search_nodes += 1
@@ -741,11 +734,11 @@ class UrbanTrip(BaseAgent):
             return True, self.default_plan
 
         # 检查当前时间是否太晚，无法前往酒店或返程交通
-        print("check if too late")
+        self.log.debug("check if too late")
         if not self.too_many_backtrack:
             if self.check_if_too_late(query, current_day, current_time, current_position, poi_plan):
                 self.backtrack_count += 1
-                print("The current time is too late to go hotel or back-transport, backtrack...")
+                self.log.debug("The current time is too late to go hotel or back-transport, backtrack...")
                 return False, plan
 
         # 处理第一天的去程城际交通
@@ -759,7 +752,7 @@ class UrbanTrip(BaseAgent):
                 tickets=self.query["people_number"],
             )
 
-            print(plan)
+            self.log.debug(plan)
 
             new_time = poi_plan["go_transport"]["EndTime"]  # 更新当前时间为去程交通的结束时间
             new_position = poi_plan["go_transport"]["To"]  # 更新当前位置为目的地（车站）
@@ -771,7 +764,7 @@ class UrbanTrip(BaseAgent):
                 return True, plan
             else:
                 self.backtrack_count += 1
-                print("No solution for the given Go Transport, backtrack...")
+                self.log.debug("No solution for the given Go Transport, backtrack...")
                 return False, plan
 
         # breakfast
@@ -800,18 +793,14 @@ class UrbanTrip(BaseAgent):
                 candidates_type.append("back-intercity-transport")
             else:
                 self.backtrack_count += 1
-                print("No solution for the given Breakfast, backtrack...")
+                self.log.debug("No solution for the given Breakfast, backtrack...")
                 return False, plan
         elif current_time == "00:00" and current_day == query["days"] - 1 and time_compare_if_earlier_equal(poi_plan["back_transport"]["BeginTime"], "11:30"):
             candidates_type = ["back-intercity-transport"]
         else:  # 如果当前时间不是 "00:00"，说明一天已经开始
-            haved_lunch_today, haved_dinner_today = False, False
-
-            for act_i in plan[current_day]["activities"]:
-                if act_i["type"] == "lunch":
-                    haved_lunch_today = True  # 更新午餐状态
-                if act_i["type"] == "dinner":
-                    haved_dinner_today = True  # 更新晚餐状态
+            self.search_state.sync(plan)
+            haved_lunch_today = self.search_state.has_activity(current_day, "lunch")
+            haved_dinner_today = self.search_state.has_activity(current_day, "dinner")
             if time_compare_if_earlier_equal("20:30", current_time):
                 candidates_type = []
             else:
@@ -829,7 +818,7 @@ class UrbanTrip(BaseAgent):
             if current_day == query["days"] - 1 and current_time != "":
                 candidates_type.append("back-intercity-transport")
 
-        print("candidates_type: ", candidates_type)  # 当前可选择的 POI 类型
+        self.log.debug("candidates_type: ", candidates_type)  # 当前可选择的 POI 类型
 
         # 当还有候选类型时
         while len(candidates_type) > 0:
@@ -842,7 +831,7 @@ class UrbanTrip(BaseAgent):
                 current_position,
             )
 
-            print("POI planning, day {} {}, {}, next-poi type: {}".format(current_day, current_time, current_position, poi_type))
+            self.log.debug("POI planning, day {} {}, {}, next-poi type: {}".format(current_day, current_time, current_position, poi_type))
 
             # 如果下一个 POI 类型是返程城际交通
             if poi_type == "back-intercity-transport":
@@ -860,7 +849,7 @@ class UrbanTrip(BaseAgent):
                 for trans_type_sel in transports_ranking:
                     self.search_nodes += 1
                     # 收集市内交通选项，从当前位置到返程交通的出发地
-                    print("collecting innercity transport to back-transport")
+                    self.log.debug("collecting innercity transport to back-transport")
                     transports_sel = self.collect_innercity_transport(
                         query["target_city"],
                         current_position,
@@ -871,7 +860,7 @@ class UrbanTrip(BaseAgent):
                     # 没找到则回溯
                     if not isinstance(transports_sel, list):
                         self.backtrack_count += 1
-                        print("inner-city transport error, backtrack...")
+                        self.log.debug("inner-city transport error, backtrack...")
                         continue
 
                     if len(transports_sel) == 0:
@@ -882,7 +871,7 @@ class UrbanTrip(BaseAgent):
                     if not self.too_many_backtrack:
                         if not time_compare_if_earlier_equal(arrived_time, poi_plan["back_transport"]["BeginTime"]):
                             self.backtrack_count += 1
-                            print("Fail to catch the back transport")
+                            self.log.debug("Fail to catch the back transport")
                             continue
 
                     backtrack_flag = False
@@ -898,11 +887,11 @@ class UrbanTrip(BaseAgent):
                         for rule in self.transport_rules_by_distance:
                             if rule["min_distance"] is not None:
                                 if distance > rule["min_distance"] and mode not in rule["transport_type"]:
-                                    print("backtrack")
+                                    self.log.debug("backtrack")
                                     backtrack_flag = True
                             if rule["max_distance"] is not None:
                                 if distance < rule["max_distance"] and mode not in rule["transport_type"]:
-                                    print("backtrack")
+                                    self.log.debug("backtrack")
                                     backtrack_flag = True
                     if backtrack_flag and not self.too_many_backtrack:
                         self.backtrack_count += 1
@@ -947,7 +936,7 @@ class UrbanTrip(BaseAgent):
                         arrived_time = current_time
                     else:
                         # 收集市内交通选项，从当前位置到酒店
-                        print("collecting innercity transport to hotel")
+                        self.log.debug("collecting innercity transport to hotel")
                         transports_sel = self.collect_innercity_transport(
                             query["target_city"],
                             current_position,
@@ -958,7 +947,7 @@ class UrbanTrip(BaseAgent):
                         # 没找到则回溯
                         if not isinstance(transports_sel, list):
                             self.backtrack_count += 1
-                            print("inner-city transport error, backtrack...")
+                            self.log.debug("inner-city transport error, backtrack...")
                             continue
 
                         if len(transports_sel) == 0:
@@ -979,11 +968,11 @@ class UrbanTrip(BaseAgent):
                             for rule in self.transport_rules_by_distance:
                                 if rule["min_distance"] is not None:
                                     if distance > rule["min_distance"] and mode not in rule["transport_type"]:
-                                        print("backtrack")
+                                        self.log.debug("backtrack")
                                         backtrack_flag = True
                                 if rule["max_distance"] is not None:
                                     if distance < rule["max_distance"] and mode not in rule["transport_type"]:
-                                        print("backtrack")
+                                        self.log.debug("backtrack")
                                         backtrack_flag = True
                         if backtrack_flag and not self.too_many_backtrack:
                             self.backtrack_count += 1
@@ -1024,7 +1013,7 @@ class UrbanTrip(BaseAgent):
                         return True, plan
 
                     self.backtrack_count += 1
-                    print("Fail with the given accommodation activity, backtrack...")
+                    self.log.debug("Fail with the given accommodation activity, backtrack...")
 
                     plan[current_day]["activities"].pop()
 
@@ -1055,7 +1044,7 @@ class UrbanTrip(BaseAgent):
                         found_types = candidate_res_list["cuisine"].unique()
                         missing_types = [t for t in self.must_visit_restaurant_type if t not in found_types]
                         if missing_types:
-                            print(f"[Warning] must visit restaurant type:{missing_types} is not in candidates")
+                            self.log.debug(f"[Warning] must visit restaurant type:{missing_types} is not in candidates")
 
                     # 过滤掉已经访问过的
                     candidate_res_list = candidate_res_list.drop(index=self.restaurants_visiting, errors="ignore")
@@ -1135,7 +1124,7 @@ class UrbanTrip(BaseAgent):
                                 )
                                 if not isinstance(transports_sel, list):
                                     self.backtrack_count += 1
-                                    print("inner-city transport error, backtrack...")
+                                    self.log.debug("inner-city transport error, backtrack...")
                                     continue
 
                                 if len(transports_sel) == 0:
@@ -1155,7 +1144,7 @@ class UrbanTrip(BaseAgent):
                                         closed = False
                                     if closed:
                                         self.backtrack_count += 1
-                                        print("The restaurant is closed now...")
+                                        self.log.debug("The restaurant is closed now...")
                                         continue
 
                                 backtrack_flag = False
@@ -1171,11 +1160,11 @@ class UrbanTrip(BaseAgent):
                                     for rule in self.transport_rules_by_distance:
                                         if rule["min_distance"] is not None:
                                             if distance > rule["min_distance"] and mode not in rule["transport_type"]:
-                                                print("backtrack")
+                                                self.log.debug("backtrack")
                                                 backtrack_flag = True
                                         if rule["max_distance"] is not None:
                                             if distance < rule["max_distance"] and mode not in rule["transport_type"]:
-                                                print("backtrack")
+                                                self.log.debug("backtrack")
                                                 backtrack_flag = True
                                 if backtrack_flag and not self.too_many_backtrack:
                                     self.backtrack_count += 1
@@ -1207,13 +1196,13 @@ class UrbanTrip(BaseAgent):
                                             arrive_type, arrive_time = arrive_info
                                             if arrive_type == "early":  # 要求早于某个时间
                                                 if not time_compare_if_earlier_equal(act_start_time, arrive_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Arrival for {poi_sel['name']} too late: {act_start_time} > {arrive_time}")
                                                     self.backtrack_count += 1
                                                     continue
                                             elif arrive_type == "late":  # 要求晚于某个时间
                                                 if not time_compare_if_earlier_equal(arrive_time, act_start_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Arrival for {poi_sel['name']} too early: {act_start_time} < {arrive_time}")
                                                     self.backtrack_count += 1
                                                     continue
@@ -1225,13 +1214,13 @@ class UrbanTrip(BaseAgent):
                                             leave_type, leave_time = leave_info
                                             if leave_type == "early":  # 要求早于某个时间离开
                                                 if not time_compare_if_earlier_equal(act_end_time, leave_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Leaving {poi_sel['name']} too late: {act_end_time} > {leave_time}")
                                                     self.backtrack_count += 1
                                                     continue
                                             elif leave_type == "late":  # 要求晚于某个时间离开
                                                 if not time_compare_if_earlier_equal(leave_time, act_end_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Leaving {poi_sel['name']} too early: {act_end_time} < {leave_time}")
                                                     self.backtrack_count += 1
                                                     continue
@@ -1247,10 +1236,10 @@ class UrbanTrip(BaseAgent):
                                     )
                                     pn = poi_sel["name"]
                                     pc = poi_sel["cuisine"]
-                                    print(f"add restaurant: {pn}, type: {pc}")
+                                    self.log.debug(f"add restaurant: {pn}, type: {pc}")
                                 except:
                                     self.backtrack_count += 1
-                                    print("add_restaurant failed, backtrack...")
+                                    self.log.debug("add_restaurant failed, backtrack...")
                                     continue
 
                                 new_time = plan[current_day]["activities"][-1]["end_time"]  # 更新当前时间为餐厅结束时间
@@ -1275,7 +1264,7 @@ class UrbanTrip(BaseAgent):
                                     return True, plan
                                 # 回溯
                                 self.backtrack_count += 1
-                                print("add_restaurant failed, backtrack...")
+                                self.log.debug("add_restaurant failed, backtrack...")
 
                                 plan[current_day]["activities"].pop()
                                 self.restaurants_visiting.pop()
@@ -1310,7 +1299,7 @@ class UrbanTrip(BaseAgent):
                                 )
                                 if not isinstance(transports_sel, list):
                                     self.backtrack_count += 1
-                                    print("inner-city transport error, backtrack...")
+                                    self.log.debug("inner-city transport error, backtrack...")
                                     continue
 
                                 if len(transports_sel) == 0:
@@ -1330,7 +1319,7 @@ class UrbanTrip(BaseAgent):
                                         closed = False
                                     if closed:
                                         self.backtrack_count += 1
-                                        print("The restaurant is closed now...")
+                                        self.log.debug("The restaurant is closed now...")
                                         continue
 
                                 backtrack_flag = False
@@ -1346,11 +1335,11 @@ class UrbanTrip(BaseAgent):
                                     for rule in self.transport_rules_by_distance:
                                         if rule["min_distance"] is not None:
                                             if distance > rule["min_distance"] and mode not in rule["transport_type"]:
-                                                print("backtrack")
+                                                self.log.debug("backtrack")
                                                 backtrack_flag = True
                                         if rule["max_distance"] is not None:
                                             if distance < rule["max_distance"] and mode not in rule["transport_type"]:
-                                                print("backtrack")
+                                                self.log.debug("backtrack")
                                                 backtrack_flag = True
                                 if backtrack_flag and not self.too_many_backtrack:
                                     self.backtrack_count += 1
@@ -1381,13 +1370,13 @@ class UrbanTrip(BaseAgent):
                                             arrive_type, arrive_time = arrive_info
                                             if arrive_type == "early":  # 要求早于某个时间
                                                 if not time_compare_if_earlier_equal(act_start_time, arrive_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Arrival for {poi_sel['name']} too late: {act_start_time} > {arrive_time}")
                                                     self.backtrack_count += 1
                                                     continue
                                             elif arrive_type == "late":  # 要求晚于某个时间
                                                 if not time_compare_if_earlier_equal(arrive_time, act_start_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Arrival for {poi_sel['name']} too early: {act_start_time} < {arrive_time}")
                                                     self.backtrack_count += 1
                                                     continue
@@ -1399,13 +1388,13 @@ class UrbanTrip(BaseAgent):
                                             leave_type, leave_time = leave_info
                                             if leave_type == "early":  # 要求早于某个时间离开
                                                 if not time_compare_if_earlier_equal(act_end_time, leave_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Leaving {poi_sel['name']} too late: {act_end_time} > {leave_time}")
                                                     self.backtrack_count += 1
                                                     continue
                                             elif leave_type == "late":  # 要求晚于某个时间离开
                                                 if not time_compare_if_earlier_equal(leave_time, act_end_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Leaving {poi_sel['name']} too early: {act_end_time} < {leave_time}")
                                                     self.backtrack_count += 1
                                                     continue
@@ -1422,10 +1411,10 @@ class UrbanTrip(BaseAgent):
                                     )
                                     pn = poi_sel["name"]
                                     pc = poi_sel["cuisine"]
-                                    print(f"add restaurant: {pn}, type: {pc}")
+                                    self.log.debug(f"add restaurant: {pn}, type: {pc}")
                                 except:
                                     self.backtrack_count += 1
-                                    print("add_restaurant failed, backtrack...")
+                                    self.log.debug("add_restaurant failed, backtrack...")
                                     continue
 
                                 new_time = plan[current_day]["activities"][-1]["end_time"]  # 更新当前时间为餐厅结束时间
@@ -1450,7 +1439,7 @@ class UrbanTrip(BaseAgent):
                                     return True, plan
                                 # 回溯
                                 self.backtrack_count += 1
-                                print("add_restaurant failed, backtrack...")
+                                self.log.debug("add_restaurant failed, backtrack...")
 
                                 plan[current_day]["activities"].pop()
                                 self.restaurants_visiting.pop()
@@ -1480,7 +1469,7 @@ class UrbanTrip(BaseAgent):
                             )
                             if not isinstance(transports_sel, list):
                                 self.backtrack_count += 1
-                                print("inner-city transport error, backtrack...")
+                                self.log.debug("inner-city transport error, backtrack...")
                                 continue
 
                             if len(transports_sel) == 0:
@@ -1500,7 +1489,7 @@ class UrbanTrip(BaseAgent):
                                     closed = False
                                 if closed:
                                     self.backtrack_count += 1
-                                    print("The restaurant is closed now...")
+                                    self.log.debug("The restaurant is closed now...")
                                     continue
 
                             backtrack_flag = False
@@ -1516,11 +1505,11 @@ class UrbanTrip(BaseAgent):
                                 for rule in self.transport_rules_by_distance:
                                     if rule["min_distance"] is not None:
                                         if distance > rule["min_distance"] and mode not in rule["transport_type"]:
-                                            print("backtrack")
+                                            self.log.debug("backtrack")
                                             backtrack_flag = True
                                     if rule["max_distance"] is not None:
                                         if distance < rule["max_distance"] and mode not in rule["transport_type"]:
-                                            print("backtrack")
+                                            self.log.debug("backtrack")
                                             backtrack_flag = True
                             if backtrack_flag and not self.too_many_backtrack:
                                 self.backtrack_count += 1
@@ -1552,13 +1541,13 @@ class UrbanTrip(BaseAgent):
                                         arrive_type, arrive_time = arrive_info
                                         if arrive_type == "early":  # 要求早于某个时间
                                             if not time_compare_if_earlier_equal(act_start_time, arrive_time):
-                                                print(
+                                                self.log.debug(
                                                     f"[Constraint] Arrival for {poi_sel['name']} too late: {act_start_time} > {arrive_time}")
                                                 self.backtrack_count += 1
                                                 continue
                                         elif arrive_type == "late":  # 要求晚于某个时间
                                             if not time_compare_if_earlier_equal(arrive_time, act_start_time):
-                                                print(
+                                                self.log.debug(
                                                     f"[Constraint] Arrival for {poi_sel['name']} too early: {act_start_time} < {arrive_time}")
                                                 self.backtrack_count += 1
                                                 continue
@@ -1570,13 +1559,13 @@ class UrbanTrip(BaseAgent):
                                         leave_type, leave_time = leave_info
                                         if leave_type == "early":  # 要求早于某个时间离开
                                             if not time_compare_if_earlier_equal(act_end_time, leave_time):
-                                                print(
+                                                self.log.debug(
                                                     f"[Constraint] Leaving {poi_sel['name']} too late: {act_end_time} > {leave_time}")
                                                 self.backtrack_count += 1
                                                 continue
                                         elif leave_type == "late":  # 要求晚于某个时间离开
                                             if not time_compare_if_earlier_equal(leave_time, act_end_time):
-                                                print(
+                                                self.log.debug(
                                                     f"[Constraint] Leaving {poi_sel['name']} too early: {act_end_time} < {leave_time}")
                                                 self.backtrack_count += 1
                                                 continue
@@ -1593,10 +1582,10 @@ class UrbanTrip(BaseAgent):
                                 )
                                 pn = poi_sel["name"]
                                 pc = poi_sel["cuisine"]
-                                print(f"add restaurant: {pn}, type: {pc}")
+                                self.log.debug(f"add restaurant: {pn}, type: {pc}")
                             except:
                                 self.backtrack_count += 1
-                                print("add_restaurant failed, backtrack...")
+                                self.log.debug("add_restaurant failed, backtrack...")
                                 continue
 
                             new_time = plan[current_day]["activities"][-1]["end_time"]  # 更新当前时间为餐厅结束时间
@@ -1621,7 +1610,7 @@ class UrbanTrip(BaseAgent):
                                 return True, plan
                             # 回溯
                             self.backtrack_count += 1
-                            print("add_restaurant failed, backtrack...")
+                            self.log.debug("add_restaurant failed, backtrack...")
 
                             plan[current_day]["activities"].pop()
                             self.restaurants_visiting.pop()
@@ -1660,7 +1649,7 @@ class UrbanTrip(BaseAgent):
                         found_types = candidate_attr_list["type"].unique()
                         missing_types = [t for t in self.must_see_attraction_type if t not in found_types]
                         if missing_types:
-                            print(f"[Warning] must see attraction type:{missing_types} is not in attraction candidates")
+                            self.log.debug(f"[Warning] must see attraction type:{missing_types} is not in attraction candidates")
 
                     # 过滤掉已经访问过的景点
                     candidate_attr_list = candidate_attr_list.drop(index=self.attractions_visiting, errors="ignore")
@@ -1678,11 +1667,11 @@ class UrbanTrip(BaseAgent):
 
                     # if not self.all_satisfy_flag and (self.overall_budget is not None or self.attraction_budget is not None):
                     if self.overall_budget is not None or self.attraction_budget is not None:
-                        print("sorted by price")
+                        self.log.debug("sorted by price")
                         # 有预算要求，按price从低到高排序
                         candidate_attr_ranked = candidate_attr_filtered.sort_values(by="price").reset_index(drop=True)
                     else:
-                        print("sorted by distance")
+                        self.log.debug("sorted by distance")
                         # 根据current_position计算距离景点的距离并排序
                         candidate_attr_filtered["distance"] = candidate_attr_filtered.apply(
                             lambda row: self.calculate_distance(
@@ -1744,7 +1733,7 @@ class UrbanTrip(BaseAgent):
                         for _, poi_sel in must_candidates.iterrows():
                             if poi_sel["name"] in self.attraction_names_visiting:
                                 continue
-                            print(f"lookahead to add attraction, candidate: {poi_sel['name']}")
+                            self.log.debug(f"lookahead to add attraction, candidate: {poi_sel['name']}")
                             # 临时添加至计划中，更新当前地点和时间
                             transports_ranking = self.innercity_transports_ranking
                             if self.transport_rules_by_distance is not None:
@@ -1763,7 +1752,7 @@ class UrbanTrip(BaseAgent):
                                 )
                                 if not isinstance(transports_sel, list):
                                     self.backtrack_count += 1
-                                    print("inner-city transport error, backtrack...")
+                                    self.log.debug("inner-city transport error, backtrack...")
                                     continue
 
                                 if len(transports_sel) == 0:
@@ -1779,7 +1768,7 @@ class UrbanTrip(BaseAgent):
                                 # it is closed ...
                                 if time_compare_if_earlier_equal(endtime, arrived_time):
                                     self.backtrack_count += 1
-                                    print(
+                                    self.log.debug(
                                         f"{poi_sel['name']} closed at {endtime}, start time: {current_time}, arrival time: {arrived_time}, backtrack...")
                                     continue
 
@@ -1796,11 +1785,11 @@ class UrbanTrip(BaseAgent):
                                     for rule in self.transport_rules_by_distance:
                                         if rule["min_distance"] is not None:
                                             if distance > rule["min_distance"] and mode not in rule["transport_type"]:
-                                                print("backtrack")
+                                                self.log.debug("backtrack")
                                                 backtrack_flag = True
                                         if rule["max_distance"] is not None:
                                             if distance < rule["max_distance"] and mode not in rule["transport_type"]:
-                                                print("backtrack")
+                                                self.log.debug("backtrack")
                                                 backtrack_flag = True
                                 if backtrack_flag and not self.too_many_backtrack:
                                     self.backtrack_count += 1
@@ -1828,13 +1817,13 @@ class UrbanTrip(BaseAgent):
                                             arrive_type, arrive_time = arrive_info
                                             if arrive_type == "early":  # 要求早于某个时间
                                                 if not time_compare_if_earlier_equal(act_start_time, arrive_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Arrival for {poi_sel['name']} too late: {act_start_time} > {arrive_time}")
                                                     self.backtrack_count += 1
                                                     continue
                                             elif arrive_type == "late":  # 要求晚于某个时间
                                                 if not time_compare_if_earlier_equal(arrive_time, act_start_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Arrival for {poi_sel['name']} too early: {act_start_time} < {arrive_time}")
                                                     self.backtrack_count += 1
                                                     continue
@@ -1846,13 +1835,13 @@ class UrbanTrip(BaseAgent):
                                             leave_type, leave_time = leave_info
                                             if leave_type == "early":  # 要求早于某个时间离开
                                                 if not time_compare_if_earlier_equal(act_end_time, leave_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Leaving {poi_sel['name']} too late: {act_end_time} > {leave_time}")
                                                     self.backtrack_count += 1
                                                     continue
                                             elif leave_type == "late":  # 要求晚于某个时间离开
                                                 if not time_compare_if_earlier_equal(leave_time, act_end_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Leaving {poi_sel['name']} too early: {act_end_time} < {leave_time}")
                                                     self.backtrack_count += 1
                                                     continue
@@ -1890,7 +1879,7 @@ class UrbanTrip(BaseAgent):
 
                                 pn = poi_sel["name"]
                                 pc = poi_sel["type"]
-                                print(f"add attraction: {pn}, type: {pc}")
+                                self.log.debug(f"add attraction: {pn}, type: {pc}")
 
                                 new_time = act_end_time  # 更新当前时间为活动结束时间
                                 new_position = poi_sel["name"]  # 更新当前位置为景点名称
@@ -1914,7 +1903,7 @@ class UrbanTrip(BaseAgent):
                                     return True, plan
 
                                 self.backtrack_count += 1
-                                print("add_attraction failed, backtrack...")
+                                self.log.debug("add_attraction failed, backtrack...")
 
                                 plan[current_day]["activities"].pop()
                                 self.attractions_visiting.pop()
@@ -1931,7 +1920,7 @@ class UrbanTrip(BaseAgent):
                                 continue
                             if poi_sel["type"] in self.spot_type_visiting:
                                 continue
-                            print(f"lookahead to add attraction, candidate: {poi_sel['name']}")
+                            self.log.debug(f"lookahead to add attraction, candidate: {poi_sel['name']}")
                             # 临时添加至计划中，更新当前地点和时间
                             transports_ranking = self.innercity_transports_ranking
                             if self.transport_rules_by_distance is not None:
@@ -1950,7 +1939,7 @@ class UrbanTrip(BaseAgent):
                                 )
                                 if not isinstance(transports_sel, list):
                                     self.backtrack_count += 1
-                                    print("inner-city transport error, backtrack...")
+                                    self.log.debug("inner-city transport error, backtrack...")
                                     continue
 
                                 if len(transports_sel) == 0:
@@ -1966,7 +1955,7 @@ class UrbanTrip(BaseAgent):
                                 # it is closed ...
                                 if time_compare_if_earlier_equal(endtime, arrived_time):
                                     self.backtrack_count += 1
-                                    print(
+                                    self.log.debug(
                                         f"{poi_sel['name']} closed at {endtime}, start time: {current_time}, arrival time: {arrived_time}, backtrack...")
                                     continue
 
@@ -1983,11 +1972,11 @@ class UrbanTrip(BaseAgent):
                                     for rule in self.transport_rules_by_distance:
                                         if rule["min_distance"] is not None:
                                             if distance > rule["min_distance"] and mode not in rule["transport_type"]:
-                                                print("backtrack")
+                                                self.log.debug("backtrack")
                                                 backtrack_flag = True
                                         if rule["max_distance"] is not None:
                                             if distance < rule["max_distance"] and mode not in rule["transport_type"]:
-                                                print("backtrack")
+                                                self.log.debug("backtrack")
                                                 backtrack_flag = True
                                 if backtrack_flag and not self.too_many_backtrack:
                                     self.backtrack_count += 1
@@ -2015,13 +2004,13 @@ class UrbanTrip(BaseAgent):
                                             arrive_type, arrive_time = arrive_info
                                             if arrive_type == "early":  # 要求早于某个时间
                                                 if not time_compare_if_earlier_equal(act_start_time, arrive_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Arrival for {poi_sel['name']} too late: {act_start_time} > {arrive_time}")
                                                     self.backtrack_count += 1
                                                     continue
                                             elif arrive_type == "late":  # 要求晚于某个时间
                                                 if not time_compare_if_earlier_equal(arrive_time, act_start_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Arrival for {poi_sel['name']} too early: {act_start_time} < {arrive_time}")
                                                     self.backtrack_count += 1
                                                     continue
@@ -2033,13 +2022,13 @@ class UrbanTrip(BaseAgent):
                                             leave_type, leave_time = leave_info
                                             if leave_type == "early":  # 要求早于某个时间离开
                                                 if not time_compare_if_earlier_equal(act_end_time, leave_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Leaving {poi_sel['name']} too late: {act_end_time} > {leave_time}")
                                                     self.backtrack_count += 1
                                                     continue
                                             elif leave_type == "late":  # 要求晚于某个时间离开
                                                 if not time_compare_if_earlier_equal(leave_time, act_end_time):
-                                                    print(
+                                                    self.log.debug(
                                                         f"[Constraint] Leaving {poi_sel['name']} too early: {act_end_time} < {leave_time}")
                                                     self.backtrack_count += 1
                                                     continue
@@ -2077,7 +2066,7 @@ class UrbanTrip(BaseAgent):
 
                                 pn = poi_sel["name"]
                                 pc = poi_sel["type"]
-                                print(f"add attraction: {pn}, type: {pc}")
+                                self.log.debug(f"add attraction: {pn}, type: {pc}")
 
                                 new_time = act_end_time  # 更新当前时间为活动结束时间
                                 new_position = poi_sel["name"]  # 更新当前位置为景点名称
@@ -2101,7 +2090,7 @@ class UrbanTrip(BaseAgent):
                                     return True, plan
 
                                 self.backtrack_count += 1
-                                print("add_attraction failed, backtrack...")
+                                self.log.debug("add_attraction failed, backtrack...")
 
                                 plan[current_day]["activities"].pop()
                                 self.attractions_visiting.pop()
@@ -2113,7 +2102,7 @@ class UrbanTrip(BaseAgent):
                             continue
                         if poi_sel["type"] in self.spot_type_visiting:
                             continue
-                        print(f"lookahead to add attraction, candidate: {poi_sel['name']}")
+                        self.log.debug(f"lookahead to add attraction, candidate: {poi_sel['name']}")
                         # 临时添加至计划中，更新当前地点和时间
                         transports_ranking = self.innercity_transports_ranking
                         if self.transport_rules_by_distance is not None:
@@ -2132,7 +2121,7 @@ class UrbanTrip(BaseAgent):
                             )
                             if not isinstance(transports_sel, list):
                                 self.backtrack_count += 1
-                                print("inner-city transport error, backtrack...")
+                                self.log.debug("inner-city transport error, backtrack...")
                                 continue
 
                             if len(transports_sel) == 0:
@@ -2148,7 +2137,7 @@ class UrbanTrip(BaseAgent):
                             # it is closed ...
                             if time_compare_if_earlier_equal(endtime, arrived_time):
                                 self.backtrack_count += 1
-                                print(
+                                self.log.debug(
                                     f"{poi_sel['name']} closed at {endtime}, start time: {current_time}, arrival time: {arrived_time}, backtrack...")
                                 continue
 
@@ -2165,11 +2154,11 @@ class UrbanTrip(BaseAgent):
                                 for rule in self.transport_rules_by_distance:
                                     if rule["min_distance"] is not None:
                                         if distance > rule["min_distance"] and mode not in rule["transport_type"]:
-                                            print("backtrack")
+                                            self.log.debug("backtrack")
                                             backtrack_flag = True
                                     if rule["max_distance"] is not None:
                                         if distance < rule["max_distance"] and mode not in rule["transport_type"]:
-                                            print("backtrack")
+                                            self.log.debug("backtrack")
                                             backtrack_flag = True
                             if backtrack_flag and not self.too_many_backtrack:
                                 self.backtrack_count += 1
@@ -2197,13 +2186,13 @@ class UrbanTrip(BaseAgent):
                                         arrive_type, arrive_time = arrive_info
                                         if arrive_type == "early":  # 要求早于某个时间
                                             if not time_compare_if_earlier_equal(act_start_time, arrive_time):
-                                                print(
+                                                self.log.debug(
                                                     f"[Constraint] Arrival for {poi_sel['name']} too late: {act_start_time} > {arrive_time}")
                                                 self.backtrack_count += 1
                                                 continue
                                         elif arrive_type == "late":  # 要求晚于某个时间
                                             if not time_compare_if_earlier_equal(arrive_time, act_start_time):
-                                                print(
+                                                self.log.debug(
                                                     f"[Constraint] Arrival for {poi_sel['name']} too early: {act_start_time} < {arrive_time}")
                                                 self.backtrack_count += 1
                                                 continue
@@ -2215,13 +2204,13 @@ class UrbanTrip(BaseAgent):
                                         leave_type, leave_time = leave_info
                                         if leave_type == "early":  # 要求早于某个时间离开
                                             if not time_compare_if_earlier_equal(act_end_time, leave_time):
-                                                print(
+                                                self.log.debug(
                                                     f"[Constraint] Leaving {poi_sel['name']} too late: {act_end_time} > {leave_time}")
                                                 self.backtrack_count += 1
                                                 continue
                                         elif leave_type == "late":  # 要求晚于某个时间离开
                                             if not time_compare_if_earlier_equal(leave_time, act_end_time):
-                                                print(
+                                                self.log.debug(
                                                     f"[Constraint] Leaving {poi_sel['name']} too early: {act_end_time} < {leave_time}")
                                                 self.backtrack_count += 1
                                                 continue
@@ -2259,7 +2248,7 @@ class UrbanTrip(BaseAgent):
 
                             pn = poi_sel["name"]
                             pc = poi_sel["type"]
-                            print(f"add attraction: {pn}, type: {pc}")
+                            self.log.debug(f"add attraction: {pn}, type: {pc}")
 
                             new_time = act_end_time  # 更新当前时间为活动结束时间
                             new_position = poi_sel["name"]  # 更新当前位置为景点名称
@@ -2283,7 +2272,7 @@ class UrbanTrip(BaseAgent):
                                 return True, plan
 
                             self.backtrack_count += 1
-                            print("add_attraction failed, backtrack...")
+                            self.log.debug("add_attraction failed, backtrack...")
 
                             plan[current_day]["activities"].pop()
                             self.attractions_visiting.pop()
@@ -2308,7 +2297,7 @@ class UrbanTrip(BaseAgent):
                     for trans_type_sel in transports_ranking:
                         self.search_nodes += 1
                         # 收集市内交通选项，从当前位置到返程交通的出发地
-                        print("last day, collecting innercity transport to back-transport")
+                        self.log.debug("last day, collecting innercity transport to back-transport")
                         transports_sel = self.collect_innercity_transport(
                             query["target_city"],
                             current_position,
@@ -2318,7 +2307,7 @@ class UrbanTrip(BaseAgent):
                         )
                         if not isinstance(transports_sel, list):
                             self.backtrack_count += 1
-                            print("inner-city transport error, backtrack...")
+                            self.log.debug("inner-city transport error, backtrack...")
                             continue
 
                         if len(transports_sel) == 0:
@@ -2329,7 +2318,7 @@ class UrbanTrip(BaseAgent):
                         if not self.too_many_backtrack:
                             if not time_compare_if_earlier_equal(arrived_time, poi_plan["back_transport"]["BeginTime"]):
                                 self.backtrack_count += 1
-                                print("Fail to catch the back transport")
+                                self.log.debug("Fail to catch the back transport")
                                 continue
 
                         backtrack_flag = False
@@ -2345,11 +2334,11 @@ class UrbanTrip(BaseAgent):
                             for rule in self.transport_rules_by_distance:
                                 if rule["min_distance"] is not None:
                                     if distance > rule["min_distance"] and mode not in rule["transport_type"]:
-                                        print("backtrack")
+                                        self.log.debug("backtrack")
                                         backtrack_flag = True
                                 if rule["max_distance"] is not None:
                                     if distance < rule["max_distance"] and mode not in rule["transport_type"]:
-                                        print("backtrack")
+                                        self.log.debug("backtrack")
                                         backtrack_flag = True
                         if backtrack_flag and not self.too_many_backtrack:
                             self.backtrack_count += 1
@@ -2389,7 +2378,7 @@ class UrbanTrip(BaseAgent):
                     for trans_type_sel in transports_ranking:
                         self.search_nodes += 1
                         # 收集市内交通选项，从当前位置到酒店
-                        print("not last day, but last event, collecting innercity transport to hotel")
+                        self.log.debug("not last day, but last event, collecting innercity transport to hotel")
                         transports_sel = self.collect_innercity_transport(
                             query["target_city"],
                             current_position,
@@ -2397,10 +2386,10 @@ class UrbanTrip(BaseAgent):
                             current_time,
                             trans_type_sel,
                         )
-                        print(f"from: {current_position} to {hotel_sel['name']}")
+                        self.log.debug(f"from: {current_position} to {hotel_sel['name']}")
                         if not isinstance(transports_sel, list):
                             self.backtrack_count += 1
-                            print("inner-city transport error, backtrack...")
+                            self.log.debug("inner-city transport error, backtrack...")
                             continue
 
                         if len(transports_sel) == 0:
@@ -2421,11 +2410,11 @@ class UrbanTrip(BaseAgent):
                             for rule in self.transport_rules_by_distance:
                                 if rule["min_distance"] is not None:
                                     if distance > rule["min_distance"] and mode not in rule["transport_type"]:
-                                        print("backtrack")
+                                        self.log.debug("backtrack")
                                         backtrack_flag = True
                                 if rule["max_distance"] is not None:
                                     if distance < rule["max_distance"] and mode not in rule["transport_type"]:
-                                        print("backtrack")
+                                        self.log.debug("backtrack")
                                         backtrack_flag = True
                         if backtrack_flag and not self.too_many_backtrack:
                             self.backtrack_count += 1
@@ -2458,142 +2447,115 @@ class UrbanTrip(BaseAgent):
                             return True, plan
                         else:
                             self.backtrack_count += 1
-                            print("Try the go back hotel, failed, backtrack...")
+                            self.log.debug("Try the go back hotel, failed, backtrack...")
 
                             plan[current_day]["activities"].pop()
 
                             return False, plan
             else:
                 # raise Exception("Not Implemented.")
-                print("incorrect poi type: {}".format(poi_type))
+                self.log.debug("incorrect poi type: {}".format(poi_type))
                 continue
 
             candidates_type.remove(poi_type)
-            print(f"remove: {poi_type}, candidate type: {candidates_type}")
-            print("try another poi type, backtrack...")
+            self.log.debug(f"remove: {poi_type}, candidate type: {candidates_type}")
+            self.log.debug("try another poi type, backtrack...")
 
         return False, plan
 
     def check_constraint(self, plan, constraints):
-        # 初始化访问记录
-        visited_attractions = set()
-        visited_attraction_types = set()
-        visited_restaurants = set()
-        visited_restaurant_types = set()
+        state = self.search_state.sync(plan)
+        # 已访问的景点、餐厅及其类型
+        visited_attractions = state.attraction_names
+        visited_attraction_types = state.attraction_types
+        visited_restaurants = state.restaurant_names
+        visited_restaurant_types = state.restaurant_types
 
         logic_fail = False
         backtrack = False
 
-        overall_cost = 0
-        attraction_cost = 0
-        restaurant_cost = 0
-        innercity_cost = 0
-        for day_activities in plan:
-            for activity in day_activities["activities"]:
-                if activity["type"] in ["breakfast", "lunch", "dinner", "attraction"]:
-                    overall_cost += activity["cost"]
-                    restaurant_cost += activity["cost"]
-                if activity["type"] in ["attraction"]:
-                    overall_cost += activity["cost"]
-                    attraction_cost += activity["cost"]
-                innercity_cost += sum(transport.get("cost", 0) for transport in activity.get("transports", []))
+        overall_cost = state.overall_cost
+        attraction_cost = state.attraction_cost
+        restaurant_cost = state.poi_cost
+        innercity_cost = state.innercity_cost
         self.overall_cost = overall_cost + innercity_cost + self.hotel_cost + self.intercity_cost
         # print(f"overall cost: {self.overall_cost}, attraction cost:{attraction_cost}, restaurant cost: {restaurant_cost}, innercity cost: {innercity_cost}")
 
         if self.attraction_budget is not None and self.attraction_budget < attraction_cost:
             self.backtrack_count += 1
-            print("attraction budget exceeded, backtrack...")
+            self.log.debug("attraction budget exceeded, backtrack...")
             logic_fail = True
             backtrack = True
             self.all_satisfy_flag = False
         if self.restaurant_budget is not None and self.restaurant_budget < restaurant_cost:
             self.backtrack_count += 1
-            print("restaurant budget exceeded, backtrack...")
+            self.log.debug("restaurant budget exceeded, backtrack...")
             logic_fail = True
             backtrack = True
             self.all_satisfy_flag = False
         if self.innercity_budget is not None and self.innercity_budget < innercity_cost:
             self.backtrack_count += 1
-            print("innercity budget exceeded, backtrack...")
+            self.log.debug("innercity budget exceeded, backtrack...")
             logic_fail = True
             backtrack = True
             self.all_satisfy_flag = False
         if self.overall_budget is not None and self.overall_budget < self.overall_cost:
             self.backtrack_count += 1
-            print("overall budget exceeded, backtrack...")
+            self.log.debug("overall budget exceeded, backtrack...")
             logic_fail = True
             backtrack = True
             self.all_satisfy_flag = False
 
-        # 遍历活动，统计信息并处理 must_not 类约束 & only_free_attractions
-        for day in plan:
-            for act in day["activities"]:
-                poi_name = act.get("position")
-                poi_info = None
-
-                if act.get("type") == "attraction":
-                    match = self.memory["attractions"][self.memory["attractions"]["name"] == poi_name]
-                    if not match.empty:
-                        poi_info = match.iloc[0].to_dict()
-                        visited_attractions.add(poi_info["name"])
-                        visited_attraction_types.add(poi_info["type"])
-
-                        # must_not_see_attraction
-                        if "must_not_see_attraction" in constraints:
-                            if poi_info["name"] in constraints["must_not_see_attraction"]:
-                                print("visited must_not_see_attraction")
-                                backtrack = True
-
-                        # must_not_see_attraction_type
-                        if "must_not_see_attraction_type" in constraints:
-                            if poi_info["type"] in constraints["must_not_see_attraction_type"]:
-                                print("visited must_not_see_attraction_type")
-                                backtrack = True
-
-                        # only_free_attractions
-                        if "only_free_attractions" in constraints and poi_info.get("price", 0) > 0:
-                            print("only_free_attractions but not free")
-                            backtrack = True
-
-                elif act.get("type") in {"lunch", "dinner"}:
-                    match = self.memory["restaurants"][self.memory["restaurants"]["name"] == poi_name]
-                    if not match.empty:
-                        poi_info = match.iloc[0].to_dict()
-                        visited_restaurants.add(poi_info["name"])
-                        visited_restaurant_types.add(poi_info["cuisine"])
-
-                        # must_not_visit_restaurant
-                        if "must_not_visit_restaurant" in constraints:
-                            if poi_info["name"] in constraints["must_not_visit_restaurant"]:
-                                print("visited must_not_visit_restaurant")
-                                backtrack = True
-
-                        # must_not_visit_restaurant_type
-                        if "must_not_visit_restaurant_type" in constraints:
-                            if poi_info["cuisine"] in constraints["must_not_visit_restaurant_type"]:
-                                print("visited must_not_visit_restaurant_type")
-                                backtrack = True
+        # 处理 must_not 类约束 & only_free_attractions
+        # must_not_see_attraction
+        if "must_not_see_attraction" in constraints:
+            if any(name in visited_attractions for name in constraints["must_not_see_attraction"]):
+                self.log.debug("visited must_not_see_attraction")
+                backtrack = True
+
+        # must_not_see_attraction_type
+        if "must_not_see_attraction_type" in constraints:
+            if any(poi_type in visited_attraction_types for poi_type in constraints["must_not_see_attraction_type"]):
+                self.log.debug("visited must_not_see_attraction_type")
+                backtrack = True
+
+        # only_free_attractions
+        if "only_free_attractions" in constraints and state.paid_attractions > 0:
+            self.log.debug("only_free_attractions but not free")
+            backtrack = True
+
+        # must_not_visit_restaurant
+        if "must_not_visit_restaurant" in constraints:
+            if any(name in visited_restaurants for name in constraints["must_not_visit_restaurant"]):
+                self.log.debug("visited must_not_visit_restaurant")
+                backtrack = True
+
+        # must_not_visit_restaurant_type
+        if "must_not_visit_restaurant_type" in constraints:
+            if any(cuisine in visited_restaurant_types for cuisine in constraints["must_not_visit_restaurant_type"]):
+                self.log.debug("visited must_not_visit_restaurant_type")
+                backtrack = True
 
         # 遍历 must 类要求，统计是否满足
         # 注意：这些不满足不立即回溯，而是给机会后续补上
         if "must_see_attraction" in constraints:
             required = set(constraints["must_see_attraction"])
-            if not required.issubset(visited_attractions):
+            if not required <= visited_attractions.keys():
                 logic_fail = True
 
         if "must_see_attraction_type" in constraints:
             required = set(constraints["must_see_attraction_type"])
-            if not required.issubset(visited_attraction_types):
+            if not required <= visited_attraction_types.keys():
                 logic_fail = True
 
         if "must_visit_restaurant" in constraints:
             required = set(constraints["must_visit_restaurant"])
-            if not required.issubset(visited_restaurants):
+            if not required <= visited_restaurants.keys():
                 logic_fail = True
 
         if "must_visit_restaurant_type" in constraints:
             required = set(constraints["must_visit_restaurant_type"])
-            if not required.issubset(visited_restaurant_types):
+            if not required <= visited_restaurant_types.keys():
                 logic_fail = True
 
         if "must_innercity_transport" in constraints:
@@ -2627,36 +2589,28 @@ class UrbanTrip(BaseAgent):
             return False, False  # 所有组都不满足
 
     def check_budgets(self, plan):
-        overall_cost = 0
-        attraction_cost = 0
-        restaurant_cost = 0
-        innercity_cost = 0
-        for day_activities in plan:
-            for activity in day_activities["activities"]:
-                if activity["type"] in ["breakfast", "lunch", "dinner", "attraction"]:
-                    overall_cost += activity["cost"]
-                    restaurant_cost += activity["cost"]
-                if activity["type"] in ["attraction"]:
-                    overall_cost += activity["cost"]
-                    attraction_cost += activity["cost"]
-                innercity_cost += sum(transport.get("cost", 0) for transport in activity.get("transports", []))
+        state = self.search_state.sync(plan)
+        overall_cost = state.overall_cost
+        attraction_cost = state.attraction_cost
+        restaurant_cost = state.poi_cost
+        innercity_cost = state.innercity_cost
         self.overall_cost = overall_cost + innercity_cost + self.hotel_cost + self.intercity_cost
 
         if self.attraction_budget is not None and self.attraction_budget < attraction_cost:
             self.backtrack_count += 1
-            print("attraction budget exceeded, backtrack...")
+            self.log.debug("attraction budget exceeded, backtrack...")
             return True
         if self.restaurant_budget is not None and self.restaurant_budget < restaurant_cost:
             self.backtrack_count += 1
-            print("restaurant budget exceeded, backtrack...")
+            self.log.debug("restaurant budget exceeded, backtrack...")
             return True
         if self.innercity_budget is not None and self.innercity_budget < innercity_cost:
             self.backtrack_count += 1
-            print("innercity budget exceeded, backtrack...")
+            self.log.debug("innercity budget exceeded, backtrack...")
             return True
         if self.overall_budget is not None and self.overall_budget < self.overall_cost:
             self.backtrack_count += 1
-            print("overall budget exceeded, backtrack...")
+            self.log.debug("overall budget exceeded, backtrack...")
             return True
 
         return False
@@ -2788,7 +2742,7 @@ class UrbanTrip(BaseAgent):
                     ok = True
                     for poi_name, max_dist in item.items():
                         dist = self.calculate_distance(query, poi_name, hotel_name)
-                        print(f"poi name:{poi_name}, hotel name:{hotel_name}, distance:{dist}")
+                        self.log.info(f"poi name:{poi_name}, hotel name:{hotel_name}, distance:{dist}")
                         if dist > max_dist:
                             ok = False
                             break
@@ -3082,12 +3036,15 @@ class UrbanTrip(BaseAgent):
             "target_city": query["target_city"],
             "itinerary": plan,
         }
-        print("validate the plan [for query {}]: ".format(query["uid"]))
-        print(res_plan)
+        self.log.debug("validate the plan [for query {}]: ".format(query["uid"]))
+        self.log.debug(res_plan)
 
         self.least_plan_schema = deepcopy(res_plan)
 
-        bool_result = func_commonsense_constraints(query, res_plan, verbose=True)
+        # only the activities added since the last validation are checked
+        bool_result = self.commonsense.check(
+            res_plan, verbose=self.log.enabled(DEBUG)
+        )
 
         # if not bool_result:
         #     exit(0)
@@ -3101,11 +3058,11 @@ class UrbanTrip(BaseAgent):
         except:
             extracted_vars = None
 
-        print(extracted_vars)
+        self.log.debug(extracted_vars)
 
         logical_result = evaluate_constraints_py(query["hard_logic_py"], res_plan, verbose=True)
 
-        print(logical_result)
+        self.log.debug(logical_result)
 
 
         logical_pass = True
@@ -3113,9 +3070,9 @@ class UrbanTrip(BaseAgent):
             logical_pass = logical_pass and item
 
             if item:
-                print(query["hard_logic_py"][idx], "passed!")
+                self.log.debug(query["hard_logic_py"][idx], "passed!")
             else:
-                print(query["hard_logic_py"][idx], "failed...")
+                self.log.debug(query["hard_logic_py"][idx], "failed...")
         if bool_result and np.sum(logical_result) > self.least_plan_logical_pass:
             self.least_plan_comm = deepcopy(res_plan)
             self.least_plan_logical_pass = np.sum(logical_result)
@@ -3128,13 +3085,13 @@ class UrbanTrip(BaseAgent):
         bool_result = bool_result and logical_pass
 
         if bool_result:
-            print("\n Pass! \n")
+            self.log.debug("\n Pass! \n")
             self.all_constraints_pass += 1
 
             if self.least_plan_logic is None:
                 self.least_plan_logic = res_plan
         else:
-            print("\n Failed \n")
+            self.log.debug("\n Failed \n")
 
         # plan = res_plan
 
@@ -3341,7 +3298,7 @@ class UrbanTrip(BaseAgent):
     ):
 
         if current_time != "" and time_compare_if_earlier_equal("23:00", current_time):
-            print("too late, after 23:00")
+            self.log.debug("too late, after 23:00")
             return True
 
         if current_time != "" and current_day == query["days"] - 1:
@@ -3351,6 +3308,20 @@ class UrbanTrip(BaseAgent):
                 temp_distance = self.calculate_distance(query, current_position, poi_plan["back_transport"]["From"])
                 transports_ranking = self.get_transport_by_distance(temp_distance)
 
+            if "back_transport" in poi_plan:
+                # only the last transport type decides, see the loop below
+                too_late = self.too_late_by_bounds(
+                    query,
+                    current_position,
+                    poi_plan["back_transport"]["From"],
+                    current_time,
+                    poi_plan["back_transport"]["BeginTime"],
+                    transports_ranking[-1:],
+                )
+                if too_late is not None:
+                    self.search_nodes += 1
+                    return too_late
+
             for transport_type_sel in transports_ranking:
 
                 self.search_nodes += 1
@@ -3366,7 +3337,7 @@ class UrbanTrip(BaseAgent):
                     )
                     if not isinstance(transports_sel, list):
                         self.backtrack_count += 1
-                        print("inner-city transport error, backtrack...")
+                        self.log.debug("inner-city transport error, backtrack...")
                         continue
 
                     if len(transports_sel) > 0:
@@ -3382,7 +3353,7 @@ class UrbanTrip(BaseAgent):
                 if flag:
                     if transport_type_sel != transports_ranking[-1]:
                         continue
-                    print(
+                    self.log.debug(
                         "Can not go back source-city in time, current POI {}, station arrived time: {}".format(
                             current_position, arrived_time
                         )
@@ -3398,11 +3369,24 @@ class UrbanTrip(BaseAgent):
                     temp_distance = self.calculate_distance(query, current_position, hotel_sel["name"])
                     transports_ranking = self.get_transport_by_distance(temp_distance)
 
+                if "back_transport" in poi_plan:
+                    too_late = self.too_late_by_bounds(
+                        query,
+                        current_position,
+                        hotel_sel["name"],
+                        current_time,
+                        "24:00",
+                        transports_ranking,
+                    )
+                    if too_late is not None:
+                        self.search_nodes += 1
+                        return too_late
+
                 for transport_type_sel in transports_ranking:
                     self.search_nodes += 1
                     flag = True
                     if "back_transport" in poi_plan:
-                        print("collecting innercity transport to see if possible back to hotel")
+                        self.log.debug("collecting innercity transport to see if possible back to hotel")
                         transports_sel = self.collect_innercity_transport(
                             query["target_city"],
                             current_position,
@@ -3412,7 +3396,7 @@ class UrbanTrip(BaseAgent):
                         )
                         if not isinstance(transports_sel, list):
                             self.backtrack_count += 1
-                            print("inner-city transport error, backtrack...")
+                            self.log.debug("inner-city transport error, backtrack...")
                             continue
 
                         flag = True
@@ -3426,7 +3410,7 @@ class UrbanTrip(BaseAgent):
                         if not time_compare_if_earlier_equal("24:00", arrived_time):
                             flag = False
                     if flag:
-                        print(
+                        self.log.debug(
                             "Can not go back to hotel, current POI {}, hotel arrived time: {}".format(
                                 current_position, arrived_time
                             )
@@ -3435,6 +3419,31 @@ class UrbanTrip(BaseAgent):
 
         return False
 
+    def too_late_by_bounds(
+            self, query, current_position, target, current_time, deadline, transports_ranking
+    ):
+        """
+        check_if_too_late from the bounds of the travel times, without goto:
+        True if every route reaches target at or after deadline, False if
+        none does, None if the deadline falls between the bounds.
+        """
+        bounds = self.env.call(
+            "arrival_bounds", query["target_city"], current_position, target, current_time
+        )
+        if bounds is None:
+            return None
+        earliest, latest = bounds
+        hour, minute = deadline.split(":")
+        deadline = int(hour) * 60 + int(minute)
+        if latest < deadline:
+            return False
+        # walk and taxi always have a route, the metro may not
+        if earliest >= deadline and (
+                "walk" in transports_ranking or "taxi" in transports_ranking
+        ):
+            return True
+        return None
+
     def collect_poi_info_all(self, city, poi_type):
         if poi_type == "accommodation":
             func_name = "accommodations_select"
@@ -3445,16 +3454,8 @@ class UrbanTrip(BaseAgent):
         else:
             raise NotImplementedError
 
-        poi_info = self.env(
-            "{func}('{city}', 'name', lambda x: True)".format(func=func_name, city=city)
-        )["data"]
-        # print(poi_info)
-        while True:
-            info_i = self.env("next_page()")["data"]
-            if len(info_i) == 0:
-                break
-            else:
-                poi_info = pd.concat([poi_info, info_i], axis=0, ignore_index=True)
+        poi_info = self.env.call(func_name, city, "name", lambda x: True)
+        poi_info = poi_info.reset_index(drop=True)
 
         # print(poi_info)
         return poi_info
@@ -3499,20 +3500,10 @@ class UrbanTrip(BaseAgent):
 
     def collect_intercity_transport(self, source_city, target_city, trans_type):
 
-        info_return = self.env(
-            "intercity_transport_select('{source_city}', '{target_city}', '{trans_type}')".format(
-                source_city=source_city, target_city=target_city, trans_type=trans_type
+        try:
+            trans_info = self.env.call(
+                "intercity_transport_select", source_city, target_city, trans_type
             )
-        )
-        if not info_return["success"]:
+        except Exception:
             return pd.DataFrame([])
-        trans_info = info_return["data"]
-        # print(poi_info)
-        while True:
-            info_i = self.env("next_page()")["data"]
-            if len(info_i) == 0:
-                break
-            else:
-                trans_info = pd.concat([trans_info, info_i], axis=0, ignore_index=True)
-        # print(poi_info)
-        return trans_info
+        return trans_info.reset_index(drop=True)
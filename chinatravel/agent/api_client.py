@@ -0,0 +1,265 @@
+"""
+Asynchronous client for the OpenAI-compatible chat APIs (DeepSeek, OpenAI,
+GLM).
+
+The API models of a process send their requests through one event loop that
+runs in a background thread, with one connection pool per endpoint, so that
+connections are reused across calls, threads and batches. At most
+max_concurrency requests per endpoint are in flight. A request that fails
+with a rate limit (429), a timeout, a connection error or a server error is
+retried with exponential backoff. After a 429 the whole endpoint pauses for
+as long as the server's Retry-After header asks.
+
+The limits can be set with CHINATRAVEL_API_CONCURRENCY (8) and
+CHINATRAVEL_API_RETRIES (5).
+
+`python -m chinatravel.agent.api_client` checks the client against a local
+mock server that rate-limits and fails some of the requests.
+"""
+
+import asyncio
+import os
+import random
+import threading
+
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI
+
+
+MAX_CONCURRENCY = int(os.environ.get("CHINATRAVEL_API_CONCURRENCY", 8))
+MAX_RETRIES = int(os.environ.get("CHINATRAVEL_API_RETRIES", 5))
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def retry_after(error):
+    """
+    Seconds the server asked to wait before the next request, None if it did
+    not say.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    for header, scale in [("retry-after-ms", 0.001), ("retry-after", 1)]:
+        value = response.headers.get(header)
+        if value is not None:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return None
+
+
+class ChatClient(object):
+    def __init__(
+        self,
+        base_url=None,
+        api_key=None,
+        max_concurrency=MAX_CONCURRENCY,
+        max_retries=MAX_RETRIES,
+        backoff=1.0,
+        max_backoff=60.0,
+    ):
+        # the retries are ours: they share the pause after a rate limit
+        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key, max_retries=0)
+        # created on the event loop, by the first request: before Python
+        # 3.10 a Semaphore binds to the loop of the thread that creates it
+        self.max_concurrency = max_concurrency
+        self.semaphore = None
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.resume_at = 0.0
+
+    def retryable(self, error):
+        if isinstance(error, APIConnectionError):
+            return True
+        return isinstance(error, APIStatusError) and error.status_code in RETRY_STATUS
+
+    async def complete(self, **kwargs):
+        """
+        The content of the first choice of chat.completions.create(**kwargs).
+        """
+        loop = asyncio.get_running_loop()
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self.semaphore:
+            attempt = 0
+            while True:
+                if self.resume_at > loop.time():
+                    await asyncio.sleep(self.resume_at - loop.time())
+                try:
+                    response = await self.client.chat.completions.create(**kwargs)
+                    return response.choices[0].message.content
+                except (APIConnectionError, APIStatusError) as e:
+                    if attempt >= self.max_retries or not self.retryable(e):
+                        raise
+                    delay = min(self.max_backoff, self.backoff * 2**attempt)
+                    delay *= 0.5 + random.random() / 2
+                    server_delay = retry_after(e)
+                    if server_delay is not None:
+                        delay = max(delay, server_delay)
+                    if isinstance(e, APIStatusError) and e.status_code == 429:
+                        self.resume_at = max(self.resume_at, loop.time() + delay)
+                    attempt += 1
+                    await asyncio.sleep(delay)
+
+    def complete_all(self, requests):
+        """
+        The contents of the completions of the requests (each a dict of
+        keyword arguments of chat.completions.create), all sent at once. A
+        request that failed for good gives its exception instead.
+        """
+
+        async def gather():
+            return await asyncio.gather(
+                *[self.complete(**request) for request in requests],
+                return_exceptions=True,
+            )
+
+        return run(gather())
+
+
+_loop = None
+_loop_pid = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def event_loop():
+    """
+    The event loop of the API requests of this process, started on first use
+    (again in a forked child, where the parent's thread does not exist).
+    """
+    global _loop, _loop_pid
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _clients.clear()
+            threading.Thread(
+                target=_loop.run_forever, name="llm-api", daemon=True
+            ).start()
+        return _loop
+
+
+def run(coro):
+    """
+    Run coro on the event loop of the API requests and wait for its result.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, event_loop()).result()
+
+
+def get_client(base_url=None, api_key=None):
+    """
+    The shared client of the endpoint.
+    """
+    event_loop()
+    with _lock:
+        key = (base_url, api_key)
+        if key not in _clients:
+            _clients[key] = ChatClient(base_url=base_url, api_key=api_key)
+        return _clients[key]
+
+
+if __name__ == "__main__":
+    import json
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MockHandler(BaseHTTPRequestHandler):
+        """
+        /v1/chat/completions answering with the last message: the first
+        request of each message gets a 429 and the second a 500.
+        """
+
+        seen = {}
+        in_flight = 0
+        max_in_flight = 0
+        lock = threading.Lock()
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            content = body["messages"][-1]["content"]
+            cls = type(self)
+            with cls.lock:
+                attempt = cls.seen[content] = cls.seen.get(content, 0) + 1
+                cls.in_flight += 1
+                cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            try:
+                time.sleep(0.05)
+                if attempt == 1:
+                    self.reply(429, {"error": {"message": "rate limited"}}, 0.1)
+                elif attempt == 2:
+                    self.reply(500, {"error": {"message": "server error"}})
+                else:
+                    message = {"role": "assistant", "content": content}
+                    choice = {"index": 0, "message": message, "finish_reason": "stop"}
+                    self.reply(
+                        200,
+                        {
+                            "id": "mock",
+                            "object": "chat.completion",
+                            "created": 0,
+                            "model": body["model"],
+                            "choices": [choice],
+                        },
+                    )
+            finally:
+                with cls.lock:
+                    cls.in_flight -= 1
+
+        def reply(self, status, payload, retry_after=None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if retry_after is not None:
+                self.send_header("Retry-After", str(retry_after))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = "http://127.0.0.1:{}/v1".format(server.server_address[1])
+
+    # several batches, each with more requests than max_concurrency, sent
+    # from threads other than the main one through one client that is
+    # itself created off the main thread
+    clients = []
+    results = {}
+    n = 3 * MAX_CONCURRENCY
+
+    def batch(b):
+        with _lock:
+            if not clients:
+                clients.append(ChatClient(base_url, "mock", backoff=0.05))
+        requests = [
+            {
+                "model": "mock",
+                "messages": [{"role": "user", "content": "{}-{}".format(b, i)}],
+            }
+            for i in range(n)
+        ]
+        results[b] = clients[0].complete_all(requests)
+
+    threads = [threading.Thread(target=batch, args=(b,)) for b in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for b in range(3):
+        assert results[b] == ["{}-{}".format(b, i) for i in range(n)], results[b]
+    assert all(attempts == 3 for attempts in MockHandler.seen.values())
+    assert MockHandler.max_in_flight <= MAX_CONCURRENCY, MockHandler.max_in_flight
+    print(
+        "ok: {} requests, {} attempts, at most {} in flight".format(
+            len(MockHandler.seen),
+            sum(MockHandler.seen.values()),
+            MockHandler.max_in_flight,
+        )
+    )
+    server.shutdown()
@@ -7,7 +7,7 @@ import json
 from json import JSONDecodeError
 
 from abc import ABC, abstractmethod
-from agent.utils import decode_numpy_dict
+from agent.utils import decode_numpy_dict, QueryLogger
 
 
 def is_jsonable(x):
@@ -119,6 +119,8 @@ from agent.load_model import init_llm
 class BaseAgent:
     def __init__(self, name, **kwargs):
         self.name = name
+        # replaced by the logger of each query, see open_query_log
+        self.log = QueryLogger()
 
         self.env = kwargs.get('env', None)
 
@@ -0,0 +1,100 @@
+"""
+On-disk cache of LLM responses, shared by all the backends of llms.py.
+
+A response is stored under a hash of everything it depends on: the model, its
+sampling settings, the messages and the output mode. The token counts of the
+original request are stored with it, so that a cache hit adds the same
+counts to the LLM as the request did. Only deterministic (temperature 0)
+requests are cached.
+
+The cache is one SQLite file, safe to share between processes. Set
+CHINATRAVEL_LLM_CACHE=0 to bypass it. A cache that cannot be read or written
+(locked for too long, read-only or full disk) is a miss, and the response is
+not stored.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from chinatravel.environment.tools.cache import cache_path, make_parent
+
+
+ENABLED = os.environ.get("CHINATRAVEL_LLM_CACHE", "1") != "0"
+
+
+def response_key(name, params, messages, one_line, json_mode):
+    key = json.dumps(
+        [name, params, messages, one_line, json_mode],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=repr,
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(object):
+    def __init__(self, path=None):
+        self.path = path or cache_path("llm", "responses.sqlite")
+        self._local = threading.local()
+
+    def _connection(self):
+        # one connection per thread and per process: sqlite connections
+        # cannot be shared across threads nor survive a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            make_parent(self.path)
+            conn = sqlite3.connect(self.path, timeout=60)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT, "
+                "input_tokens INTEGER, output_tokens INTEGER)"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """
+        (response, input_tokens, output_tokens), None on a miss.
+        """
+        try:
+            return (
+                self._connection()
+                .execute(
+                    "SELECT response, input_tokens, output_tokens FROM responses WHERE key = ?",
+                    (key,),
+                )
+                .fetchone()
+            )
+        except (sqlite3.Error, OSError):
+            return None
+
+    def put(self, key, response, input_tokens, output_tokens):
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, response, input_tokens, output_tokens),
+                )
+        except (sqlite3.Error, OSError):
+            pass
+
+
+_cache = None
+
+
+def get_response_cache():
+    """
+    The response cache of this process, None when it is disabled.
+    """
+    global _cache
+    if not ENABLED:
+        return None
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
@@ -1,5 +1,4 @@
 from abc import ABC, abstractmethod
-from openai import OpenAI
 from json_repair import repair_json
 from transformers import AutoTokenizer
 from transformers import AutoConfig
@@ -19,6 +18,13 @@ project_root_path = os.path.dirname(
 if project_root_path not in sys.path:
     sys.path.insert(0, project_root_path)
 
+from chinatravel.agent.api_client import get_client
+from chinatravel.agent.llm_cache import get_response_cache, response_key
+
+# returned when the backend could not be reached; never cached
+REQUEST_FAILED = '{"error": "Request failed, please try again."}'
+FORMAT_FAILED = '{"error": "Request with specific format failed, please try again."}'
+
 def chat_template(messages):
     """
     将 messages 列表转成符合 Chat 模板格式的字符串
@@ -53,161 +59,313 @@ class AbstractLLM(ABC):
         self.input_token_count = 0
         self.output_token_count = 0
         self.input_token_maxx = 0
+        # set to False to always query the backend (see llm_cache.py)
+        self.use_cache = True
         pass
 
     def __call__(self, messages, one_line=True, json_mode=False):
+        return self.batch([messages], one_line, json_mode)[0]
+
+    def batch(self, messages_list, one_line=True, json_mode=False):
+        """
+        The responses to a list of requests. The local (vLLM) backends
+        generate them together in one pass, the others answer them one by one.
+        """
         if one_line and json_mode:
             raise self.ModeError(
                 "one_line and json_mode cannot be True at the same time"
             )
-        return self._get_response(messages, one_line, json_mode)
+        cache = get_response_cache() if self.use_cache and self.deterministic() else None
+
+        responses = [None] * len(messages_list)
+        keys = [None] * len(messages_list)
+        pending = []
+        for i, messages in enumerate(messages_list):
+            if cache is not None:
+                keys[i] = response_key(
+                    self.name, self.sampling_config(), messages, one_line, json_mode
+                )
+                hit = cache.get(keys[i])
+                if hit is not None:
+                    res_str, input_tokens, output_tokens = hit
+                    self.input_token_count += input_tokens
+                    self.input_token_maxx = max(self.input_token_maxx, input_tokens)
+                    self.output_token_count += output_tokens
+                    responses[i] = res_str
+                    continue
+            pending.append(i)
+
+        if pending:
+            results = self._get_responses(
+                [messages_list[i] for i in pending], one_line, json_mode
+            )
+            for i, (res_str, input_tokens, output_tokens) in zip(pending, results):
+                responses[i] = res_str
+                if cache is not None and self.cacheable(res_str, input_tokens):
+                    cache.put(keys[i], res_str, input_tokens, output_tokens)
+        return responses
+
+    def cacheable(self, res_str, input_tokens):
+        """
+        Whether the response can be replayed: not one of the errors that a
+        retry or another configuration may not give.
+        """
+        return res_str not in (REQUEST_FAILED, FORMAT_FAILED)
+
+    def sampling_config(self):
+        """
+        The settings the responses depend on besides the messages.
+        """
+        return {
+            "request": getattr(self, "request_kwargs", None),
+            "sampling": repr(getattr(self, "sampling_params", None)),
+            # the local models scale their rope beyond 32768 tokens
+            "max_model_len": getattr(self, "max_model_len", None),
+        }
+
+    def deterministic(self):
+        if hasattr(self, "request_kwargs"):
+            return self.request_kwargs.get("temperature") == 0
+        if hasattr(self, "sampling_params"):
+            return self.sampling_params.temperature == 0
+        return False
+
+    def _get_responses(self, messages_list, one_line, json_mode):
+        """
+        (response, input tokens, output tokens) of every request; the tokens
+        are added to the counters too. Backends that can answer several
+        requests at once override this.
+        """
+        results = []
+        for messages in messages_list:
+            input_token_count = self.input_token_count
+            output_token_count = self.output_token_count
+            res_str = self._get_response(messages, one_line, json_mode)
+            results.append(
+                (
+                    res_str,
+                    self.input_token_count - input_token_count,
+                    self.output_token_count - output_token_count,
+                )
+            )
+        return results
 
     @abstractmethod
     def _get_response(self, messages, one_line, json_mode):
         pass
 
 
-class Deepseek(AbstractLLM):
-    def __init__(self):
-        super().__init__()
-        self.llm = OpenAI(
-            base_url="https://api.deepseek.com",
+class LocalLLM(AbstractLLM):
+    """
+    A model served in process by vLLM. All the prompts of a batch() go to one
+    llm.generate() call, so that vLLM schedules them together.
+    """
+
+    def _chat_text(self, messages):
+        return self.tokenizer.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=True
         )
-        self.path = os.path.join(
-            project_root_path, "chinatravel", "local_llm", "deepseek_v3_tokenizer"
+
+    def _too_long(self, input_tokens):
+        """
+        The response to a prompt the model cannot take, None if it can.
+        """
+        if input_tokens >= self.max_model_len:
+            return str({"error": f"Input prompt is longer than {self.max_model_len} tokens."})
+        return None
+
+    def cacheable(self, res_str, input_tokens):
+        # a prompt too long for this max_model_len may fit a larger one
+        return (
+            super().cacheable(res_str, input_tokens)
+            and self._too_long(input_tokens) is None
         )
-        self.name = "DeepSeek-V3"
 
-        self.tokenizer = AutoTokenizer.from_pretrained(self.path)
+    def _parse_output(self, text, one_line, json_mode):
+        if json_mode:
+            text = repair_json(text, ensure_ascii=False)
+        elif one_line:
+            text = text.split("\n")[0]
+        return text
+
+    def _generate(self, texts):
+        """
+        (generated text, output tokens) of every prompt; the text is None
+        when the generation failed.
+        """
+        outputs = self.llm.generate(texts, self.sampling_params)
+        return [
+            (output.outputs[0].text, len(output.outputs[0].token_ids))
+            for output in outputs
+        ]
+
+    def _get_responses(self, messages_list, one_line, json_mode):
+        results = [None] * len(messages_list)
+        texts, pending = [], []
+        for i, messages in enumerate(messages_list):
+            text = self._chat_text(messages)
+            input_tokens = len(self.tokenizer(text)["input_ids"])
+            self.input_token_count += input_tokens
+            self.input_token_maxx = max(self.input_token_maxx, input_tokens)
+
+            error = self._too_long(input_tokens)
+            if error is not None:
+                results[i] = (error, input_tokens, 0)
+            else:
+                texts.append(text)
+                pending.append((i, input_tokens))
+
+        if texts:
+            for (i, input_tokens), (text, output_tokens) in zip(
+                pending, self._generate(texts)
+            ):
+                self.output_token_count += output_tokens
+                if text is None:
+                    results[i] = (REQUEST_FAILED, input_tokens, output_tokens)
+                else:
+                    res_str = self._parse_output(text, one_line, json_mode)
+                    results[i] = (res_str, input_tokens, output_tokens)
+        return results
 
-    def _send_request(self, messages, kwargs):
+    def _get_response(self, messages, one_line, json_mode):
+        return self._get_responses([messages], one_line, json_mode)[0][0]
 
-        text = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        input_tokens = self.tokenizer(text)["input_ids"]
 
-        self.input_token_count += len(input_tokens)
-        self.input_token_maxx = max(self.input_token_maxx, len(input_tokens))
-        
-        res_str = (
-            self.llm.chat.completions.create(messages=messages, **kwargs)
-            .choices[0]
-            .message.content
-        )
-        output_tokens = self.tokenizer(res_str)["input_ids"]
-        self.output_token_count += len(output_tokens)
-        
-        res_str = res_str.strip()
-        return res_str
+class APILLM(AbstractLLM):
+    """
+    A model behind an OpenAI-compatible API. The requests go through the
+    shared asynchronous client of api_client.py (connection pooling,
+    bounded concurrency, retries), and batch() sends all of them at once.
+    """
 
-    def _get_response(self, messages, one_line, json_mode):
-        kwargs = {
-            "model": "deepseek-chat",
-            "max_tokens": 4096,
-            "temperature": 0,
-            "top_p": 0.00000001,
-        }
+    def __init__(self, base_url=None):
+        super().__init__()
+        self.base_url = base_url
+
+    def _request_kwargs(self, one_line, json_mode):
+        kwargs = dict(self.request_kwargs)
         if one_line:
             kwargs["stop"] = ["\n"]
         elif json_mode:
             kwargs["response_format"] = {"type": "json_object"}
-        try:
-            res_str = self._send_request(messages, kwargs)
-            if json_mode:
-                res_str = repair_json(res_str, ensure_ascii=False)
-        except Exception as e:
-            print(e)
-            res_str = '{"error": "Request failed, please try again."}'
-        return res_str
+        return kwargs
 
+    def _count_input_tokens(self, messages):
+        return 0
 
-class GLM4Plus(AbstractLLM):
-    def __init__(self):
-        super().__init__()
-        self.llm = OpenAI(
-            base_url="https://open.bigmodel.cn/api/paas/v4",
-        )
-        self.name = "GLM4Plus"
+    def _count_output_tokens(self, res_str):
+        return 0
 
-    def _send_request(self, messages, kwargs):
-        res_str = (
-            self.llm.chat.completions.create(messages=messages, **kwargs)
-            .choices[0]
-            .message.content
-        )
-        res_str = res_str.strip()
-        return res_str
+    def _report_error(self, e):
+        print(e)
+
+    def _get_responses(self, messages_list, one_line, json_mode):
+        kwargs = self._request_kwargs(one_line, json_mode)
+        results = [None] * len(messages_list)
+        requests, pending = [], []
+        for i, messages in enumerate(messages_list):
+            try:
+                input_tokens = self._count_input_tokens(messages)
+            except Exception as e:
+                self._report_error(e)
+                results[i] = (REQUEST_FAILED, 0, 0)
+                continue
+            self.input_token_count += input_tokens
+            self.input_token_maxx = max(self.input_token_maxx, input_tokens)
+            requests.append(dict(kwargs, messages=messages))
+            pending.append((i, input_tokens))
+
+        if requests:
+            try:
+                contents = get_client(self.base_url).complete_all(requests)
+            except Exception as e:
+                # e.g. a client that cannot be built: every request failed
+                contents = [e] * len(requests)
+            for (i, input_tokens), res_str in zip(pending, contents):
+                output_tokens = 0
+                try:
+                    if isinstance(res_str, Exception):
+                        raise res_str
+                    output_tokens = self._count_output_tokens(res_str)
+                    self.output_token_count += output_tokens
+                    res_str = res_str.strip()
+                    if json_mode:
+                        res_str = repair_json(res_str, ensure_ascii=False)
+                except Exception as e:
+                    self._report_error(e)
+                    res_str = REQUEST_FAILED
+                results[i] = (res_str, input_tokens, output_tokens)
+        return results
 
     def _get_response(self, messages, one_line, json_mode):
-        kwargs = {
-            "model": "glm-4-plus",
-            "max_tokens": 4095,
+        return self._get_responses([messages], one_line, json_mode)[0][0]
+
+
+class Deepseek(APILLM):
+    def __init__(self, base_url="https://api.deepseek.com"):
+        super().__init__(base_url)
+        self.path = os.path.join(
+            project_root_path, "chinatravel", "local_llm", "deepseek_v3_tokenizer"
+        )
+        self.name = "DeepSeek-V3"
+        self.request_kwargs = {
+            "model": "deepseek-chat",
+            "max_tokens": 4096,
             "temperature": 0,
-            "top_p": 0.01,
+            "top_p": 0.00000001,
         }
-        if one_line:
-            kwargs["stop"] = ["<STOP>"]
-        try:
-            res_str = self._send_request(messages, kwargs)
-            if json_mode:
-                res_str = repair_json(res_str, ensure_ascii=False)
-        except Exception as e:
-            res_str = '{"error": "Request failed, please try again."}'
-        return res_str
 
+        self.tokenizer = AutoTokenizer.from_pretrained(self.path)
 
-class GPT4o(AbstractLLM):
-    def __init__(self):
-        super().__init__()
-        self.llm = OpenAI()
-        self.name = "GPT4o"
-        self.tokenizer = tiktoken.encoding_for_model("gpt-4o")
+    def _count_input_tokens(self, messages):
+        text = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        return len(self.tokenizer(text)["input_ids"])
 
+    def _count_output_tokens(self, res_str):
+        return len(self.tokenizer(res_str)["input_ids"])
 
-    def _send_request(self, messages, kwargs):
 
-        # print(messages)
-        tokens = self.tokenizer.encode(chat_template(messages))
-        self.input_token_count += len(tokens)
-        self.input_token_maxx = max(self.input_token_maxx, len(tokens))
+class GLM4Plus(APILLM):
+    def __init__(self, base_url="https://open.bigmodel.cn/api/paas/v4"):
+        super().__init__(base_url)
+        self.name = "GLM4Plus"
+        self.request_kwargs = {
+            "model": "glm-4-plus",
+            "max_tokens": 4095,
+            "temperature": 0,
+            "top_p": 0.01,
+        }
 
-        # print(tokens)
-        # print(self.input_token_count)
-        # exit(0)
+    def _request_kwargs(self, one_line, json_mode):
+        kwargs = dict(self.request_kwargs)
+        if one_line:
+            kwargs["stop"] = ["<STOP>"]
+        return kwargs
 
-        res_str = (
-            self.llm.chat.completions.create(messages=messages, **kwargs)
-            .choices[0]
-            .message.content
-        )
-        
-        tokens = self.tokenizer.encode(res_str)
-        self.output_token_count += len(tokens)
+    def _report_error(self, e):
+        pass
 
-        res_str = res_str.strip()
-        return res_str
 
-    def _get_response(self, messages, one_line, json_mode):
-        kwargs = {
+class GPT4o(APILLM):
+    def __init__(self, base_url=None):
+        super().__init__(base_url)
+        self.name = "GPT4o"
+        self.request_kwargs = {
             "model": "chatgpt-4o-latest",
             "max_tokens": 4095,
             "temperature": 0,
             "top_p": 0.01,
         }
-        if one_line:
-            kwargs["stop"] = ["\n"]
-        elif json_mode:
-            kwargs["response_format"] = {"type": "json_object"}
-        try:
-            res_str = self._send_request(messages, kwargs)
-            if json_mode:
-                res_str = repair_json(res_str, ensure_ascii=False)
-        except Exception as e:
-            print(e)
-            res_str = '{"error": "Request failed, please try again."}'
-        return res_str
+        self.tokenizer = tiktoken.encoding_for_model("gpt-4o")
+
+    def _count_input_tokens(self, messages):
+        return len(self.tokenizer.encode(chat_template(messages)))
 
+    def _count_output_tokens(self, res_str):
+        return len(self.tokenizer.encode(res_str))
 
-class Qwen(AbstractLLM):
+
+class Qwen(LocalLLM):
     def __init__(self, model_name, max_model_len=None):
         super().__init__()
         self.path = os.path.join(
@@ -254,36 +412,20 @@ class Qwen(AbstractLLM):
 
         
 
-    def _get_response(self, messages, one_line, json_mode):
-        # print(messages)
-        
-        
-
+    def _chat_text(self, messages):
         if "Qwen3" in self.name:
-            text = self.tokenizer.apply_chat_template(
+            return self.tokenizer.apply_chat_template(
                 messages,
                 tokenize=False,
                 add_generation_prompt=True,
                 enable_thinking=True # Switch between thinking and non-thinking modes. Default is True.
             )
+        return self.tokenizer.apply_chat_template(
+            messages, tokenize=False, add_generation_prompt=True
+        )
 
-            input_tokens = self.tokenizer(text)["input_ids"]
-            self.input_token_count += len(input_tokens)       
-            self.input_token_maxx = max(self.input_token_maxx, len(input_tokens))
-            
-            if len(input_tokens) >= self.max_model_len:
-                return str({"error": f"Input prompt is longer than {self.max_model_len} tokens."})
-            # conduct text completion
-            outputs = self.llm.generate([text], self.sampling_params)
-
-
-            generated_text = outputs[0].outputs[0].text
-            # print(f"Prompt: {prompt!r}, Generated text: {generated_text!r}")
-            # print(generated_text)
-
-            output_token_ids = outputs[0].outputs[0].token_ids
-            self.output_token_count += len(output_token_ids)
-
+    def _parse_output(self, generated_text, one_line, json_mode):
+        if "Qwen3" in self.name:
             try:
                 m = re.match(r"<think>\n(.+)</think>\n\n", generated_text, flags=re.DOTALL)
                 content = generated_text[len(m.group(0)):]
@@ -297,36 +439,15 @@ class Qwen(AbstractLLM):
             # print("content: ", content)
             res_str = content
         else:
-            text = self.tokenizer.apply_chat_template(
-                messages, tokenize=False, add_generation_prompt=True
-            )
-            
-            input_tokens = self.tokenizer(text)["input_ids"]
-            self.input_token_count += len(input_tokens)        
-            self.input_token_maxx = max(self.input_token_maxx, len(input_tokens))
-            
-            if len(input_tokens) >= self.max_model_len:
-                return str({"error": f"Input prompt is longer than {self.max_model_len} tokens."})
-
-            outputs = self.llm.generate([text], self.sampling_params)
-            res_str = outputs[0].outputs[0].text
-
-            output_token_ids = outputs[0].outputs[0].token_ids
-            self.output_token_count += len(output_token_ids)
+            res_str = generated_text
         try:
-            if json_mode:
-                res_str = repair_json(res_str, ensure_ascii=False)
-            elif one_line:
-                res_str = res_str.split("\n")[0]
+            res_str = super()._parse_output(res_str, one_line, json_mode)
         except Exception as e:
-            res_str = '{"error": "Request with specific format failed, please try again."}'
-        # print("---qwen_output---")
-        # print(res_str)
-        # print("---qwen_output_end---")
+            res_str = FORMAT_FAILED
         return res_str
 
 
-class Mistral(AbstractLLM):
+class Mistral(LocalLLM):
     def __init__(self, max_model_len=None):
         super().__init__()
         self.path = os.path.join(
@@ -367,37 +488,12 @@ class Mistral(AbstractLLM):
         self.name = "Mistral-7B-Instruct-v0.3"
         self.max_model_len = max_model_len
 
-    def _get_response(self, messages, one_line, json_mode):
+    def _chat_text(self, messages):
         messages = merge_repeated_role(messages)
-        text = self.tokenizer.apply_chat_template(
-            messages, tokenize=False, add_generation_prompt=True
-        )
-        
-        input_tokens = self.tokenizer(text)["input_ids"]
-        self.input_token_count += len(input_tokens)
-        self.input_token_maxx = max(self.input_token_maxx, len(input_tokens))
+        return super()._chat_text(messages)
 
-        if len(input_tokens) >= self.max_model_len:
-            return str({"error": f"Input prompt is longer than {self.max_model_len} tokens."})
 
-        # try:
-        outputs = self.llm.generate([text], self.sampling_params)
-        res_str = outputs[0].outputs[0].text
-        
-        output_token_ids = outputs[0].outputs[0].token_ids
-        self.output_token_count += len(output_token_ids)
-        
-        if json_mode:
-            res_str = repair_json(res_str, ensure_ascii=False)
-        elif one_line:
-            res_str = res_str.split("\n")[0]
-        # except Exception as e:
-        #     print("error: ", e)
-        #     res_str = '{"error": "Request failed, please try again."}'
-        return res_str
-
-
-class Llama(AbstractLLM):
+class Llama(LocalLLM):
     def __init__(self, model_name):
         super().__init__()
 
@@ -422,39 +518,27 @@ class Llama(AbstractLLM):
         self.llm = LLM(model=self.path) #, local_files_only=True)
         self.name = model_name
 
-    def _get_response(self, messages, one_line, json_mode):
-        # print(messages)
-        text = self.tokenizer.apply_chat_template(
-            messages, tokenize=False, add_generation_prompt=True
-        )
-    
-        input_tokens = self.tokenizer(text)["input_ids"]
-        self.input_token_count += len(input_tokens)
-        self.input_token_maxx = max(self.input_token_maxx, len(input_tokens))
-        
-        if len(input_tokens) >= 131072:
+    def _too_long(self, input_tokens):
+        if input_tokens >= 131072:
             return '{"error": "Input prompt is longer than 131072 tokens."}'
-        
-        
-        try:
-            outputs = self.llm.generate([text], self.sampling_params)
-            res_str = outputs[0].outputs[0].text
-            
-            output_token_ids = outputs[0].outputs[0].token_ids
-            self.output_token_count += len(output_token_ids)
+        return None
 
-            if json_mode:
-                res_str = repair_json(res_str, ensure_ascii=False)
-            elif one_line:
-                res_str = res_str.split("\n")[0]
+    def _parse_output(self, text, one_line, json_mode):
+        try:
+            res_str = super()._parse_output(text, one_line, json_mode)
         except Exception as e:
-            res_str = '{"error": "Request failed, please try again."}'
-        # print("---mistral_output---")
-        # print(res_str)
-        # print("---mistral_output_end---")
+            res_str = REQUEST_FAILED
         print(res_str)
         return res_str
 
+    def _generate(self, texts):
+        try:
+            return super()._generate(texts)
+        except Exception as e:
+            print(REQUEST_FAILED)
+            return [(None, 0)] * len(texts)
+
+
 class EmptyLLM(AbstractLLM):
     def __init__(self):
         super().__init__()
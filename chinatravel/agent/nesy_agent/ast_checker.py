@@ -11,7 +11,7 @@ project_path = os.path.abspath(
 if project_path not in sys.path:
     sys.path.append(project_path)
 
-from chinatravel.environment.tools import Poi
+from chinatravel.environment.tools.registry import get_tool
 
 
 class FunctionValueTracker(ast.NodeVisitor):
@@ -255,7 +255,7 @@ class CodeBlockChecker:
 
 
 class HardLogicPyChecker(CodeBlockChecker):
-    _poi = Poi()
+    _poi = get_tool("poi")
 
     def __init__(self, target_city):
         func_name_list = [
@@ -19,7 +19,7 @@ if project_root_path not in sys.path:
 #
 sys.path.append('./../')
 
-from chinatravel.agent.utils import Logger, NpEncoder
+from chinatravel.agent.utils import NpEncoder
 from chinatravel.agent.nesy_agent.utils import time_compare_if_earlier_equal, add_time_delta
 from chinatravel.agent.nesy_agent.prompts import (
     NEXT_POI_TYPE_INSTRUCTION,
@@ -56,12 +56,12 @@ class LLMDrivenAgent(NesyAgent):
 
         self.llm_rec_count += 1
 
-        print(answer)
+        self.log.info(answer)
         match = re.search(r'IDList:\s*(\[[^\]]+\])', answer)
         # if match:
         try:
             intercity_transport_list = eval(match.group(1))
-            print('selected intercity_transports: ',intercity_transport_list) 
+            self.log.info('selected intercity_transports: ',intercity_transport_list) 
             # print(intercity_transport_list)
 
             ranking_idx = []
@@ -74,7 +74,7 @@ class LLMDrivenAgent(NesyAgent):
                     selected_index = np.where(selected_index)[0][0]
                     ranking_idx.append(selected_index)
         except Exception as e:
-            print("!!!Error in eval intercity_transport_list", e)
+            self.log.info("!!!Error in eval intercity_transport_list", e)
 
             self.llm_rec_format_error += 1
 
@@ -108,12 +108,12 @@ class LLMDrivenAgent(NesyAgent):
         self.llm_inference_time_count += time.time() - time_before
 
         self.llm_rec_count += 1
-        print(answer)
+        self.log.info(answer)
         match = re.search(r'IDList:\s*(\[[^\]]+\])', answer)
         # if match:
         try:
             intercity_transport_list = eval(match.group(1))
-            print('selected intercity_transports: ',intercity_transport_list) 
+            self.log.info('selected intercity_transports: ',intercity_transport_list) 
 
             # print(intercity_transport_list)
 
@@ -128,7 +128,7 @@ class LLMDrivenAgent(NesyAgent):
                     selected_index = np.where(selected_index)[0][0]
                     ranking_idx.append(selected_index)
         except Exception as e:
-            print("!!!Error in eval intercity_transport_list", e)
+            self.log.info("!!!Error in eval intercity_transport_list", e)
             self.llm_rec_format_error += 1
             
         # else:
@@ -149,7 +149,7 @@ class LLMDrivenAgent(NesyAgent):
     
     def ranking_hotel(self, hotel_info, query):
         
-        print(hotel_info.head())
+        self.log.info(hotel_info.head())
         
         hotel_info = hotel_info.drop(columns=["hotelname_en"])
 
@@ -162,7 +162,7 @@ class LLMDrivenAgent(NesyAgent):
         self.llm_inference_time_count += time.time() - time_before
         self.llm_rec_count += 1
 
-        print(answer)
+        self.log.info(answer)
         match = re.search(r'HotelNameList:\s*\[(.*?)\]', answer, re.DOTALL)
         
         ranking_idx = []
@@ -170,12 +170,12 @@ class LLMDrivenAgent(NesyAgent):
         try:
             HotelNameList = re.findall(r'"([^"]+)"', match.group(1))
     
-            print('selected HotelNameList: ',HotelNameList) 
+            self.log.info('selected HotelNameList: ',HotelNameList) 
             for cand_i in HotelNameList:
                 selected_index = np.where(hotel_info['name']==cand_i)[0][0]
                 ranking_idx.append(selected_index)
         except:
-            print("!!!Error in eval HotelNameList")
+            self.log.info("!!!Error in eval HotelNameList")
             self.llm_rec_format_error += 1
             
             cost_list = hotel_info["price"].tolist()
@@ -221,7 +221,7 @@ class LLMDrivenAgent(NesyAgent):
         if poi_type is not None and poi_type in candidates_type:
             return poi_type, candidates_type
         else:
-            print("The selected POI type is not in the candidate POI type list.")
+            self.log.info("The selected POI type is not in the candidate POI type list.")
             return candidates_type[0], candidates_type
         
         
@@ -249,8 +249,8 @@ class LLMDrivenAgent(NesyAgent):
                 try:
                     attraction_list = eval(match.group(1))
                 except:
-                    print("!!!Error in eval attraction_list")
-            print('selected attractions: ',attraction_list)    
+                    self.log.info("!!!Error in eval attraction_list")
+            self.log.info('selected attractions: ',attraction_list)    
             self.suggested_attractions_from_query = attraction_list  
             self.ranking_attractions_flag = True
 
@@ -262,13 +262,7 @@ class LLMDrivenAgent(NesyAgent):
 
         ranking_price = np.argsort(np.array(attr_price))
 
-        attr_dist = []
-        for i in range(num_attractions):
-            if current_position == attr_info.iloc[i]["name"]:
-                attr_dist.append(0)
-            else:
-                transports_sel = self.collect_innercity_transport(self.query["target_city"], current_position, attr_info.iloc[i]["name"], current_time, "walk")
-                attr_dist.append(transports_sel[0]["distance"])
+        attr_dist = self.env.call("goto_many", self.query["target_city"], current_position, attr_info["name"], current_time, "walk")["distance"]
         
 
         ranking_dist = np.argsort(np.array(attr_dist))
@@ -299,15 +293,15 @@ class LLMDrivenAgent(NesyAgent):
             
             self.llm_inference_time_count += time.time() - time_before
 
-            print(answer)
+            self.log.info(answer)
             restaurant_list=[]
             match = re.search(r'RestaurantNameList:\s*(\[[^\]]+\])', answer)
             if match:
                 try:
                     restaurant_list = eval(match.group(1))
                 except:
-                    print("!!!Error in eval restaurant_list")
-            print('selected restaurants: ',restaurant_list)  
+                    self.log.info("!!!Error in eval restaurant_list")
+            self.log.info('selected restaurants: ',restaurant_list)  
             self.suggested_restaurants_from_query = restaurant_list  
             self.ranking_restaurants_flag = True
         
@@ -319,14 +313,7 @@ class LLMDrivenAgent(NesyAgent):
 
         ranking_price = np.argsort(np.array(res_price))
 
-        attr_dist = []
-        for i in range(num_restaurants):
-
-            if current_position == res_info.iloc[i]["name"]:
-                attr_dist.append(0)
-            else:
-                transports_sel = self.collect_innercity_transport(self.query["target_city"], current_position, res_info.iloc[i]["name"], current_time, "walk")
-                attr_dist.append(transports_sel[0]["distance"])
+        attr_dist = self.env.call("goto_many", self.query["target_city"], current_position, res_info["name"], current_time, "walk")["distance"]
         
 
         ranking_dist = np.argsort(np.array(attr_dist))
@@ -391,14 +378,14 @@ class LLMDrivenAgent(NesyAgent):
             if num_beds < 1:
                 num_beds = None
         else:
-            print("!!!Error in matching RoomInfo")
+            self.log.info("!!!Error in matching RoomInfo")
             num_rooms, num_beds = None, None
 
             self.llm_rec_format_error += 1
         
         
         # print(answer)
-        print("extracted room_number: ", num_rooms, "room_type:", num_beds)
+        self.log.info("extracted room_number: ", num_rooms, "room_type:", num_beds)
         return num_rooms, num_beds
     def extract_budget(self, query):
 
@@ -421,14 +408,14 @@ class LLMDrivenAgent(NesyAgent):
             if budget < 1:
                 budget = None
         else:
-            print("!!!Error in extracting budget")
+            self.log.info("!!!Error in extracting budget")
             budget = None
 
             self.llm_rec_format_error += 1
         
         
         # print(answer)
-        print("extracted budget: ", budget)
+        self.log.info("extracted budget: ", budget)
         # exit(0)
         return budget
     
@@ -439,7 +426,7 @@ class LLMDrivenAgent(NesyAgent):
         query_message=[{"role": "user", "content": INNERCITY_TRANSPORTS_SELECTION_INSTRUCTION.format(user_requirements=query['nature_language'])}]
         answer=self.backbone_llm(query_message,one_line=False)
 
-        print(answer)
+        self.log.info(answer)
 
         self.llm_inference_time_count += time.time() - time_before
 
@@ -450,11 +437,11 @@ class LLMDrivenAgent(NesyAgent):
             try:
                 TransportRanking = re.findall(r'"([^"]+)"', match.group(1))
             except:
-                print("!!!Error in eval TransportRanking")
+                self.log.info("!!!Error in eval TransportRanking")
                 self.llm_rec_format_error += 1
                 TransportRanking = []
 
-            print('selected TransportRanking: ',TransportRanking) 
+            self.log.info('selected TransportRanking: ',TransportRanking) 
             rank_ = []
             for item in TransportRanking:
                 if item in ["metro", "taxi", "walk"]:
@@ -1,3 +1,4 @@
+import ast
 import sys
 import os
 import time
@@ -5,6 +6,7 @@ import argparse
 import pandas as pd
 import json
 import numpy as np
+from collections import OrderedDict
 
 sys.path.append("./../../../")
 project_root_path = os.path.dirname(
@@ -25,10 +27,9 @@ from agent.nesy_agent.utils import (
 
 # from chinatravel.eval.utils import load_json_file, validate_json, save_json_file
 from chinatravel.data.load_datasets import load_json_file, save_json_file
-from chinatravel.agent.utils import Logger
-from chinatravel.symbol_verification.commonsense_constraint import (
-    func_commonsense_constraints,
-)
+from chinatravel.agent.utils import DEBUG, open_query_log
+from chinatravel.agent.search_state import SearchState
+from chinatravel.symbol_verification.commonsense_constraint import IncrementalCommonsense
 from chinatravel.symbol_verification.hard_constraint import (
     get_symbolic_concepts,
     evaluate_constraints,
@@ -42,6 +43,26 @@ from copy import deepcopy
 
 
 class NesyAgent(BaseAgent):
+    # number of failed search states dfs_poi remembers, see dfs_poi
+    NOGOOD_CACHE_SIZE = 1 << 16
+    # the concepts that read what nogood_signature does not keep of the
+    # earlier activities: their days, their times and the distances and times
+    # of their transports
+    NOGOOD_UNSAFE_CONCEPTS = {
+        "dayactivities",
+        "activity_start_time",
+        "activity_end_time",
+        "activity_time",
+        "poi_distance",
+        "innercity_transport_distance",
+        "innercity_transport_time",
+        "innercity_transport_start_time",
+        "innercity_transport_end_time",
+    }
+    # what lets a constraint see the order of the activities
+    NOGOOD_ORDER_NAMES = {"enumerate", "zip", "reversed", "range", "iter", "next"}
+    NOGOOD_ORDER_METHODS = {"index", "pop", "insert", "reverse", "sort"}
+
     # def __init__(
     #     self,
     #     env,
@@ -72,7 +93,7 @@ class NesyAgent(BaseAgent):
         self.least_plan_schema, self.least_plan_comm = None, None
         self.method = kwargs["method"]
 
-        print("cache dir:", self.cache_dir)
+        self.log.info("cache dir:", self.cache_dir)
         if not os.path.exists(
             os.path.join(self.cache_dir, self.method + "_" + self.backbone_llm.name)
         ):
@@ -80,6 +101,8 @@ class NesyAgent(BaseAgent):
                 os.path.join(self.cache_dir, self.method + "_" + self.backbone_llm.name)
             )
         self.search_width = kwargs.get("search_width", None)
+        self.nogood_cache_size = kwargs.get("nogood_cache_size", self.NOGOOD_CACHE_SIZE)
+        self.use_nogoods = False
 
         self.preference_search = False
         self.prompt_upd = True
@@ -97,7 +120,7 @@ class NesyAgent(BaseAgent):
             self.cache_dir, llm_method, "{}.json".format(query["uid"])
         )
 
-        print(file_path)
+        self.log.info(file_path)
 
         if load_cache and os.path.exists(file_path):
             query = load_json_file(file_path)
@@ -122,18 +145,9 @@ class NesyAgent(BaseAgent):
         if not os.path.exists(self.log_dir):
             os.makedirs(self.log_dir)
 
-        sys.stdout = Logger(
-            "{}/{}.log".format(
-                self.log_dir, query["uid"]
-            ),
-            sys.stdout,
-            self.debug,
-        )
-        sys.stderr = Logger(
-            "{}/{}.error".format(
-                self.log_dir, query["uid"]
-            ),
-            sys.stderr,
+        self.log = open_query_log(
+            "{}/{}.log".format(self.log_dir, query["uid"]),
+            "{}/{}.error".format(self.log_dir, query["uid"]),
             self.debug,
         )
 
@@ -160,7 +174,7 @@ class NesyAgent(BaseAgent):
                 if preference_search:
                     plan_out["preference_value"] = self.least_plan_logic_pvalue
 
-                print("The least plan with logic constraints: ", plan_out)
+                self.log.info("The least plan with logic constraints: ", plan_out)
                 succ = True
 
             elif self.least_plan_comm is not None:
@@ -185,6 +199,7 @@ class NesyAgent(BaseAgent):
 
         plan_out["search_nodes"] = self.search_nodes
         plan_out["backtrack_count"] = self.backtrack_count
+        plan_out["nogood_hits"] = self.nogood_hits
         plan_out["constraints_validation_count"] = self.constraints_validation_count
         plan_out["commonsense_pass_count"] = self.commonsense_pass_count
         plan_out["logical_pass_count"] = self.logical_pass_count
@@ -201,12 +216,15 @@ class NesyAgent(BaseAgent):
             "target_city": query["target_city"],
             "itinerary": plan,
         }
-        print("validate the plan [for query {}]: ".format(query["uid"]))
-        print(res_plan)
+        self.log.debug("validate the plan [for query {}]: ".format(query["uid"]))
+        self.log.debug(res_plan)
 
         self.least_plan_schema = deepcopy(res_plan)
 
-        bool_result = func_commonsense_constraints(query, res_plan, verbose=True)
+        # only the activities added since the last validation are checked
+        bool_result = self.commonsense.check(
+            res_plan, verbose=self.log.enabled(DEBUG)
+        )
 
         # if not bool_result:
         #     exit(0)
@@ -220,21 +238,21 @@ class NesyAgent(BaseAgent):
         except:
             extracted_vars = None
 
-        print(extracted_vars)
+        self.log.debug(extracted_vars)
 
         logical_result = evaluate_constraints_py(query["hard_logic_py"], res_plan, verbose=True)
 
-        print(logical_result)
+        self.log.debug(logical_result)
 
         logical_pass = True
         for idx, item in enumerate(logical_result):
             logical_pass = logical_pass and item
 
             if item:
-                print(query["hard_logic_py"][idx], "passed!")
+                self.log.debug(query["hard_logic_py"][idx], "passed!")
             else:
 
-                print(query["hard_logic_py"][idx], "failed...")
+                self.log.debug(query["hard_logic_py"][idx], "failed...")
         if bool_result and np.sum(logical_result) > self.least_plan_logical_pass:
             self.least_plan_comm = deepcopy(res_plan)
             self.least_plan_logical_pass = np.sum(logical_result)
@@ -247,7 +265,7 @@ class NesyAgent(BaseAgent):
         bool_result = bool_result and logical_pass
 
         if bool_result:
-            print("\n Pass! \n")
+            self.log.debug("\n Pass! \n")
             self.all_constraints_pass += 1
 
             if self.least_plan_logic is None:
@@ -259,33 +277,33 @@ class NesyAgent(BaseAgent):
                     if self.query["preference_opt"] == "maximize":
                         
                         res = evaluate_preference_py([(self.query["preference_opt"], self.query["preference_concept"], self.query["preference_code"])], res_plan)[0]
-                        print(self.query["preference_concept"], res)
+                        self.log.debug(self.query["preference_concept"], res)
 
                         # print(res, self.least_plan_logic_pvalue)
                         if res != -1 and res > self.least_plan_logic_pvalue:
-                            print("preference value [{}]: {} -> {} \n update plan".format(self.query["preference_concept"], self.least_plan_logic_pvalue, res))
+                            self.log.debug("preference value [{}]: {} -> {} \n update plan".format(self.query["preference_concept"], self.least_plan_logic_pvalue, res))
                             self.least_plan_logic_pvalue = res
                             self.least_plan_logic = deepcopy(res_plan)
 
 
                     elif self.query["preference_opt"] == "minimize":
                         res = evaluate_preference_py([(self.query["preference_opt"], self.query["preference_concept"], self.query["preference_code"])] , res_plan)[0]
-                        print(self.query["preference_concept"], res)
+                        self.log.debug(self.query["preference_concept"], res)
 
                         # print(res, self.least_plan_logic_pvalue)
                         if res != -1 and res < self.least_plan_logic_pvalue:
-                            print("preference value [{}]: {} -> {} \n update plan".format(self.query["preference_concept"], self.least_plan_logic_pvalue, res))
+                            self.log.debug("preference value [{}]: {} -> {} \n update plan".format(self.query["preference_concept"], self.least_plan_logic_pvalue, res))
                             self.least_plan_logic_pvalue = res
                             self.least_plan_logic = deepcopy(res_plan)
 
                     else:
                         raise ValueError("Invalid preference_opt")
-                    print(self.least_plan_logic)
+                    self.log.debug(self.least_plan_logic)
                 except Exception as e:
-                    print(e)
-                    print(self.query["preference_code"])
+                    self.log.debug(e)
+                    self.log.debug(self.query["preference_code"])
         else:
-            print("\n Failed \n")
+            self.log.debug("\n Failed \n")
 
         # plan = res_plan
 
@@ -480,13 +498,26 @@ class NesyAgent(BaseAgent):
     ):
 
         if current_time != "" and time_compare_if_earlier_equal("23:00", current_time):
-            print("too late, after 23:00")
+            self.log.debug("too late, after 23:00")
             return True
 
         if current_time != "" and current_day == query["days"] - 1:
             # We should go back in time ...
             transports_ranking = self.innercity_transports_ranking_from_query
 
+            if "back_transport" in poi_plan:
+                too_late = self.too_late_by_bounds(
+                    query,
+                    current_position,
+                    poi_plan["back_transport"]["From"],
+                    current_time,
+                    poi_plan["back_transport"]["BeginTime"],
+                    transports_ranking,
+                )
+                if too_late is not None:
+                    self.search_nodes += 1
+                    return too_late
+
             for transport_type_sel in transports_ranking:
                 
                 self.search_nodes += 1
@@ -502,7 +533,7 @@ class NesyAgent(BaseAgent):
                     )
                     if not isinstance(transports_sel, list):
                         self.backtrack_count += 1
-                        print("inner-city transport error, backtrack...")
+                        self.log.debug("inner-city transport error, backtrack...")
                         continue
 
                     if len(transports_sel) > 0:
@@ -515,7 +546,7 @@ class NesyAgent(BaseAgent):
                     ):
                         flag = False
                 if flag:
-                    print(
+                    self.log.debug(
                         "Can not go back source-city in time, current POI {}, station arrived time: {}".format(
                             current_position, arrived_time
                         )
@@ -527,6 +558,19 @@ class NesyAgent(BaseAgent):
                 hotel_sel = poi_plan["accommodation"]
                 transports_ranking = self.innercity_transports_ranking_from_query
 
+                if "back_transport" in poi_plan:
+                    too_late = self.too_late_by_bounds(
+                        query,
+                        current_position,
+                        hotel_sel["name"],
+                        current_time,
+                        "24:00",
+                        transports_ranking,
+                    )
+                    if too_late is not None:
+                        self.search_nodes += 1
+                        return too_late
+
                 for transport_type_sel in transports_ranking:
                     self.search_nodes += 1
                     flag = True
@@ -540,7 +584,7 @@ class NesyAgent(BaseAgent):
                         )
                         if not isinstance(transports_sel, list):
                             self.backtrack_count += 1
-                            print("inner-city transport error, backtrack...")
+                            self.log.debug("inner-city transport error, backtrack...")
                             continue
 
                         flag = True
@@ -554,7 +598,7 @@ class NesyAgent(BaseAgent):
                         if not time_compare_if_earlier_equal("24:00", arrived_time):
                             flag = False
                     if flag:
-                        print(
+                        self.log.debug(
                             "Can not go back to hotel, current POI {}, hotel arrived time: {}".format(
                                 current_position, arrived_time
                             )
@@ -563,6 +607,31 @@ class NesyAgent(BaseAgent):
 
         return False
 
+    def too_late_by_bounds(
+        self, query, current_position, target, current_time, deadline, transports_ranking
+    ):
+        """
+        check_if_too_late from the bounds of the travel times, without goto:
+        True if every route reaches target at or after deadline, False if
+        none does, None if the deadline falls between the bounds.
+        """
+        bounds = self.env.call(
+            "arrival_bounds", query["target_city"], current_position, target, current_time
+        )
+        if bounds is None:
+            return None
+        earliest, latest = bounds
+        hour, minute = deadline.split(":")
+        deadline = int(hour) * 60 + int(minute)
+        if latest < deadline:
+            return False
+        # walk and taxi always have a route, the metro may not
+        if earliest >= deadline and (
+            "walk" in transports_ranking or "taxi" in transports_ranking
+        ):
+            return True
+        return None
+
     def reranking_intercity_transport_go_with_constraints(
         self, ranking_go, go_info, query
     ):
@@ -771,7 +840,7 @@ class NesyAgent(BaseAgent):
                 )
                 if not isinstance(transports_sel, list):
                     self.backtrack_count += 1
-                    print("inner-city transport error, backtrack...")
+                    self.log.debug("inner-city transport error, backtrack...")
                     continue
 
                 if len(transports_sel) == 0:
@@ -841,6 +910,9 @@ class NesyAgent(BaseAgent):
         pass_num_list = []
         ### check constraints
 
+        taxi_transports = self.collect_innercity_transports(
+            query["target_city"], current_position, attr_info["name"], current_time, "taxi"
+        )
         for idx in range(len(attr_info)):
             poi_sel = attr_info.iloc[idx]
             self.search_nodes += 1
@@ -848,16 +920,10 @@ class NesyAgent(BaseAgent):
                 transports_sel = []
                 arrived_time = current_time
             else:
-                transports_sel = self.collect_innercity_transport(
-                    query["target_city"],
-                    current_position,
-                    poi_sel["name"],
-                    current_time,
-                    "taxi",
-                )
+                transports_sel = taxi_transports[idx]
                 if not isinstance(transports_sel, list):
                     self.backtrack_count += 1
-                    print("inner-city transport error, backtrack...")
+                    self.log.debug("inner-city transport error, backtrack...")
                     continue
 
                 if len(transports_sel) == 0:
@@ -903,6 +969,90 @@ class NesyAgent(BaseAgent):
     def dfs_poi(
         self, query, poi_plan, plan, current_time, current_position, current_day=0
     ):
+        """
+        search_poi with a bounded cache of the states it failed from (nogoods),
+        so that a state reached again by another order of the earlier
+        activities is cut at once. A state is the day, time and position with
+        what the rest of the search depends on: today's meals, the costs and,
+        for each earlier activity, its POI, type, inner-city transport type
+        and cost. The cache is only used for the queries whose constraints
+        read nothing else of the earlier activities (see
+        nogood_cache_applies), so that it never changes the plans found.
+        nogood_cache_size=0 turns it off for all queries.
+        """
+        if current_time == "":
+            # a new search, the states failed with other transports or hotel
+            # do not tell anything
+            self.nogoods = OrderedDict()
+        signature = self.nogood_signature(
+            plan, current_time, current_position, current_day
+        )
+        if signature is not None and signature in self.nogoods:
+            self.nogoods.move_to_end(signature)
+            self.nogood_hits += 1
+            self.backtrack_count += 1
+            self.log.debug("state failed before, backtrack...")
+            return False, plan
+
+        success, plan = self.search_poi(
+            query, poi_plan, plan, current_time, current_position, current_day
+        )
+        if not success and signature is not None:
+            self.nogoods[signature] = None
+            if len(self.nogoods) > self.nogood_cache_size:
+                self.nogoods.popitem(last=False)
+        return success, plan
+
+    def nogood_signature(self, plan, current_time, current_position, current_day):
+        # None when the state is not cached: at the start of the search,
+        # where the plan is not built yet, or with the cache off
+        if not self.use_nogoods or current_time == "":
+            return None
+        state = self.search_state.sync(plan)
+        return (
+            current_day,
+            current_time,
+            current_position,
+            state.has_activity(current_day, "lunch"),
+            state.has_activity(current_day, "dinner"),
+            state.poi_cost,
+            state.innercity_cost,
+            tuple(sorted(state.arrivals.items())),
+        )
+
+    def nogood_cache_applies(self, query):
+        """
+        Whether the failed states can be cut for the query: no preference is
+        optimized and its hard constraints read the earlier activities only
+        through what nogood_signature keeps, i.e. they use none of the
+        NOGOOD_UNSAFE_CONCEPTS and nothing that tells the order of the
+        activities (indexing, break, enumerate, ...).
+        """
+        if self.nogood_cache_size <= 0 or self.preference_search:
+            return False
+        for code in query.get("hard_logic_py", []):
+            try:
+                tree = ast.parse(code)
+            except SyntaxError:
+                return False
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.Subscript, ast.Break)):
+                    return False
+                if isinstance(node, ast.Name) and (
+                    node.id in self.NOGOOD_UNSAFE_CONCEPTS
+                    or node.id in self.NOGOOD_ORDER_NAMES
+                ):
+                    return False
+                if (
+                    isinstance(node, ast.Attribute)
+                    and node.attr in self.NOGOOD_ORDER_METHODS
+                ):
+                    return False
+        return True
+
+    def search_poi(
+        self, query, poi_plan, plan, current_time, current_position, current_day=0
+    ):
 
         self.search_nodes += 1
         if (
@@ -916,24 +1066,16 @@ class NesyAgent(BaseAgent):
             query, current_day, current_time, current_position, poi_plan
         ):
             self.backtrack_count += 1
-            print("The current time is too late to go hotel or back-transport, backtrack...")
+            self.log.debug("The current time is too late to go hotel or back-transport, backtrack...")
             return False, plan
 
         if self.required_budget != None:
-            total_cost = 0
-            for day_activities in plan:
-                for activity in day_activities["activities"]:
-                    if activity["type"] in [
-                        "breakfast",
-                        "lunch",
-                        "dinner",
-                        "attraction",
-                    ]:
-                        total_cost += activity["cost"]
+            # cost of the meals and attractions
+            total_cost = self.search_state.sync(plan).poi_cost
 
             if total_cost + self.intercity_with_hotel_cost > self.required_budget:
                 self.backtrack_count += 1
-                print("budget exceeded, backtrack...")
+                self.log.debug("budget exceeded, backtrack...")
                 return False, plan
 
         # intercity_transport - go
@@ -954,7 +1096,7 @@ class NesyAgent(BaseAgent):
                 return True, plan
             else:
                 self.backtrack_count += 1
-                print("No solution for the given Go Transport, backtrack...")
+                self.log.debug("No solution for the given Go Transport, backtrack...")
                 return False, plan
 
         # breakfast
@@ -984,18 +1126,14 @@ class NesyAgent(BaseAgent):
             else:
 
                 self.backtrack_count += 1
-                print("No solution for the given Breakfast, backtrack...")
+                self.log.debug("No solution for the given Breakfast, backtrack...")
 
                 return False, plan
 
         else:
-            haved_lunch_today, haved_dinner_today = False, False
-
-            for act_i in plan[current_day]["activities"]:
-                if act_i["type"] == "lunch":
-                    haved_lunch_today = True
-                if act_i["type"] == "dinner":
-                    haved_dinner_today = True
+            self.search_state.sync(plan)
+            haved_lunch_today = self.search_state.has_activity(current_day, "lunch")
+            haved_dinner_today = self.search_state.has_activity(current_day, "dinner")
 
             candidates_type = ["attraction"]
             if not haved_lunch_today:
@@ -1007,7 +1145,7 @@ class NesyAgent(BaseAgent):
             if current_day == query["days"] - 1 and current_time != "":
                 candidates_type.append("back-intercity-transport")
 
-        print("candidates_type: ", candidates_type)
+        self.log.debug("candidates_type: ", candidates_type)
 
         while len(candidates_type) > 0:
 
@@ -1020,7 +1158,7 @@ class NesyAgent(BaseAgent):
                 current_position,
             )
 
-            print(
+            self.log.debug(
                 "POI planning, day {} {}, {}, next-poi type: {}".format(
                     current_day, current_time, current_position, poi_type
                 )
@@ -1044,7 +1182,7 @@ class NesyAgent(BaseAgent):
                     )
                     if not isinstance(transports_sel, list):
                         self.backtrack_count += 1
-                        print("inner-city transport error, backtrack...")
+                        self.log.debug("inner-city transport error, backtrack...")
                         continue
 
                     plan[current_day]["activities"] = self.add_intercity_transport(
@@ -1064,7 +1202,7 @@ class NesyAgent(BaseAgent):
                         plan[current_day]["activities"].pop()
                         self.backtrack_count += 1
 
-                        print(
+                        self.log.debug(
                             "Back-transport, but constraints_validation failed, backtrack..."
                         )
                         return False, plan
@@ -1090,7 +1228,7 @@ class NesyAgent(BaseAgent):
                         )
                         if not isinstance(transports_sel, list):
                             self.backtrack_count += 1
-                            print("inner-city transport error, backtrack...")
+                            self.log.debug("inner-city transport error, backtrack...")
                             continue
 
                         if len(transports_sel) == 0:
@@ -1119,7 +1257,7 @@ class NesyAgent(BaseAgent):
                         return True, plan
 
                     self.backtrack_count += 1
-                    print("Fail with the given accommodation activity, backtrack...")
+                    self.log.debug("Fail with the given accommodation activity, backtrack...")
 
                     plan[current_day]["activities"].pop()
             elif poi_type in ["lunch", "dinner", "attraction"]:
@@ -1149,7 +1287,7 @@ class NesyAgent(BaseAgent):
                     for sea_i, r_i in enumerate(ranking_idx):
 
                         if self.search_width != None and sea_i >= self.search_width:
-                            print(
+                            self.log.debug(
                                 "Out of search_width [{}], break".format(
                                     self.search_width
                                 )
@@ -1163,7 +1301,7 @@ class NesyAgent(BaseAgent):
                             if res_idx < 0 or res_idx >= len(
                                 self.memory["restaurants"]
                             ):
-                                print("index error: ", res_idx, len(self.memory["restaurants"]))
+                                self.log.debug("index error: ", res_idx, len(self.memory["restaurants"]))
 
                             poi_sel = self.memory["restaurants"].iloc[res_idx]
 
@@ -1183,7 +1321,7 @@ class NesyAgent(BaseAgent):
                                 )
                                 if not isinstance(transports_sel, list):
                                     self.backtrack_count += 1
-                                    print("inner-city transport error, backtrack...")
+                                    self.log.debug("inner-city transport error, backtrack...")
                                     continue
 
                                 if len(transports_sel) == 0:
@@ -1203,7 +1341,7 @@ class NesyAgent(BaseAgent):
                                     )
                                 except:
                                     self.backtrack_count += 1
-                                    print("add_restaurant failed, backtrack...")
+                                    self.log.debug("add_restaurant failed, backtrack...")
                                     continue
 
                                 new_time = plan[current_day]["activities"][-1][
@@ -1224,7 +1362,7 @@ class NesyAgent(BaseAgent):
                                     return True, plan
 
                                 self.backtrack_count += 1
-                                print("add_restaurant failed, backtrack...")
+                                self.log.debug("add_restaurant failed, backtrack...")
 
                                 plan[current_day]["activities"].pop()
                                 self.restaurants_visiting.pop()
@@ -1256,7 +1394,7 @@ class NesyAgent(BaseAgent):
                     for sea_i, r_i in enumerate(ranking_idx):
 
                         if self.search_width != None and sea_i >= self.search_width:
-                            print(
+                            self.log.debug(
                                 "Out of search_width [{}], break".format(
                                     self.search_width
                                 )
@@ -1269,7 +1407,7 @@ class NesyAgent(BaseAgent):
                             if attr_idx < 0 or attr_idx >= len(
                                 self.memory["attractions"]
                             ):
-                                print(attr_idx, len(self.memory["attractions"]))
+                                self.log.debug(attr_idx, len(self.memory["attractions"]))
 
                             poi_sel = self.memory["attractions"].iloc[attr_idx]
                             # print(current_position, poi_sel["name"])
@@ -1289,7 +1427,7 @@ class NesyAgent(BaseAgent):
                                 )
                                 if not isinstance(transports_sel, list):
                                     self.backtrack_count += 1
-                                    print("inner-city transport error, backtrack...")
+                                    self.log.debug("inner-city transport error, backtrack...")
                                     continue
                                 if len(transports_sel) == 0:
                                     arrived_time = current_time
@@ -1303,13 +1441,13 @@ class NesyAgent(BaseAgent):
                                 # too late
                                 if time_compare_if_earlier_equal("21:00", arrived_time):
                                     self.backtrack_count += 1
-                                    print("The current time is too late...")
+                                    self.log.debug("The current time is too late...")
                                     continue
 
                                 # it is closed ...
                                 if time_compare_if_earlier_equal(endtime, arrived_time):
                                     self.backtrack_count += 1
-                                    print("The attraction is closed now...")
+                                    self.log.debug("The attraction is closed now...")
                                     continue
 
                                 if time_compare_if_earlier_equal(
@@ -1368,7 +1506,7 @@ class NesyAgent(BaseAgent):
                                     return True, plan
 
                                 self.backtrack_count += 1
-                                print("add_attraction failed, backtrack...")
+                                self.log.debug("add_attraction failed, backtrack...")
 
                                 plan[current_day]["activities"].pop()
                                 self.attractions_visiting.pop()
@@ -1397,7 +1535,7 @@ class NesyAgent(BaseAgent):
                         )
                         if not isinstance(transports_sel, list):
                             self.backtrack_count += 1
-                            print("inner-city transport error, backtrack...")
+                            self.log.debug("inner-city transport error, backtrack...")
                             continue
 
                         plan[current_day]["activities"] = self.add_intercity_transport(
@@ -1418,7 +1556,7 @@ class NesyAgent(BaseAgent):
                             
                             self.backtrack_count += 1
 
-                            print(
+                            self.log.debug(
                                 "Back-transport, but constraints_validation failed, backtrack..."
                             )
                             # return False, plan
@@ -1440,7 +1578,7 @@ class NesyAgent(BaseAgent):
                         )
                         if not isinstance(transports_sel, list):
                             self.backtrack_count += 1
-                            print("inner-city transport error, backtrack...")
+                            self.log.debug("inner-city transport error, backtrack...")
                             continue
 
                         if len(transports_sel) == 0:
@@ -1474,18 +1612,18 @@ class NesyAgent(BaseAgent):
                             return True, plan
                         else:
                             self.backtrack_count += 1
-                            print("Try the go back hotel, failed, backtrack...")
+                            self.log.debug("Try the go back hotel, failed, backtrack...")
 
                             plan[current_day]["activities"].pop()
 
                             # return False, plan
             else:
                 # raise Exception("Not Implemented.")
-                print("incorrect poi type: {}".format(poi_type))
+                self.log.debug("incorrect poi type: {}".format(poi_type))
                 continue
 
             candidates_type.remove(poi_type)
-            print("try another poi type, backtrack...")
+            self.log.debug("try another poi type, backtrack...")
 
         return False, plan
 
@@ -1494,7 +1632,7 @@ class NesyAgent(BaseAgent):
         source_city = query["start_city"]
         target_city = query["target_city"]
 
-        print(source_city, "->", target_city)
+        self.log.info(source_city, "->", target_city)
 
         train_go = self.collect_intercity_transport(source_city, target_city, "train")
         train_back = self.collect_intercity_transport(target_city, source_city, "train")
@@ -1520,19 +1658,19 @@ class NesyAgent(BaseAgent):
         back_info = pd.concat([train_back, flight_back], axis=0)
 
         if self.debug:
-            print(
+            self.log.info(
                 "from {} to {}: {} flights, {} trains".format(
                     source_city, target_city, flight_go_num, train_go_num
                 )
             )
-            print(
+            self.log.info(
                 "from {} to {}: {} flights, {} trains".format(
                     target_city, source_city, flight_back_num, train_back_num
                 )
             )
 
-            print(go_info.head())
-            print(back_info.head())
+            self.log.info(go_info.head())
+            self.log.info(back_info.head())
 
         self.time_before_search = time.time()
         self.llm_inference_time_count = 0
@@ -1552,7 +1690,11 @@ class NesyAgent(BaseAgent):
         self.llm_rec_count = 0
         self.search_nodes = 0
         self.backtrack_count = 0
+        self.nogood_hits = 0
+        self.use_nogoods = self.nogood_cache_applies(query)
 
+        self.commonsense = IncrementalCommonsense(query)
+        self.search_state = SearchState()
         self.constraints_validation_count = 0 
         self.commonsense_pass_count = 0
         self.logical_pass_count = 0
@@ -1604,7 +1746,7 @@ class NesyAgent(BaseAgent):
 
                         if query_room_type != None and query_room_type != room_type:
                             self.backtrack_count += 1
-                            print("room_type not match, backtrack...")
+                            self.log.info("room_type not match, backtrack...")
                             continue
 
                         if query_room_number != None:
@@ -1624,7 +1766,7 @@ class NesyAgent(BaseAgent):
                                     pass
                                 else:
                                     self.backtrack_count += 1
-                                    print("room_number * room_type not match, backtrack...")
+                                    self.log.info("room_number * room_type not match, backtrack...")
                                 continue
                         self.required_rooms = required_rooms
 
@@ -1644,10 +1786,10 @@ class NesyAgent(BaseAgent):
                             * 100
                         ):
                             self.backtrack_count += 1
-                            print("required_budget - intercity_with_hotel_cost <= 100 * people_number * (days-1), backtrack...")
+                            self.log.info("required_budget - intercity_with_hotel_cost <= 100 * people_number * (days-1), backtrack...")
                             continue
 
-                        print("search: ...")
+                        self.log.info("search: ...")
                         try:
                             success, plan = self.dfs_poi(
                                 query,
@@ -1657,20 +1799,20 @@ class NesyAgent(BaseAgent):
                                 current_position="",
                             )
                         except TimeOutError as e:
-                            print("TimeOutError")
+                            self.log.info("TimeOutError")
                             return False, {"error_info": "TimeOutError"}
                         # exit(0)
 
-                        print(success, plan)
+                        self.log.info(success, plan)
                         if success:
                             return True, plan
                         else:
                             if time.time() > self.time_before_search + self.TIME_CUT:
-                                print("Searching TIME OUT !!!")
+                                self.log.info("Searching TIME OUT !!!")
                                 return False, {"error_info": "TimeOutError"}
 
                             self.backtrack_count += 1
-                            print("search failed given the intercity-transport and hotels, backtrack...")
+                            self.log.info("search failed given the intercity-transport and hotels, backtrack...")
 
                 else:
                     if time_compare_if_earlier_equal(
@@ -1678,14 +1820,14 @@ class NesyAgent(BaseAgent):
                         poi_plan["go_transport"]["EndTime"],
                     ):
                         self.backtrack_count += 1
-                        print("back_transport BeginTime earlier than go_transport EndTime, backtrack...")
+                        self.log.info("back_transport BeginTime earlier than go_transport EndTime, backtrack...")
                         continue
 
                     self.intercity_with_hotel_cost = (
                         poi_plan["go_transport"]["Cost"]
                         + poi_plan["back_transport"]["Cost"]
                     ) * query["people_number"]
-                    print("search: ...")
+                    self.log.info("search: ...")
                     try:
                         success, plan = self.dfs_poi(
                             query,
@@ -1695,19 +1837,19 @@ class NesyAgent(BaseAgent):
                             current_position="",
                         )
                     except TimeOutError as e:
-                        print("TimeOutError")
+                        self.log.info("TimeOutError")
                         return False, {"error_info": "TimeOutError"}
 
-                    print(success, plan)
+                    self.log.info(success, plan)
                     if success:
                         return True, plan
                     else:
                         if time.time() > self.time_before_search + self.TIME_CUT:
-                            print("Searching TIME OUT !!!")
+                            self.log.info("Searching TIME OUT !!!")
                             return False, {"error_info": "TimeOutError"}
                         
                         self.backtrack_count += 1
-                        print("search failed given the intercity-transport and hotels, backtrack...")
+                        self.log.info("search failed given the intercity-transport and hotels, backtrack...")
 
 
         return False, {"error_info": "No solution found."}
@@ -1737,7 +1879,7 @@ class NesyAgent(BaseAgent):
             symoblic_query["preference_opt"] = concept.split(" ")[0]
             symoblic_query["preference_concept"] = concept.split(" ")[1]
             symoblic_query["preference_code"] = code
-            print(symoblic_query["preference_opt"], "\n", symoblic_query["preference_concept"], "\n", symoblic_query["preference_code"])
+            self.log.info(symoblic_query["preference_opt"], "\n", symoblic_query["preference_concept"], "\n", symoblic_query["preference_code"])
 
             if symoblic_query["preference_opt"] == "maximize":
                 self.least_plan_logic_pvalue = -19260817
@@ -1766,7 +1908,7 @@ class NesyAgent(BaseAgent):
 
         success, plan = self.generate_plan_with_search(symoblic_query)
 
-        print(success, plan)
+        self.log.info(success, plan)
 
         return success, plan
 
@@ -1808,25 +1950,51 @@ class NesyAgent(BaseAgent):
 
         return info
 
+    def collect_innercity_transports(self, city, start, ends, start_time, trans_type):
+        """
+        collect_innercity_transport from start to each of ends, from one
+        goto_many call. Only for walk and taxi, whose routes have one leg.
+        """
+        routes = self.env.call("goto_many", city, start, ends, start_time, trans_type)
+        transports = []
+        for end, end_minutes, cost, distance in zip(
+            ends,
+            routes["end_time"].tolist(),
+            routes["cost"].tolist(),
+            routes["distance"].tolist(),
+        ):
+            if start == end:
+                transports.append([])
+                continue
+            if np.isnan(end_minutes):
+                transports.append("No solution")
+                continue
+            end_minutes = int(end_minutes)
+            info = {
+                "start": start,
+                "end": end,
+                "mode": trans_type,
+                "start_time": start_time,
+                "end_time": "{:02d}:{:02d}".format(end_minutes // 60, end_minutes % 60),
+                "cost": cost,
+                "distance": distance,
+                "price": cost,
+            }
+            if trans_type == "taxi":
+                info["cars"] = int((self.query["people_number"] - 1) / 4) + 1
+                info["cost"] = info["price"] * info["cars"]
+            transports.append([info])
+        return transports
+
     def collect_intercity_transport(self, source_city, target_city, trans_type):
 
-        info_return = self.env(
-            "intercity_transport_select('{source_city}', '{target_city}', '{trans_type}')".format(
-                source_city=source_city, target_city=target_city, trans_type=trans_type
+        try:
+            trans_info = self.env.call(
+                "intercity_transport_select", source_city, target_city, trans_type
             )
-        )
-        if not info_return["success"]:
+        except Exception:
             return pd.DataFrame([])
-        trans_info = info_return["data"]
-        # print(poi_info)
-        while True:
-            info_i = self.env("next_page()")["data"]
-            if len(info_i) == 0:
-                break
-            else:
-                trans_info = pd.concat([trans_info, info_i], axis=0, ignore_index=True)
-        # print(poi_info)
-        return trans_info
+        return trans_info.reset_index(drop=True)
 
     def collect_poi_info_all(self, city, poi_type):
 
@@ -1839,16 +2007,8 @@ class NesyAgent(BaseAgent):
         else:
             raise NotImplementedError
 
-        poi_info = self.env(
-            "{func}('{city}', 'name', lambda x: True)".format(func=func_name, city=city)
-        )["data"]
-        # print(poi_info)
-        while True:
-            info_i = self.env("next_page()")["data"]
-            if len(info_i) == 0:
-                break
-            else:
-                poi_info = pd.concat([poi_info, info_i], axis=0, ignore_index=True)
+        poi_info = self.env.call(func_name, city, "name", lambda x: True)
+        poi_info = poi_info.reset_index(drop=True)
 
         # print(poi_info)
         return poi_info
@@ -10,9 +10,8 @@ if project_path not in sys.path:
 
 import json
 from tqdm import tqdm
-from copy import deepcopy
 from chinatravel.agent.llms import Deepseek, GPT4o, Qwen, Mistral, GLM4Plus
-from chinatravel.symbol_verification.concept_func import func_dict
+from chinatravel.symbol_verification.concept_func import func_dict, compile_concept_code
 from chinatravel.agent.nesy_agent.prompts import NL2SL_INSTRUCTION
 from chinatravel.agent.nesy_agent.ast_checker import HardLogicPyChecker
 from chinatravel.data.load_datasets import save_json_file, load_json_file
@@ -317,12 +316,12 @@ def check(query):
     
     example_plan = EXAMPLE_PLANS[query["days"]]
     for idx, constraint in enumerate(hard_logic_py):
-        vars_dict = deepcopy(func_dict)
+        vars_dict = dict(func_dict)
         vars_dict["plan"] = example_plan
         try:
             # Evaluate the constraint in a safe manner
             exec(
-                constraint,
+                compile_concept_code(constraint),
                 {
                     "__builtins__": {
                         "set": set,
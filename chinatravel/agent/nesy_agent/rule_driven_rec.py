@@ -68,7 +68,7 @@ class RuleDrivenAgent(NesyAgent):
 
         # ranking by cost
 
-        print(hotel_info.head())
+        self.log.debug(hotel_info.head())
 
         num_hotel = hotel_info.shape[0]
 
@@ -94,7 +94,7 @@ class RuleDrivenAgent(NesyAgent):
     ):
 
         if current_time != "" and time_compare_if_earlier_equal("23:00", current_time):
-            print("too late, after 23:00")
+            self.log.debug("too late, after 23:00")
             return True
 
         if current_time != "" and current_day == query["days"] - 1:
@@ -106,6 +106,17 @@ class RuleDrivenAgent(NesyAgent):
                 current_time,
             )
 
+            too_late = self.too_late_by_bounds(
+                query,
+                current_position,
+                poi_plan["back_transport"]["From"],
+                current_time,
+                poi_plan["back_transport"]["BeginTime"],
+                transports_ranking,
+            )
+            if too_late is not None:
+                return too_late
+
             for transport_type_sel in transports_ranking:
 
                 flag = True
@@ -129,7 +140,7 @@ class RuleDrivenAgent(NesyAgent):
                     ):
                         flag = False
                 if flag:
-                    print(
+                    self.log.debug(
                         "Can not go back source-city in time, current POI {}, station arrived time: {}".format(
                             current_position, arrived_time
                         )
@@ -143,6 +154,18 @@ class RuleDrivenAgent(NesyAgent):
                     current_position, hotel_sel["name"], current_day, current_time
                 )
 
+                if "back_transport" in poi_plan:
+                    too_late = self.too_late_by_bounds(
+                        query,
+                        current_position,
+                        hotel_sel["name"],
+                        current_time,
+                        "24:00",
+                        transports_ranking,
+                    )
+                    if too_late is not None:
+                        return too_late
+
                 for transport_type_sel in transports_ranking:
 
                     flag = True
@@ -165,7 +188,7 @@ class RuleDrivenAgent(NesyAgent):
                         if not time_compare_if_earlier_equal("24:00", arrived_time):
                             flag = False
                     if flag:
-                        print(
+                        self.log.debug(
                             "Can not go back to hotel, current POI {}, hotel arrived time: {}".format(
                                 current_position, arrived_time
                             )
@@ -262,19 +285,14 @@ class RuleDrivenAgent(NesyAgent):
         attr_weight = np.ones(num_attractions)
         attr_info = self.memory["attractions"]
 
-        attr_dist = []
-        for i in range(num_attractions):
-            transports_sel = self.collect_innercity_transport(
-                self.query["target_city"],
-                current_position,
-                attr_info.iloc[i]["name"],
-                current_time,
-                "walk",
-            )
-            if len(transports_sel) == 0:
-                attr_dist.append(0)
-            else:
-                attr_dist.append(transports_sel[0]["distance"])
+        attr_dist = self.env.call(
+            "goto_many",
+            self.query["target_city"],
+            current_position,
+            attr_info["name"],
+            current_time,
+            "walk",
+        )["distance"]
         # print(attr_dist)
 
         ranking_idx = np.argsort(np.array(attr_dist))
@@ -308,19 +326,14 @@ class RuleDrivenAgent(NesyAgent):
 
         ranking_price = np.argsort(np.array(res_price))
 
-        attr_dist = []
-        for i in range(num_restaurants):
-            transports_sel = self.collect_innercity_transport(
-                self.query["target_city"],
-                current_position,
-                res_info.iloc[i]["name"],
-                current_time,
-                "walk",
-            )
-            if len(transports_sel) == 0:
-                attr_dist.append(0)
-            else:            
-                attr_dist.append(transports_sel[0]["distance"])
+        attr_dist = self.env.call(
+            "goto_many",
+            self.query["target_city"],
+            current_position,
+            res_info["name"],
+            current_time,
+            "walk",
+        )["distance"]
 
         ranking_dist = np.argsort(np.array(attr_dist))
 
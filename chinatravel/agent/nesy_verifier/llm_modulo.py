@@ -21,7 +21,7 @@ from agent.nesy_verifier.verifier.personal_constraint_nl import collect_personal
 import pandas as pd
 import ast
 
-from chinatravel.agent.utils import Logger
+from chinatravel.agent.utils import open_query_log
 
 import numpy as np
 import re
@@ -61,34 +61,17 @@ class LLMModuloAgent(BaseAgent):
         else:
             raise NotImplementedError
 
-        poi_info = self.env(
-            "{func}('{city}', 'name', lambda x: True)".format(func=func_name, city=city)
-        )["data"]
-        # print(poi_info)
-        while True:
-            info_i = self.env("next_page()")["data"]
-            if len(info_i) == 0:
-                break
-            else:
-                poi_info = pd.concat([poi_info, info_i], axis=0, ignore_index=True)
+        poi_info = self.env.call(func_name, city, "name", lambda x: True)
+        poi_info = poi_info.reset_index(drop=True)
 
         poi_info = poi_info.rename(columns={'cost': 'price'})
         return poi_info
 
     def collect_intercity_transport(self, source_city, target_city, trans_type):
-        trans_info = self.env(
-            "intercity_transport_select('{source_city}', '{target_city}', '{trans_type}')".format(
-                source_city=source_city, target_city=target_city, trans_type=trans_type
-            )
-        )["data"]
-        # print(poi_info)
-        while True:
-            info_i = self.env("next_page()")["data"]
-            if len(info_i) == 0:
-                break
-            else:
-                trans_info = pd.concat([trans_info, info_i], axis=0, ignore_index=True)
-        # print(poi_info)
+        trans_info = self.env.call(
+            "intercity_transport_select", source_city, target_city, trans_type
+        )
+        trans_info = trans_info.reset_index(drop=True)
         trans_info = trans_info.rename(columns={'Cost': 'price'})
         return trans_info
     
@@ -135,19 +118,10 @@ class LLMModuloAgent(BaseAgent):
 
     def solve(self, problem, prob_idx, oracle_verifier):
         
-        sys.stdout = Logger(
-            "{}/problem_{}.log".format(
-                self.log_dir, problem["uid"]
-            ),
-            sys.stdout,
-            debug_mode=True,
-        )
-        sys.stderr = Logger(
-            "{}/problem_{}.error".format(
-                self.log_dir, problem["uid"]
-            ),
-            sys.stderr,
-            debug_mode=True,
+        self.log = open_query_log(
+            "{}/problem_{}.log".format(self.log_dir, problem["uid"]),
+            "{}/problem_{}.error".format(self.log_dir, problem["uid"]),
+            debug=True,
         )
 
         self.reset_clock()
@@ -168,7 +142,7 @@ class LLMModuloAgent(BaseAgent):
         source_city = problem["start_city"]
         target_city = problem["target_city"]
 
-        print(source_city, "->", target_city)
+        self.log.info(source_city, "->", target_city)
         self.memory["train_go"] = self.collect_intercity_transport(source_city, target_city, "train")
         self.memory["train_back"] = self.collect_intercity_transport(target_city, source_city, "train")
         self.memory["flight_go"] = self.collect_intercity_transport(source_city, target_city, "airplane")
@@ -186,8 +160,24 @@ class LLMModuloAgent(BaseAgent):
         )
 
         # print(self.memory)
-        selected_go_train_index, selected_go_flight_index = self.select_intercity_transport_go(self.memory["train_go"], self.memory["flight_go"], problem, required_num=self.num_candidates_intercity_transports)        
-        selected_back_train_index, selected_back_flight_index = self.select_intercity_transport_back(self.memory["train_back"], self.memory["flight_back"], problem, required_num=self.num_candidates_intercity_transports)
+
+        # the five candidate selections do not depend on each other: ask for
+        # them in one batch, which a local model generates together
+        time_before = time.time()
+        go_answer, back_answer, accommodation_answer, attraction_answer, restaurant_answer = self.backbone_llm.batch(
+            [
+                self.intercity_transport_go_message(self.memory["train_go"], self.memory["flight_go"], problem, required_num=self.num_candidates_intercity_transports),
+                self.intercity_transport_back_message(self.memory["train_back"], self.memory["flight_back"], problem, required_num=self.num_candidates_intercity_transports),
+                self.accommodation_message(self.memory["accommodations"], problem, required_num=self.num_candidates_accommodations),
+                self.attraction_message(self.memory["attractions"], problem, required_num=self.num_candidates_attractions),
+                self.restaurant_message(self.memory["restaurants"], problem, required_num=self.num_candidates_restaurants),
+            ],
+            one_line=False,
+        )
+        self.llm_inference_time_count += time.time() - time_before
+
+        selected_go_train_index, selected_go_flight_index = self.select_intercity_transport_go(self.memory["train_go"], self.memory["flight_go"], problem, required_num=self.num_candidates_intercity_transports, answer=go_answer)        
+        selected_back_train_index, selected_back_flight_index = self.select_intercity_transport_back(self.memory["train_back"], self.memory["flight_back"], problem, required_num=self.num_candidates_intercity_transports, answer=back_answer)
         
         if len(selected_go_train_index) > 0: 
             selected_go_train = self.memory["train_go"].iloc[selected_go_train_index].to_csv(sep='\t', na_rep='nan', index=False)
@@ -206,20 +196,20 @@ class LLMModuloAgent(BaseAgent):
         else:
             selected_back_flight = "None"
 
-        print("selected go transport: \n", selected_go_train, "\n", selected_go_flight)
-        print("selected back transport: \n", selected_back_train, "\n", selected_back_flight)
+        self.log.info("selected go transport: \n", selected_go_train, "\n", selected_go_flight)
+        self.log.info("selected back transport: \n", selected_back_train, "\n", selected_back_flight)
 
-        selected_accommodation_index = self.select_accommodation(self.memory["accommodations"], problem, required_num=self.num_candidates_accommodations)
+        selected_accommodation_index = self.select_accommodation(self.memory["accommodations"], problem, required_num=self.num_candidates_accommodations, answer=accommodation_answer)
         selected_hotel_info = self.memory["accommodations"].iloc[selected_accommodation_index].drop(["id", "hotelname_en"], axis=1).to_csv(sep='\t', na_rep='nan', index=False)
-        print("selected hotel: \n", selected_hotel_info)
+        self.log.info("selected hotel: \n", selected_hotel_info)
 
-        selected_attraction_index = self.select_attraction(self.memory["attractions"], problem, required_num=self.num_candidates_attractions)
+        selected_attraction_index = self.select_attraction(self.memory["attractions"], problem, required_num=self.num_candidates_attractions, answer=attraction_answer)
         selected_attraction_info = self.memory["attractions"].iloc[selected_attraction_index].drop(["id"], axis=1).to_csv(sep='\t', na_rep='nan', index=False)
-        print("selected attraction: \n", selected_attraction_info)
+        self.log.info("selected attraction: \n", selected_attraction_info)
 
-        selected_restaurant_index = self.select_restaurant(self.memory["restaurants"], problem, required_num=self.num_candidates_restaurants)
+        selected_restaurant_index = self.select_restaurant(self.memory["restaurants"], problem, required_num=self.num_candidates_restaurants, answer=restaurant_answer)
         selected_restaurant_info = self.memory["restaurants"].iloc[selected_restaurant_index].drop(["id"], axis=1).to_csv(sep='\t', na_rep='nan', index=False)
-        print("selected restaurant: \n", selected_restaurant_info)
+        self.log.info("selected restaurant: \n", selected_restaurant_info)
         
         POI_set = set()
         def add_poi_name(df, key):
@@ -236,11 +226,11 @@ class LLMModuloAgent(BaseAgent):
         add_poi_name(self.memory["restaurants"].iloc[selected_restaurant_index], "name")
 
         POI_list = list(POI_set)
-        print(POI_list)
+        self.log.info(POI_list)
 
         np.random.seed(19260817)
 
-        print(f"collecting innercity transport for {len(POI_list)} POIs ...")
+        self.log.info(f"collecting innercity transport for {len(POI_list)} POIs ...")
         
         selected_poi_innercity_transport_list = []
         selected_innercity_transport_info = ""
@@ -334,7 +324,7 @@ class LLMModuloAgent(BaseAgent):
             "information_collection_time": self.information_collection_time, 
         }
 
-        print(json_plan)
+        self.log.info(json_plan)
 
         # get error info from symbolic feedback
         error_info = collect_commonsense_constraints_error(problem, evaluated_plan, verbose=False)
@@ -348,11 +338,11 @@ class LLMModuloAgent(BaseAgent):
                 for pe in personal_error_info:
                     error_info.append(pe)
             except Exception as e:
-                print("Error in translating innercity transport: ", e)
+                self.log.info("Error in translating innercity transport: ", e)
                 error_info.append("Format Error on Innercity Transport Information. Please strictly follow the instructions in the prompt.")
 
         
-        print("ITER: ", 0, "ERROR:\n", error_info)
+        self.log.info("ITER: ", 0, "ERROR:\n", error_info)
 
         # exit(0)
 
@@ -434,11 +424,11 @@ class LLMModuloAgent(BaseAgent):
                         error_info.append(pe)
                 
                 except Exception as e:
-                    print("Error in translating innercity transport: ", e)
+                    self.log.info("Error in translating innercity transport: ", e)
                     error_info.append("Format Error on Innercity Transport Information. Please strictly follow the instructions in the prompt.")
 
 
-            print("ITER: ", step_i, "ERROR:\n", error_info)
+            self.log.info("ITER: ", step_i, "ERROR:\n", error_info)
             
             evaluated_plan["error_info"] = error_info
     
@@ -458,10 +448,7 @@ class LLMModuloAgent(BaseAgent):
 
         return True, evaluated_plan
 
-    def select_accommodation(self, hotel_info, query, required_num=10):
-        
-        # print(hotel_info.head())
-        
+    def accommodation_message(self, hotel_info, query, required_num=10):
         hotel_info = hotel_info.drop(columns=["hotelname_en"])
 
         # 将 hotel_info 转换为不带索引的字符串
@@ -469,18 +456,21 @@ class LLMModuloAgent(BaseAgent):
 
         # print(hotel_info_str)
 
-        time_before = time.time()
         # filtering hotel info by llm
-        query_message=[{"role": "user", "content": HOTEL_SELECTION_INSTRUCTION.format(required_options=required_num, user_requirements=query["nature_language"], hotel_info=hotel_info_str)}]
-
-        # print(query_message[0]["content"])
-
-        answer = self.backbone_llm(query_message,one_line=False)
+        return [{"role": "user", "content": HOTEL_SELECTION_INSTRUCTION.format(required_options=required_num, user_requirements=query["nature_language"], hotel_info=hotel_info_str)}]
 
+    def select_accommodation(self, hotel_info, query, required_num=10, answer=None):
+        
+        # print(hotel_info.head())
+        
+        if answer is None:
+            time_before = time.time()
+            answer = self.backbone_llm(self.accommodation_message(hotel_info, query, required_num), one_line=False)
+            self.llm_inference_time_count += time.time() - time_before
 
-        self.llm_inference_time_count += time.time() - time_before
+        hotel_info = hotel_info.drop(columns=["hotelname_en"])
 
-        print(answer)
+        self.log.info(answer)
         # match = re.search(r'\s*\[(.*?)\]', answer, re.DOTALL)
         
         selected_idx = []
@@ -488,14 +478,14 @@ class LLMModuloAgent(BaseAgent):
         try:
             HotelNameList = ast.literal_eval(answer)
     
-            print('selected HotelNameList: ',HotelNameList) 
+            self.log.info('selected HotelNameList: ',HotelNameList) 
             for cand_i in HotelNameList:
                 np_where = np.where(hotel_info['name']==cand_i)[0]
                 if len(np_where) > 0:
                     selected_index = np_where[0]
                     selected_idx.append(selected_index)
         except Exception as e:
-            print("!!!Error in eval HotelNameList:", str(e))
+            self.log.info("!!!Error in eval HotelNameList:", str(e))
             
             np.random.seed(19260817)
             selected_idx = np.random.choice(len(hotel_info), required_num, replace=False)
@@ -504,29 +494,28 @@ class LLMModuloAgent(BaseAgent):
             selected_idx = selected_idx[:required_num]
         return selected_idx
     
-    def select_attraction(self, attraction_info, query, required_num=50):
-
-        # print(attraction_info.head())
-
-        attraction_info = attraction_info
+    def attraction_message(self, attraction_info, query, required_num=50):
         # 将 attraction_info 转换为不带索引的字符串
         attraction_info_str = attraction_info.to_csv(sep='\t', na_rep='nan', index=False)
 
         # print(attraction_info_str)
 
-        time_before = time.time()
-        query_message=[{"role": "user", "content": ATTRACTION_SELECTION_INSTRUCTION.format(required_options=required_num, user_requirements=query["nature_language"], attraction_info=attraction_info_str)}]
+        return [{"role": "user", "content": ATTRACTION_SELECTION_INSTRUCTION.format(required_options=required_num, user_requirements=query["nature_language"], attraction_info=attraction_info_str)}]
 
-        answer = self.backbone_llm(query_message,one_line=False)
+    def select_attraction(self, attraction_info, query, required_num=50, answer=None):
+
+        # print(attraction_info.head())
+
+        if answer is None:
+            answer = self.backbone_llm(self.attraction_message(attraction_info, query, required_num), one_line=False)
         
-        print(answer)
+        self.log.info(answer)
 
-        time_after = time.time()
         selected_idx = []
 
         try:
             AttrNameList = eval(answer)
-            print('selected AttrNameList: ',AttrNameList) 
+            self.log.info('selected AttrNameList: ',AttrNameList) 
             for cand_i in AttrNameList:
                 np_where = np.where(attraction_info['name']==cand_i)[0]
                 if len(np_where) > 0:
@@ -534,7 +523,7 @@ class LLMModuloAgent(BaseAgent):
                 selected_idx.append(selected_index)
 
         except Exception as e:
-            print("!!!Error in eval selected_idx:", str(e))
+            self.log.info("!!!Error in eval selected_idx:", str(e))
 
             np.random.seed(19260817)
             selected_idx = np.random.choice(len(attraction_info), required_num, replace=False)
@@ -542,26 +531,25 @@ class LLMModuloAgent(BaseAgent):
         if len(selected_idx) > required_num:
             selected_idx = selected_idx[:required_num]
         return selected_idx
-    def select_restaurant(self, restaurant_info, query, required_num=30):
-
-
+    def restaurant_message(self, restaurant_info, query, required_num=30):
         restaurant_info_str = restaurant_info.to_csv(sep='\t', na_rep='nan', index=False)
 
         # print(restaurant_info_str)
 
-        time_before = time.time()
-        query_message=[{"role": "user", "content": RESTAURANT_SELECTION_INSTRUCTION.format(required_options=required_num, user_requirements=query["nature_language"], restaurant_info=restaurant_info_str)}]
+        return [{"role": "user", "content": RESTAURANT_SELECTION_INSTRUCTION.format(required_options=required_num, user_requirements=query["nature_language"], restaurant_info=restaurant_info_str)}]
 
-        answer = self.backbone_llm(query_message,one_line=False)
+    def select_restaurant(self, restaurant_info, query, required_num=30, answer=None):
 
-        print(answer)
+        if answer is None:
+            answer = self.backbone_llm(self.restaurant_message(restaurant_info, query, required_num), one_line=False)
+
+        self.log.info(answer)
 
-        time_after = time.time()
         selected_idx = []
 
         try:
             RestNameList = eval(answer)
-            print('selected RestNameList: ',RestNameList) 
+            self.log.info('selected RestNameList: ',RestNameList) 
             for cand_i in RestNameList:
                 np_where = np.where(restaurant_info['name']==cand_i)[0]
                 if len(np_where) > 0:
@@ -569,7 +557,7 @@ class LLMModuloAgent(BaseAgent):
                     selected_idx.append(selected_index)
 
         except Exception as e:
-            print("!!!Error in eval selected_idx:", str(e))
+            self.log.info("!!!Error in eval selected_idx:", str(e))
 
             np.random.seed(19260817)
             selected_idx = np.random.choice(len(restaurant_info), required_num, replace=False)
@@ -578,19 +566,20 @@ class LLMModuloAgent(BaseAgent):
             selected_idx = selected_idx[:required_num]
         return selected_idx
     
-    def select_intercity_transport_go(self, train_info, flight_info, query, required_num=10):
+    def intercity_transport_go_message(self, train_info, flight_info, query, required_num=10):
         train_info_str = train_info.to_csv(sep='\t', na_rep='nan', index=False)
         flight_info_str = flight_info.to_csv(sep='\t', na_rep='nan', index=False)
-        time_before = time.time()
+        return [{"role": "user", "content": TRANSPORT_GO_SELECTION_INSTRUCTION.format(origin=query["start_city"], destination=query["target_city"], required_options=required_num, user_requirements=query["nature_language"], train_info=train_info_str, flight_info=flight_info_str)}]
 
-        query_message=[{"role": "user", "content": TRANSPORT_GO_SELECTION_INSTRUCTION.format(origin=query["start_city"], destination=query["target_city"], required_options=required_num, user_requirements=query["nature_language"], train_info=train_info_str, flight_info=flight_info_str)}]
-        answer = self.backbone_llm(query_message,one_line=False)
-        print(answer)
+    def select_intercity_transport_go(self, train_info, flight_info, query, required_num=10, answer=None):
+        if answer is None:
+            answer = self.backbone_llm(self.intercity_transport_go_message(train_info, flight_info, query, required_num), one_line=False)
+        self.log.info(answer)
 
         selected_train_idx, selected_flight_idx = [], []
         try:
             TransportList = eval(answer)
-            print('selected TransportList: ',TransportList) 
+            self.log.info('selected TransportList: ',TransportList) 
             for cand_i in TransportList:
 
                 if (len(train_info)>0):
@@ -608,24 +597,26 @@ class LLMModuloAgent(BaseAgent):
                 selected_flight_idx = selected_flight_idx[:required_num]
 
         except Exception as e:
-            print("!!!Error in eval selected_idx:", str(e))
+            self.log.info("!!!Error in eval selected_idx:", str(e))
             np.random.seed(19260817)
             selected_train_idx = np.random.choice(len(train_info), min(len(train_info), required_num // 2), replace=False)
             selected_flight_idx = np.random.choice(len(flight_info), min(len(flight_info), required_num - required_num // 2), replace=False)         
 
         return selected_train_idx, selected_flight_idx
 
-    def select_intercity_transport_back(self, train_info, flight_info, query, required_num=10):
+    def intercity_transport_back_message(self, train_info, flight_info, query, required_num=10):
         train_info_str = train_info.to_csv(sep='\t', na_rep='nan', index=False)
         flight_info_str = flight_info.to_csv(sep='\t', na_rep='nan', index=False)
-        time_before = time.time()
-        query_message=[{"role": "user", "content": TRANSPORT_BACK_SELECTION_INSTRUCTION.format(origin=query["target_city"], destination=query["start_city"], required_options=required_num, user_requirements=query["nature_language"], train_info=train_info_str, flight_info=flight_info_str)}]
-        answer = self.backbone_llm(query_message,one_line=False)
-        print(answer)
+        return [{"role": "user", "content": TRANSPORT_BACK_SELECTION_INSTRUCTION.format(origin=query["target_city"], destination=query["start_city"], required_options=required_num, user_requirements=query["nature_language"], train_info=train_info_str, flight_info=flight_info_str)}]
+
+    def select_intercity_transport_back(self, train_info, flight_info, query, required_num=10, answer=None):
+        if answer is None:
+            answer = self.backbone_llm(self.intercity_transport_back_message(train_info, flight_info, query, required_num), one_line=False)
+        self.log.info(answer)
         selected_train_idx, selected_flight_idx = [], []
         try:
             TransportList = eval(answer)
-            print('selected TransportList: ',TransportList)
+            self.log.info('selected TransportList: ',TransportList)
             for cand_i in TransportList:
                 if (len(train_info)>0):
                     np_where = np.where(train_info['TrainID']==cand_i)[0]
@@ -643,7 +634,7 @@ class LLMModuloAgent(BaseAgent):
                 selected_flight_idx = selected_flight_idx[:required_num]
                 
         except Exception as e:
-            print("!!!Error in eval selected_idx:", str(e))
+            self.log.info("!!!Error in eval selected_idx:", str(e))
             np.random.seed(19260817)
             selected_train_idx = np.random.choice(len(train_info), min(len(train_info), required_num // 2), replace=False)
             selected_flight_idx = np.random.choice(len(flight_info), min(len(flight_info), required_num - required_num // 2), replace=False)
@@ -2,11 +2,7 @@
 import sys
 
 
-from chinatravel.environment.tools.accommodations.apis import Accommodations
-from chinatravel.environment.tools.restaurants.apis import Restaurants
-from chinatravel.environment.tools.attractions.apis import Attractions
-from chinatravel.environment.tools.intercity_transport.apis import IntercityTransport
-from chinatravel.environment.tools.transportation.apis import Transportation
+from chinatravel.environment.tools.registry import get_tool
 # from env.tools.transportation.apis import GoTo
 # from envs import goto
 import json
@@ -18,11 +14,11 @@ from chinatravel.evaluation.utils import load_json_file
     
 import pandas as pd
 
-accommodation = Accommodations()
-restaurants = Restaurants()
-attractions = Attractions()
-intercity_transport=IntercityTransport()
-innercity_transport=Transportation()
+accommodation = get_tool("accommodations")
+restaurants = get_tool("restaurants")
+attractions = get_tool("attractions")
+intercity_transport=get_tool("intercity_transport")
+innercity_transport=get_tool("transportation")
 
 
 '''
@@ -1,22 +1,20 @@
 import sys
 import os
 
-from chinatravel.environment.tools.accommodations.apis import Accommodations
-from chinatravel.environment.tools.restaurants.apis import Restaurants
-from chinatravel.environment.tools.attractions.apis import Attractions
-from chinatravel.environment.tools.intercity_transport.apis import IntercityTransport
-from chinatravel.environment.tools.transportation.apis import Transportation
+from chinatravel.environment.tools.registry import get_tool
 
-from chinatravel.symbol_verification.concept_func import func_dict
+from chinatravel.symbol_verification.concept_func import (
+    func_dict,
+    compile_concept_code,
+)
 from chinatravel.evaluation.utils import load_json_file
 
 import pandas as pd
 
-from copy import deepcopy
 
-accommodation = Accommodations()
-restaurants = Restaurants()
-attractions = Attractions()
+accommodation = get_tool("accommodations")
+restaurants = get_tool("restaurants")
+attractions = get_tool("attractions")
 
 def collect_personal_error(problem, plan, verbose=False):
     
@@ -29,14 +27,14 @@ def collect_personal_error(problem, plan, verbose=False):
 
     error_info = []
     for idx, constraint in enumerate(problem["hard_logic_py"]):
-        vars_dict = deepcopy(func_dict)
+        vars_dict = dict(func_dict)
         vars_dict["plan"] = plan
         # exec(constraint, {"__builtins__": {"set": set, "print": print}}, vars_dict)
         # results.append(vars_dict.get("result", False))
         try:
             # Evaluate the constraint in a safe manner
             exec(
-                constraint,
+                compile_concept_code(constraint),
                 {
                     "__builtins__": {
                         "set": set,
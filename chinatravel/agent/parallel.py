@@ -0,0 +1,51 @@
+"""
+Process pool for solving the queries of a split in parallel.
+
+Every worker builds its own agent, with its own WorldEnv and LLM, when it
+starts and then solves the queries it is given one after another. The agents
+write the log of each query to its own files (see open_query_log), so the
+logs of the workers do not mix. Note that a local model (vLLM) is loaded once
+per worker.
+"""
+
+from multiprocessing import Pool
+
+from chinatravel.agent.utils import close_query_log
+
+
+_agent = None
+
+
+def init_worker(build_agent, build_args):
+    global _agent
+    _agent = build_agent(*build_args)
+
+
+def apply(job):
+    key, func, args = job
+    try:
+        return key, func(_agent, *args)
+    finally:
+        # the agent may have opened the log in another thread (func_timeout)
+        close_query_log(getattr(_agent, "log", None))
+
+
+def create_pool(workers, build_agent, build_args):
+    """
+    A pool of workers, each with the agent build_agent(*build_args), or None
+    to solve the queries in this process.
+    """
+    if workers is None or workers <= 1:
+        return None
+    return Pool(workers, initializer=init_worker, initargs=(build_agent, build_args))
+
+
+def map_queries(func, jobs, pool):
+    """
+    Yield (key, func(agent, *args)) for every key, args in the dict jobs, in
+    the order the workers finish them. func, build_agent and their arguments
+    are sent to the workers, so the functions must be defined at module level.
+    """
+    return pool.imap_unordered(
+        apply, [(key, func, args) for key, args in jobs.items()]
+    )
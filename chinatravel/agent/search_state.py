@@ -0,0 +1,221 @@
+"""
+Running state of the plan that dfs_poi builds: costs by category, visited
+POIs and types, how each activity was reached and the activity types of each
+day, kept for the activities on the plan so that a search node reads them
+instead of walking the plan.
+"""
+
+from chinatravel.symbol_verification.concept_func import (
+    activity_position,
+    activity_type,
+    innercity_transport_cost,
+    innercity_transport_type,
+)
+
+
+class SearchEntry:
+    """
+    One activity of the plan and the state after it. The costs are running
+    sums, accumulated in plan order as a walk over the plan would, so they
+    are exact and a pop only drops the entry.
+    """
+
+    __slots__ = (
+        "fields",
+        "day",
+        "index",
+        "poi_cost",
+        "overall_cost",
+        "attraction_cost",
+        "innercity_cost",
+        "visited",
+        "paid",
+    )
+
+
+class SearchState:
+    """
+    push() and pop() update the state in O(1). sync(plan) brings it to the
+    plan by popping the activities that are no longer on it and pushing the
+    new ones. The activities are matched in order with a snapshot of the
+    fields push() read of them, so a deep copy of the plan keeps the state
+    and an activity changed in place is pushed again.
+
+    With the attractions and restaurants tables of the query, the names,
+    types and cuisines of the visited POIs are counted too (the types come
+    from the tables, as the activities do not have them).
+    """
+
+    def __init__(self, attractions=None, restaurants=None):
+        self.attractions = self._index(attractions)
+        self.restaurants = self._index(restaurants)
+        self.entries = []
+        self.day_types = {}
+        self.attraction_names = {}
+        self.attraction_types = {}
+        self.restaurant_names = {}
+        self.restaurant_types = {}
+        # (position, type, inner-city transport type, inner-city cost) of
+        # each activity, what the constraints read of it besides its times
+        self.arrivals = {}
+        self.paid_attractions = 0
+
+    @staticmethod
+    def _index(table):
+        if table is None:
+            return None
+        index = {}
+        for name, row in zip(table["name"], table.to_dict("records")):
+            # the first match, as table[table["name"] == name].iloc[0]
+            index.setdefault(name, row)
+        return index
+
+    @staticmethod
+    def _count(counter, key, step):
+        count = counter.get(key, 0) + step
+        if count == 0:
+            del counter[key]
+        else:
+            counter[key] = count
+
+    def _visited(self, activity):
+        # the (counter, key) pairs the activity adds, and if it is a paid
+        # attraction
+        visited, paid = [], False
+        activity_type = activity.get("type")
+        name = activity.get("position")
+        if activity_type == "attraction" and self.attractions is not None:
+            info = self.attractions.get(name)
+            if info is not None:
+                visited.append((self.attraction_names, info["name"]))
+                visited.append((self.attraction_types, info["type"]))
+                paid = info.get("price", 0) > 0
+        elif activity_type in ["lunch", "dinner"] and self.restaurants is not None:
+            info = self.restaurants.get(name)
+            if info is not None:
+                visited.append((self.restaurant_names, info["name"]))
+                visited.append((self.restaurant_types, info["cuisine"]))
+        return visited, paid
+
+    @staticmethod
+    def _fields(activity):
+        # what push() reads of the activity; the transports are copied, as
+        # the search may change them in place
+        return (
+            activity.get("type"),
+            activity.get("cost"),
+            activity.get("position"),
+            [dict(transport) for transport in activity.get("transports", [])],
+        )
+
+    def push(self, activity, day, index):
+        """
+        Add activity, the index-th activity of day (0-based) of the plan.
+        """
+        entry = SearchEntry()
+        entry.fields = self._fields(activity)
+        entry.day = day
+        entry.index = index
+        if self.entries:
+            last = self.entries[-1]
+            poi_cost, overall_cost = last.poi_cost, last.overall_cost
+            attraction_cost, innercity_cost = last.attraction_cost, last.innercity_cost
+        else:
+            poi_cost = overall_cost = attraction_cost = innercity_cost = 0
+
+        if activity["type"] in ["breakfast", "lunch", "dinner", "attraction"]:
+            poi_cost += activity["cost"]
+            overall_cost += activity["cost"]
+        if activity["type"] in ["attraction"]:
+            overall_cost += activity["cost"]
+            attraction_cost += activity["cost"]
+        innercity_cost += sum(
+            transport.get("cost", 0) for transport in activity.get("transports", [])
+        )
+        entry.poi_cost, entry.overall_cost = poi_cost, overall_cost
+        entry.attraction_cost, entry.innercity_cost = attraction_cost, innercity_cost
+
+        entry.visited, entry.paid = self._visited(activity)
+        transports = activity.get("transports", [])
+        entry.visited.append(
+            (
+                self.arrivals,
+                (
+                    activity_position(activity),
+                    activity_type(activity),
+                    innercity_transport_type(transports),
+                    innercity_transport_cost(transports),
+                ),
+            )
+        )
+        for counter, key in entry.visited:
+            self._count(counter, key, 1)
+        self.paid_attractions += entry.paid
+        self._count(self.day_types, (day, activity["type"]), 1)
+        self.entries.append(entry)
+
+    def pop(self):
+        entry = self.entries.pop()
+        for counter, key in entry.visited:
+            self._count(counter, key, -1)
+        self.paid_attractions -= entry.paid
+        self._count(self.day_types, (entry.day, entry.fields[0]), -1)
+
+    def sync(self, plan):
+        """
+        Update the state to plan, a list of {"day", "activities"}.
+        """
+        # the entries from keep on are not on the plan any more
+        keep = 0
+        for entry in self.entries:
+            if entry.day >= len(plan) or entry.index >= len(
+                plan[entry.day]["activities"]
+            ):
+                break
+            activity = plan[entry.day]["activities"][entry.index]
+            if self._fields(activity) != entry.fields:
+                break
+            keep += 1
+        while len(self.entries) > keep:
+            self.pop()
+
+        if self.entries:
+            day, index = self.entries[-1].day, self.entries[-1].index + 1
+        else:
+            day, index = 0, 0
+        while day < len(plan):
+            activities = plan[day]["activities"]
+            while index < len(activities):
+                self.push(activities[index], day, index)
+                index += 1
+            day, index = day + 1, 0
+        return self
+
+    def _last(self, name):
+        return getattr(self.entries[-1], name) if self.entries else 0
+
+    @property
+    def poi_cost(self):
+        """
+        Cost of the meals and attractions.
+        """
+        return self._last("poi_cost")
+
+    @property
+    def overall_cost(self):
+        """
+        poi_cost with the attractions counted twice, as in
+        UrbanTrip.check_budgets.
+        """
+        return self._last("overall_cost")
+
+    @property
+    def attraction_cost(self):
+        return self._last("attraction_cost")
+
+    @property
+    def innercity_cost(self):
+        return self._last("innercity_cost")
+
+    def has_activity(self, day, activity_type):
+        return (day, activity_type) in self.day_types
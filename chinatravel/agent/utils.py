@@ -1,4 +1,7 @@
+import os
+import queue
 import sys
+import threading
 from numpy import ndarray, integer, floating
 import numpy as np
 import json
@@ -19,26 +22,195 @@ def decode_numpy_dict(d):
         return d
 
 
-class Logger(object):
-    def __init__(self, filename="default.log", stream=sys.stdout, debug_mode=False):
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+
+# e.g. CHINATRAVEL_LOG_LEVEL=debug to log every step of the search
+LOG_LEVEL = LEVELS[os.environ.get("CHINATRAVEL_LOG_LEVEL", "info").lower()]
+LOG_BACKGROUND = os.environ.get("CHINATRAVEL_LOG_BACKGROUND", "0") == "1"
+LOG_BUFFER_SIZE = 1 << 16
+
+
+def _disabled(*args):
+    pass
+
+
+class QueryLogger(object):
+    """
+    Buffered log of one query, filtered by level. debug(), info(), warning()
+    and error() take their arguments like print(). The methods of the levels
+    below the logger's are replaced by a no-op, so a disabled message costs
+    an empty call and is never formatted.
+
+    Without a path the messages go to sys.stdout. With echo they are also
+    written to that stream, and with background=True a thread writes them
+    to the file instead of the caller. Once closed, what is still written
+    (by a thread that outlived its query) goes to sys.stdout.
+    """
+
+    def __init__(self, path=None, level=LOG_LEVEL, echo=None, background=False):
+        level = LEVELS.get(level, level)
+        self.level = level
+        self.echo = echo
+        self.file = None
+        self.error_file = None
+        self.queue = None
+        self.closed = False
+        self.lock = threading.Lock()
+        if path is not None:
+            self.file = open(path, "a", encoding="utf-8", buffering=LOG_BUFFER_SIZE)
+            if background:
+                self.queue = queue.SimpleQueue()
+                self.writer = threading.Thread(
+                    target=self._write_queued,
+                    args=(self.queue, self.file),
+                    name="query-log",
+                    daemon=True,
+                )
+                self.writer.start()
+        for name, value in LEVELS.items():
+            if value < level:
+                setattr(self, name, _disabled)
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def debug(self, *args):
+        self.write(" ".join(map(str, args)) + "\n")
+
+    info = warning = error = debug
+
+    def write(self, text):
+        with self.lock:
+            if self.queue is not None:
+                self.queue.put(text)
+                logged = True
+            elif self.file is not None:
+                self.file.write(text)
+                logged = True
+            else:
+                logged = False
+        if not logged:
+            sys.stdout.write(text)
+        if self.echo is not None:
+            self.echo.write(text)
+
+    def write_error(self, text):
+        """Write to the error file; False when there is none (or it is closed)."""
+        with self.lock:
+            if self.error_file is None:
+                return False
+            self.error_file.write(text)
+            return True
+
+    @staticmethod
+    def _write_queued(texts, file):
+        while True:
+            text = texts.get()
+            if text is None:
+                break
+            file.write(text)
 
-        self.debug_mode = debug_mode
-        self.log = open(filename, "a", encoding="utf-8")
-
-        if self.debug_mode:
-            self.terminal = stream
+    def flush(self):
+        with self.lock:
+            if self.file is not None and self.queue is None:
+                self.file.flush()
+            if self.error_file is not None:
+                self.error_file.flush()
+
+    def close(self):
+        # Detached under the lock, so that no write() lands in a closed file
+        # or in the queue after the writer's sentinel.
+        with self.lock:
+            self.closed = True
+            texts, self.queue = self.queue, None
+            file, self.file = self.file, None
+            error_file, self.error_file = self.error_file, None
+        if error_file is not None:
+            error_file.close()
+        if file is None:
+            return
+        if texts is not None:
+            texts.put(None)
+            self.writer.join()
+        file.close()
+
+
+_query_log = threading.local()
+
+
+class QueryLogStream(object):
+    """
+    Installed once in place of sys.stdout / sys.stderr, for the output that
+    does not go through a QueryLogger (print() in shared code, libraries).
+    What a thread writes goes to the log of the query it opened with
+    open_query_log(), stdout to the query's logger and stderr to its error
+    file; without an open log, or once it is closed, it goes to the original
+    stream.
+    """
+
+    def __init__(self, channel, stream):
+        self.channel = channel
+        self.stream = stream
 
     def write(self, message):
-        self.log.write(message)
-
-        if self.debug_mode:
-            self.terminal.write(message)
+        logger = getattr(_query_log, "logger", None)
+        if logger is None or logger.closed:
+            return self.stream.write(message)
+        if self.channel == "stdout":
+            logger.write(message)
+        elif not logger.write_error(message) or logger.echo is not None:
+            self.stream.write(message)
+        return len(message)
 
     def flush(self):
-        pass
-
-    def __del__(self):
-        self.log.close()
+        logger = getattr(_query_log, "logger", None)
+        if logger is not None and not logger.closed:
+            logger.flush()
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def open_query_log(
+    log_path, error_path, debug=False, level=LOG_LEVEL, background=LOG_BACKGROUND
+):
+    """
+    The logger of a query, writing to log_path, and to the terminal too in
+    debug mode. What the calling thread prints goes to the same log, and to
+    error_path for stderr, until the logger is closed with close_query_log()
+    or the thread opens the next one.
+    """
+    close_query_log()
+    if not isinstance(sys.stdout, QueryLogStream):
+        sys.stdout = QueryLogStream("stdout", sys.stdout)
+    if not isinstance(sys.stderr, QueryLogStream):
+        sys.stderr = QueryLogStream("stderr", sys.stderr)
+    logger = QueryLogger(
+        log_path,
+        level=level,
+        echo=sys.stdout.stream if debug else None,
+        background=background,
+    )
+    logger.error_file = open(error_path, "a", encoding="utf-8")
+    _query_log.logger = logger
+    return logger
+
+
+def close_query_log(logger=None):
+    """
+    Close logger, by default the last one the calling thread opened. Any
+    thread can close a logger, e.g. the one an agent opened in the thread
+    func_timeout runs it in.
+    """
+    current = getattr(_query_log, "logger", None)
+    if logger is None:
+        logger = current
+    if logger is current:
+        _query_log.logger = None
+    if logger is not None:
+        logger.close()
 
 
 class NpEncoder(json.JSONEncoder):
@@ -0,0 +1,77 @@
+"""
+Micro-benchmarks of the environment tools on the local database.
+
+    python -m chinatravel.environment.benchmark nearby
+"""
+
+import argparse
+import random
+import time
+
+from geopy.distance import geodesic
+
+from chinatravel.environment.tools.attractions.apis import Attractions
+from chinatravel.environment.tools.restaurants.apis import Restaurants
+from chinatravel.environment.tools.accommodations.apis import Accommodations
+
+
+def timeit(func, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    return (time.perf_counter() - start) / len(args_list)
+
+
+def nearby_loop(tool, city, point, topk=None, dist=2):
+    # the per-row geodesic implementation nearby() used before vectorization
+    lat, lon = tool.poi.search(city, point)
+    distance = [
+        geodesic((lat, lon), (x, y)).km
+        for x, y in zip(tool.data[city]["lat"], tool.data[city]["lon"])
+    ]
+    tmp = tool.data[city].copy()
+    tmp["distance"] = distance
+    tmp = tmp.sort_values(by=["distance"])
+    if topk is None:
+        return tmp[tmp["distance"] <= dist]
+    return tmp[tmp["distance"] <= dist].head(topk)
+
+
+def bench_nearby(n_queries, seed):
+    rng = random.Random(seed)
+    for tool in [Attractions(), Restaurants(), Accommodations()]:
+        # the largest city of the table
+        city = max(tool.data, key=lambda c: len(tool.data[c]))
+        points = list(tool.data[city]["name"])
+        args_list = [
+            (city, rng.choice(points), 10, 5) for _ in range(n_queries)
+        ]
+        t_loop = timeit(
+            lambda *args: nearby_loop(tool, *args[:2], topk=args[2], dist=args[3]),
+            args_list,
+        )
+        t_vec = timeit(
+            lambda *args: tool.nearby(*args[:2], topk=args[2], dist=args[3]),
+            args_list,
+        )
+        print(
+            "{:<15} {} ({} rows): loop {:.2f} ms, vectorized {:.2f} ms, x{:.1f}".format(
+                type(tool).__name__,
+                city,
+                len(tool.data[city]),
+                t_loop * 1e3,
+                t_vec * 1e3,
+                t_loop / t_vec,
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark the environment tools")
+    parser.add_argument("bench", choices=["nearby"])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.bench == "nearby":
+        bench_nearby(args.queries, args.seed)
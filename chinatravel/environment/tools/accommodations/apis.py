@@ -1,19 +1,23 @@
 import pandas as pd
 from pandas import DataFrame
 from typing import Callable
-from geopy.distance import geodesic
+import numpy as np
 import os
 
-import sys
+from chinatravel.environment.tools.poi.apis import geodesic_distance, nearest_rows
+from chinatravel.environment.tools.lazy import LazyCityDict, LazyCityTool
+from chinatravel.environment.tools.predicates import Compare, SelectIndex
+from chinatravel.environment.tools.registry import get_tool
+from chinatravel.environment.tools.tables import read_csv_cached
 
-sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-from poi.apis import Poi
 
-
-class Accommodations:
+class Accommodations(LazyCityTool):
 
     def __init__(
-        self, base_path: str = "../../database/accommodations/", en_version=False
+        self,
+        base_path: str = "../../database/accommodations/",
+        en_version=False,
+        lazy=False,
     ):
         curdir = os.path.dirname(os.path.realpath(__file__))
         city_list = [
@@ -32,16 +36,6 @@ class Accommodations:
             os.path.join(curdir, f"{base_path}/{city}/accommodations.csv")
             for city in city_list
         ]
-        self.data = {}
-        for i, city in enumerate(city_list):
-            self.data[city] = pd.read_csv(data_path_list[i]).dropna()
-        self.key_type_tuple_list = {}
-        for city in city_list:
-            self.key_type_tuple_list[city] = []
-            for key in self.data[city].keys():
-                self.key_type_tuple_list[city].append(
-                    (key, type(self.data[city].iloc[0][key]))
-                )
         city_cn_list = [
             "北京",
             "上海",
@@ -54,14 +48,28 @@ class Accommodations:
             "广州",
             "重庆",
         ]
-
-        for i, city in enumerate(city_list):
-            self.data[city_cn_list[i]] = self.data.pop(city)
-            self.key_type_tuple_list[city_cn_list[i]] = self.key_type_tuple_list.pop(
-                city
-            )
-
-        self.poi = Poi(en_version=en_version)
+        # tables are keyed by the Chinese city name and loaded on first access
+        self.data_path = dict(zip(city_cn_list, data_path_list))
+        self.data = LazyCityDict(city_cn_list, self.load_city)
+        self.key_type_tuple_list = LazyCityDict(
+            city_cn_list,
+            lambda city: [
+                (key, type(self.data[city].iloc[0][key]))
+                for key in self.data[city].keys()
+            ],
+        )
+
+        self.poi = get_tool("poi")
+        self.select_index = SelectIndex()
+        if not lazy:
+            self.preload()
+
+    def load_city(self, city):
+        return read_csv_cached(self.data_path[city]).dropna()
+
+    def evict(self, city=None):
+        super().evict(city)
+        self.select_index.evict(city)
 
     def keys(self, city):
         return self.key_type_tuple_list[city]
@@ -69,26 +77,28 @@ class Accommodations:
     def select(self, city, key, func: Callable) -> DataFrame:
         if key not in self.data[city].keys():
             return "Key not found."
-        bool_list = [func(x) for x in self.data[city][key]]
-        return self.data[city][bool_list]
+        return self.select_index.select(city, self.data[city], key, func)
+
+    def get_by_name(self, city: str, name: str) -> DataFrame:
+        # same rows as select(city, "name", lambda x: x == name), from a hash index
+        return self.select_index.select(
+            city, self.data[city], "name", Compare("==", name)
+        )
 
     def nearby(self, city, point: str, topk: int = None, dist: float = 5) -> DataFrame:
         lat_lon = self.poi.search(city, point)
         if isinstance(lat_lon, str):
             return lat_lon
         lat, lon = lat_lon
-        distance = [
-            geodesic((lat, lon), (x, y)).km
-            for x, y in zip(self.data[city]["lat"], self.data[city]["lon"])
-        ]
-        tmp = self.data[city].copy()
-        tmp["distance"] = distance
-        if dist is not None:
-            tmp = tmp[tmp["distance"] < dist]
-        tmp = tmp.sort_values(by=["distance"])
-        if topk is not None:
-            return tmp.head(topk)
-        return tmp
+        distance = geodesic_distance(
+            lat,
+            lon,
+            self.data[city]["lat"].to_numpy(),
+            self.data[city]["lon"].to_numpy(),
+        )
+        within = distance < dist if dist is not None else np.ones(len(distance), bool)
+        rows = nearest_rows(distance, within, topk)
+        return self.data[city].iloc[rows].assign(distance=distance[rows])
 
 
 if __name__ == "__main__":
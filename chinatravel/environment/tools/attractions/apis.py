@@ -2,19 +2,20 @@ import pandas as pd
 from pandas import DataFrame
 from typing import Callable
 import os
-from geopy.distance import geodesic
 
-import sys
+from chinatravel.environment.tools.poi.apis import geodesic_distance, nearest_rows
+from chinatravel.environment.tools.lazy import LazyCityDict, LazyCityTool
+from chinatravel.environment.tools.predicates import Compare, SelectIndex
+from chinatravel.environment.tools.registry import get_tool
+from chinatravel.environment.tools.tables import read_csv_cached
 
-sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-from poi.apis import Poi
 
-
-class Attractions:
+class Attractions(LazyCityTool):
     def __init__(
         self,
         base_path: str = "../../database/attractions",
         en_version=False,
+        lazy=False,
     ):
         city_list = [
             "beijing",
@@ -33,20 +34,6 @@ class Attractions:
             os.path.join(curdir, f"{base_path}/{city}/attractions.csv")
             for city in city_list
         ]
-
-        self.data = {}
-        for i, city in enumerate(city_list):
-            self.data[city] = pd.read_csv(data_path_list[i])
-        self.key_type_tuple_list_map = {}
-        for city in city_list:
-            self.key_type_tuple_list_map[city] = []
-            for key in self.data[city].keys():
-                self.key_type_tuple_list_map[city].append(
-                    (key, type(self.data[city][key][0]))
-                )
-        self.type_list_map = {}
-        for city in city_list:
-            self.type_list_map[city] = self.data[city]["type"].unique()
         city_cn_list = [
             "北京",
             "上海",
@@ -60,14 +47,30 @@ class Attractions:
             "重庆",
         ]
 
-        for i, city in enumerate(city_list):
-            self.data[city_cn_list[i]] = self.data.pop(city)
-            self.key_type_tuple_list_map[city_cn_list[i]] = (
-                self.key_type_tuple_list_map.pop(city)
-            )
-            self.type_list_map[city_cn_list[i]] = self.type_list_map.pop(city)
-
-        self.poi = Poi()
+        # tables are keyed by the Chinese city name and loaded on first access
+        self.data_path = dict(zip(city_cn_list, data_path_list))
+        self.data = LazyCityDict(city_cn_list, self.load_city)
+        self.key_type_tuple_list_map = LazyCityDict(
+            city_cn_list,
+            lambda city: [
+                (key, type(self.data[city][key][0])) for key in self.data[city].keys()
+            ],
+        )
+        self.type_list_map = LazyCityDict(
+            city_cn_list, lambda city: self.data[city]["type"].unique()
+        )
+
+        self.poi = get_tool("poi")
+        self.select_index = SelectIndex()
+        if not lazy:
+            self.preload()
+
+    def load_city(self, city):
+        return read_csv_cached(self.data_path[city])
+
+    def evict(self, city=None):
+        super().evict(city)
+        self.select_index.evict(city)
 
     def keys(self, city: str):
         return self.key_type_tuple_list_map[city]
@@ -75,8 +78,13 @@ class Attractions:
     def select(self, city: str, key, func: Callable) -> DataFrame:
         if key not in self.data[city].keys():
             return "Key not found."
-        bool_list = [func(x) for x in self.data[city][key]]
-        return self.data[city][bool_list]
+        return self.select_index.select(city, self.data[city], key, func)
+
+    def get_by_name(self, city: str, name: str) -> DataFrame:
+        # same rows as select(city, "name", lambda x: x == name), from a hash index
+        return self.select_index.select(
+            city, self.data[city], "name", Compare("==", name)
+        )
 
     def id_is_open(self, city: str, id: int, time: str) -> bool:
         # open_time = self.data[city]["opentime"][id]
@@ -99,16 +107,14 @@ class Attractions:
         if isinstance(lat_lon, str):
             return lat_lon
         lat, lon = lat_lon
-        distance = [
-            geodesic((lat, lon), (x, y)).km
-            for x, y in zip(self.data[city]["lat"], self.data[city]["lon"])
-        ]
-        tmp = self.data[city].copy()
-        tmp["distance"] = distance
-        tmp = tmp.sort_values(by=["distance"])
-        if topk is None:
-            return tmp[tmp["distance"] <= dist]
-        return tmp[tmp["distance"] <= dist].head(topk)
+        distance = geodesic_distance(
+            lat,
+            lon,
+            self.data[city]["lat"].to_numpy(),
+            self.data[city]["lon"].to_numpy(),
+        )
+        rows = nearest_rows(distance, distance <= dist, topk)
+        return self.data[city].iloc[rows].assign(distance=distance[rows])
 
     def get_type_list(self, city: str):
         return self.type_list_map[city]
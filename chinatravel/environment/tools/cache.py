@@ -0,0 +1,84 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+
+
+CACHE_ROOT = os.environ.get(
+    "CHINATRAVEL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.realpath(__file__)), "../database/cache"),
+)
+
+
+def cache_path(*parts):
+    """
+    Return a path under the cache root. The directories are only created by
+    the writes (see make_parent), so that a lookup never touches the disk.
+    """
+    return os.path.join(CACHE_ROOT, *parts)
+
+
+def make_parent(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+
+def file_fingerprint(*paths):
+    """
+    Content hash of the given source files, used to tell whether a cache
+    entry derived from them is still fresh.
+    """
+    sha1 = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def source_stamp(paths, meta=None):
+    """
+    The (size, mtime_ns) stats and the fingerprint of the source files of a
+    cache entry, as stored in its meta. The files are only hashed when their
+    stats differ from those of meta, the meta the entry was last stamped with.
+    """
+    stats = [[st.st_size, st.st_mtime_ns] for st in map(os.stat, paths)]
+    if meta is not None and meta.get("stats") == stats and "fingerprint" in meta:
+        return {"stats": stats, "fingerprint": meta["fingerprint"]}
+    return {"stats": stats, "fingerprint": file_fingerprint(*paths)}
+
+
+def write_json(path, obj):
+    """
+    Write obj to path through a temporary file, so that readers never see a
+    partial file.
+    """
+    make_parent(path)
+    tmp_path = "{}.tmp-{}".format(path, os.getpid())
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def save_array(path, array):
+    """
+    np.save through a temporary file. The cached arrays are memory-mapped by
+    the processes that use them, which must never see them rewritten in place.
+    """
+    make_parent(path)
+    tmp_path = "{}.tmp-{}".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def restamp(meta_path, meta, stamp):
+    """
+    Store the new stats of sources whose content did not change (e.g. after
+    a checkout), so that the next loads skip the hash again.
+    """
+    if meta.get("stats") != stamp["stats"]:
+        try:
+            write_json(meta_path, dict(meta, **stamp))
+        except OSError:
+            pass
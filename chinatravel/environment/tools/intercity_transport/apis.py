@@ -1,21 +1,41 @@
 import os
+from bisect import bisect_left
+
 import pandas as pd
 from pandas import DataFrame
 
+from chinatravel.environment.tools.lazy import LazyCityDict, LazyCityTool
+from chinatravel.environment.tools.tables import read_json_cached
+
 
 def time2float(time_str):
     h, m = time_str.split(":")
     return int(h) + int(m) / 60
 
 
-class IntercityTransport:
-    def __init__(self, path: str = "../../database/intercity_transport/"):
+def time2minutes(time_str):
+    h, m = time_str.split(":")
+    return int(h) * 60 + int(m)
+
+
+class Departures(list):
+    """
+    Departure times in minutes, in the order of the table. The table is
+    sorted by the BeginTime strings, which is also the order of the times
+    when they are all zero-padded "HH:MM"; sorted tells whether they are.
+    """
+
+    def __init__(self, minutes):
+        super().__init__(minutes)
+        self.sorted = all(a <= b for a, b in zip(self, self[1:]))
+
+
+class IntercityTransport(LazyCityTool):
+    def __init__(self, path: str = "../../database/intercity_transport/", lazy=False):
         curdir = os.path.dirname(os.path.realpath(__file__))
         self.base_path = os.path.join(curdir, path)
         self.airplane_path = self.base_path + "airplane.jsonl"
-        self.airplane_df = pd.read_json(
-            self.airplane_path, lines=True, keep_default_dates=False
-        )
+        self._airplane_df = None
         city_list = [
             "上海",
             "北京",
@@ -28,32 +48,97 @@ class IntercityTransport:
             "武汉",
             "南京",
         ]
-        self.train_df_dict = {}
-
-        for start_city in city_list:
-            for end_city in city_list:
-                if start_city == end_city:
-                    continue
-                train_path = (
-                    self.base_path
-                    + "train/"
-                    + "from_{}_to_{}.json".format(start_city, end_city)
-                )
-                train_df = pd.read_json(train_path)
-                self.train_df_dict[(start_city, end_city)] = train_df
+        # one table per (start_city, end_city), loaded on first access
+        self.train_df_dict = LazyCityDict(
+            [
+                (start_city, end_city)
+                for start_city in city_list
+                for end_city in city_list
+                if start_city != end_city
+            ],
+            self.load_trains,
+        )
+        # (start_city, end_city, intercity_type) -> (sorted table, departure
+        # minutes), see _timetable()
+        self._timetables = {}
+        if not lazy:
+            self.preload()
+
+    @property
+    def airplane_df(self):
+        if self._airplane_df is None:
+            self._airplane_df = read_json_cached(
+                self.airplane_path, lines=True, keep_default_dates=False
+            )
+        return self._airplane_df
+
+    def load_trains(self, key):
+        start_city, end_city = key
+        train_path = (
+            self.base_path + "train/" + "from_{}_to_{}.json".format(start_city, end_city)
+        )
+        return read_json_cached(train_path)
+
+    def preload(self, cities=None):
+        """
+        Load the flights and the trains between the given cities (all of
+        them if None).
+        """
+        self.airplane_df
+        for start_city, end_city in self.train_df_dict:
+            if cities is None or (start_city in cities and end_city in cities):
+                self.train_df_dict[(start_city, end_city)]
+
+    def evict(self, city=None):
+        """
+        Release the trains from or to the city (every table if None).
+        """
+        if city is None:
+            self._airplane_df = None
+            self.train_df_dict.evict()
+            self._timetables.clear()
+            return
+        for start_city, end_city in self.train_df_dict:
+            if city in (start_city, end_city):
+                self.train_df_dict.evict((start_city, end_city))
+        for key in list(self._timetables):
+            if key[2] == "train" and city in key[:2]:
+                self._timetables.pop(key, None)
 
     def select(
         self, start_city, end_city, intercity_type, earliest_leave_time="00:00"
     ) -> DataFrame:
         if intercity_type not in ["train", "airplane"]:
             return "only support intercity_type in ['train','airplane']"
-        res = self._select(start_city, end_city, intercity_type)
+        res, minutes = self._timetable(start_city, end_city, intercity_type)
         bool_list = [False] * len(res)
-        for i in range(len(res)):
-            if time2float(res.loc[i, "BeginTime"]) >= time2float(earliest_leave_time):
-                bool_list[i] = True
+        if bool_list:
+            earliest = time2minutes(earliest_leave_time)
+            if minutes.sorted:
+                first = bisect_left(minutes, earliest)
+                bool_list[first:] = [True] * (len(res) - first)
+            else:
+                bool_list = [t >= earliest for t in minutes]
         return res[bool_list]
 
+    def _timetable(self, start_city, end_city, intercity_type):
+        """
+        _select() and the departure times of its rows in minutes, computed
+        once per query. The table is shared between calls and must not be
+        modified.
+        """
+        key = (start_city, end_city, intercity_type)
+        try:
+            return self._timetables[key]
+        except KeyError:
+            pass
+        res = self._select(start_city, end_city, intercity_type)
+        minutes = None
+        if res is not None:
+            minutes = Departures(time2minutes(t) for t in res["BeginTime"])
+        self._timetables[key] = (res, minutes)
+        return res, minutes
+
     def _select(self, start_city, end_city, intercity_type) -> DataFrame:
         # intercity_type=='train' | 'airplane'
         if intercity_type == "airplane":
@@ -0,0 +1,91 @@
+import threading
+from collections.abc import MutableMapping
+
+
+class LazyCityDict(MutableMapping):
+    """
+    A dict of per-city tables (or anything keyed by city) whose values are
+    loaded on first access with loader(key) and can be evicted again.
+    The keys are known upfront, so iterating or testing membership does not
+    load anything.
+    """
+
+    def __init__(self, keys, loader):
+        self._keys = dict.fromkeys(keys)
+        self._loader = loader
+        self._values = {}
+        self._lock = threading.RLock()
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        if key not in self._keys:
+            raise KeyError(key)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = self._loader(key)
+            return self._values[key]
+
+    def __setitem__(self, key, value):
+        self._keys[key] = None
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        del self._keys[key]
+        self._values.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return "LazyCityDict(loaded={})".format(self.loaded())
+
+    def loaded(self):
+        return [key for key in self._keys if key in self._values]
+
+    def evict(self, key=None):
+        """
+        Drop the loaded value of key (of every key if None); it is loaded
+        again on the next access. Values set explicitly are dropped too.
+        """
+        with self._lock:
+            if key is None:
+                self._values.clear()
+            else:
+                self._values.pop(key, None)
+
+
+class LazyCityTool:
+    """
+    preload() and evict() for a tool whose per-city data lives in
+    LazyCityDict attributes.
+    """
+
+    def lazy_dicts(self):
+        return [
+            value for value in vars(self).values() if isinstance(value, LazyCityDict)
+        ]
+
+    def preload(self, cities=None):
+        """
+        Load the given cities (all of them if None) ahead of their first use.
+        """
+        for lazy_dict in self.lazy_dicts():
+            for key in lazy_dict:
+                if cities is None or key in cities:
+                    lazy_dict[key]
+
+    def evict(self, city=None):
+        """
+        Release the data of the city (of every city if None).
+        """
+        for lazy_dict in self.lazy_dicts():
+            lazy_dict.evict(city)
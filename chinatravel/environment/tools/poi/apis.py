@@ -1,9 +1,100 @@
 import os
 import json
+import numpy as np
 
+from chinatravel.environment.tools.lazy import LazyCityDict, LazyCityTool
 
-class Poi:
-    def __init__(self, base_path: str = "../../database/poi/", en_version=False):
+
+# WGS-84, the ellipsoid used by geopy's geodesic, in kilometers
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+
+def geodesic_distance(lat, lon, lats, lons, max_iter=200, tol=1e-12):
+    """
+    Vectorized Vincenty inverse formula: distances in kilometers from the point
+    (lat, lon) to every point of the arrays (lats, lons). Within a city it
+    agrees with geopy's geodesic to well below a millimeter.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        L = np.radians(lons - lon)
+        U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat)))
+        U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lats)))
+        sin_U1, cos_U1 = np.sin(U1), np.cos(U1)
+        sin_U2, cos_U2 = np.sin(U2), np.cos(U2)
+
+        lam = L
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt(
+                (cos_U2 * sin_lam) ** 2
+                + (cos_U1 * sin_U2 - sin_U1 * cos_U2 * cos_lam) ** 2
+            )
+            cos_sigma = sin_U1 * sin_U2 + cos_U1 * cos_U2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(
+                sin_sigma == 0, 0.0, cos_U1 * cos_U2 * sin_lam / sin_sigma
+            )
+            cos2_alpha = 1 - sin_alpha**2
+            cos_2sigma_m = np.where(
+                cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_U1 * sin_U2 / cos2_alpha
+            )
+            C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma
+                + C
+                * sin_sigma
+                * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m**2))
+            )
+            if np.all(np.abs(lam - lam_prev) < tol):
+                break
+
+        u2 = cos2_alpha * (WGS84_A**2 - WGS84_B**2) / WGS84_B**2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = (
+            B
+            * sin_sigma
+            * (
+                cos_2sigma_m
+                + B
+                / 4
+                * (
+                    cos_sigma * (-1 + 2 * cos_2sigma_m**2)
+                    - B
+                    / 6
+                    * cos_2sigma_m
+                    * (-3 + 4 * sin_sigma**2)
+                    * (-3 + 4 * cos_2sigma_m**2)
+                )
+            )
+        )
+        return WGS84_B * A * (sigma - delta_sigma)
+
+
+def nearest_rows(distance, within, topk=None):
+    """
+    Positions of the rows where `within` holds, sorted by distance (ties keep
+    the row order) and cut to the first topk like DataFrame.head(topk).
+    Only the topk nearest rows are sorted.
+    """
+    rows = np.flatnonzero(within)
+    if topk is not None and 0 < topk < len(rows):
+        rows = np.sort(rows[np.argpartition(distance[rows], topk - 1)[:topk]])
+    rows = rows[np.argsort(distance[rows], kind="stable")]
+    if topk is not None:
+        rows = rows[:topk]
+    return rows
+
+
+class Poi(LazyCityTool):
+    def __init__(
+        self, base_path: str = "../../database/poi/", en_version=False, lazy=False
+    ):
 
         city_list = [
             "beijing",
@@ -21,18 +112,6 @@ class Poi:
         data_path_list = [
             os.path.join(curdir, f"{base_path}/{city}/poi.json") for city in city_list
         ]
-        self.data = {}
-        for i, city in enumerate(city_list):
-            self.data[city] = json.load(open(data_path_list[i], "r", encoding="utf-8"))
-            city_data = {}
-            for name_pos in self.data[city]:
-                name = name_pos["name"]
-                pos = name_pos["position"]
-                city_data[name] = tuple(pos)
-            self.data[city] = city_data
-            # self.data[city] = [
-            #     (x["name"], tuple(x["position"])) for x in self.data[city]
-            # ]
         city_cn_list = [
             "北京",
             "上海",
@@ -45,10 +124,23 @@ class Poi:
             "广州",
             "重庆",
         ]
-        for i, city in enumerate(city_list):
-            self.data[city_cn_list[i]] = self.data.pop(city)
+        # keyed by the Chinese city name and loaded on first access
+        self.data_path = dict(zip(city_cn_list, data_path_list))
+        self.data = LazyCityDict(city_cn_list, self.load_city)
         self.city_cn_list = city_cn_list
         self.city_list = city_list
+        if not lazy:
+            self.preload()
+
+    def load_city(self, city):
+        with open(self.data_path[city], "r", encoding="utf-8") as f:
+            poi_list = json.load(f)
+        city_data = {}
+        for name_pos in poi_list:
+            name = name_pos["name"]
+            pos = name_pos["position"]
+            city_data[name] = tuple(pos)
+        return city_data
 
     def search(self, city: str, name: str):
         if city in self.city_list:
@@ -0,0 +1,478 @@
+"""
+Vectorized evaluation of select() filters.
+
+select(city, key, func) keeps the rows whose value of `key` satisfies func.
+The filters used in practice are a handful of shapes (lambda x: True,
+lambda x: x == name, lambda x: x in names, lambda x: lo <= x <= hi,
+lambda x: "sub" in x), which compile_predicate() recognises from the
+source of the lambda and turns into a Predicate that filters the whole
+column at once. The Predicate classes can also be passed to select()
+directly. Everything else runs through the original per-row loop.
+"""
+
+import ast
+import builtins
+import functools
+import linecache
+import operator
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype, is_bool_dtype, is_numeric_dtype
+
+
+COMPARE_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+# a op x  <=>  x SWAPPED_OPS[op] a
+SWAPPED_OPS = {"==": "==", "!=": "!=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+
+def constant_fits(kind, value):
+    # only constants whose comparison with the column gives, row by row,
+    # what the Python operator gives
+    if kind == "string":
+        return isinstance(value, str)
+    if kind == "numeric":
+        return (
+            isinstance(value, (int, float, np.integer, np.floating))
+            and not isinstance(value, (bool, np.bool_))
+            and value == value
+        )
+    return False
+
+
+class Predicate:
+    """
+    A select() filter that can be evaluated on a whole column at once.
+    Calling it on a single value gives the same answer as the row filter,
+    so it can be used wherever a plain function is expected.
+    """
+
+    def mask(self, index, key):
+        """
+        Boolean mask over the rows, or None if the column does not allow a
+        vectorized evaluation.
+        """
+        raise NotImplementedError
+
+    def rows(self, index, key):
+        mask = self.mask(index, key)
+        if mask is None:
+            return None
+        return np.flatnonzero(mask)
+
+
+class Const(Predicate):
+    def __init__(self, value: bool):
+        self.value = value
+
+    def __call__(self, x):
+        return self.value
+
+    def mask(self, index, key):
+        return np.full(len(index.data), self.value, dtype=bool)
+
+    def __repr__(self):
+        return "Const({!r})".format(self.value)
+
+
+class Compare(Predicate):
+    """x <op> value, op being one of ==, !=, <, <=, >, >=."""
+
+    def __init__(self, op: str, value):
+        self.op = op
+        self.value = value
+
+    def __call__(self, x):
+        return COMPARE_OPS[self.op](x, self.value)
+
+    def mask(self, index, key):
+        if not constant_fits(index.kind(key), self.value):
+            return None
+        column = index.data[key]
+        return COMPARE_OPS[self.op](column, self.value).to_numpy(dtype=bool)
+
+    def rows(self, index, key):
+        if self.op == "==" and index.kind(key) == "string":
+            if not isinstance(self.value, str):
+                return None
+            return index.positions(key).get(self.value, np.empty(0, dtype=np.intp))
+        return super().rows(index, key)
+
+    def __repr__(self):
+        return "Compare({!r}, {!r})".format(self.op, self.value)
+
+
+class In(Predicate):
+    """x in values (x not in values if negate)."""
+
+    def __init__(self, values, negate: bool = False):
+        self.values = values
+        self.negate = negate
+
+    def __call__(self, x):
+        return (x in self.values) != self.negate
+
+    def fits(self, index, key):
+        kind = index.kind(key)
+        return all(constant_fits(kind, value) for value in self.values)
+
+    def mask(self, index, key):
+        if not self.fits(index, key):
+            return None
+        mask = index.data[key].isin(list(self.values)).to_numpy(dtype=bool)
+        return ~mask if self.negate else mask
+
+    def rows(self, index, key):
+        if self.negate or index.kind(key) != "string":
+            return super().rows(index, key)
+        if not self.fits(index, key):
+            return None
+        positions = index.positions(key)
+        found = [positions[value] for value in set(self.values) if value in positions]
+        if not found:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(np.concatenate(found))
+
+    def __repr__(self):
+        return "In({!r}, negate={!r})".format(self.values, self.negate)
+
+
+class Contains(Predicate):
+    """substring in x (substring not in x if negate), for string columns."""
+
+    def __init__(self, substring: str, negate: bool = False):
+        self.substring = substring
+        self.negate = negate
+
+    def __call__(self, x):
+        return (self.substring in x) != self.negate
+
+    def mask(self, index, key):
+        if index.kind(key) != "string" or not isinstance(self.substring, str):
+            return None
+        column = index.data[key]
+        mask = column.str.contains(self.substring, regex=False).to_numpy(dtype=bool)
+        return ~mask if self.negate else mask
+
+    def __repr__(self):
+        return "Contains({!r}, negate={!r})".format(self.substring, self.negate)
+
+
+class And(Predicate):
+    def __init__(self, *predicates: Predicate):
+        self.predicates = predicates
+
+    def __call__(self, x):
+        return all(predicate(x) for predicate in self.predicates)
+
+    def mask(self, index, key):
+        mask = np.ones(len(index.data), dtype=bool)
+        for predicate in self.predicates:
+            sub_mask = predicate.mask(index, key)
+            if sub_mask is None:
+                return None
+            mask &= sub_mask
+        return mask
+
+    def __repr__(self):
+        return "And({})".format(", ".join(repr(p) for p in self.predicates))
+
+
+class Between(And):
+    """low <= x <= high"""
+
+    def __init__(self, low, high):
+        super().__init__(Compare(">=", low), Compare("<=", high))
+
+
+class Unsupported(Exception):
+    pass
+
+
+# the argument of the filter
+ARG = object()
+
+
+class Known:
+    """A value the filter reads from its constants, defaults, closure or globals."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+AST_COMPARE_OPS = {
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.In: "in",
+    ast.NotIn: "not in",
+}
+SUBSCRIPTABLE_TYPES = (dict, list, tuple)
+CONTAINER_TYPES = (list, tuple, set, frozenset, dict)
+
+
+@functools.lru_cache(maxsize=64)
+def source_tree(filename):
+    lines = linecache.getlines(filename)
+    if not lines:
+        return None
+    try:
+        return ast.parse("".join(lines), filename)
+    except (SyntaxError, ValueError):
+        return None
+
+
+@functools.lru_cache(maxsize=1024)
+def lambda_node(code):
+    """
+    The ast.Lambda node of the lambda whose code is code, None if its source
+    is not available (e.g. the lambda comes from eval) or if it cannot be
+    told apart from the other lambdas of its line.
+    """
+    if code.co_name != "<lambda>":
+        return None
+    tree = source_tree(code.co_filename)
+    if tree is None:
+        return None
+    arg_names = list(code.co_varnames[: code.co_argcount])
+    candidates = [
+        node
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Lambda)
+        and node.lineno == code.co_firstlineno
+        and [arg.arg for arg in node.args.args] == arg_names
+        and not node.args.posonlyargs
+        and not node.args.kwonlyargs
+        and node.args.vararg is None
+        and node.args.kwarg is None
+    ]
+    if len(candidates) > 1 and hasattr(code, "co_positions"):
+        # the column of each instruction tells apart the lambdas of a line
+        starts = {(line, col) for line, _, col, _ in code.co_positions()}
+        candidates = [
+            node for node in candidates if (node.body.lineno, node.body.col_offset) in starts
+        ]
+    if len({ast.dump(node.body) for node in candidates}) != 1:
+        return None
+    return candidates[0]
+
+
+class FilterCompiler:
+    """
+    Translation of a one-argument lambda, from its source, into a Predicate.
+    Only a body that compares the argument with known values and combines
+    the comparisons with `and` (or a chained comparison) is accepted.
+    """
+
+    def __init__(self, func):
+        code = func.__code__
+        node = lambda_node(code)
+        if node is None:
+            raise Unsupported
+        defaults = func.__defaults__ or ()
+        if code.co_argcount - len(defaults) != 1:
+            raise Unsupported
+        self.func = func
+        self.code = code
+        self.node = node
+        self.arg = code.co_varnames[0]
+        self.defaults = dict(
+            zip(code.co_varnames[code.co_argcount - len(defaults) : code.co_argcount], defaults)
+        )
+
+    def name(self, name):
+        if name == self.arg:
+            return ARG
+        if name in self.defaults:
+            return Known(self.defaults[name])
+        if name in self.code.co_varnames:
+            raise Unsupported
+        if name in self.code.co_freevars:
+            cell = self.func.__closure__[self.code.co_freevars.index(name)]
+            try:
+                return Known(cell.cell_contents)
+            except ValueError:
+                raise Unsupported
+        if name in self.func.__globals__:
+            return Known(self.func.__globals__[name])
+        if hasattr(builtins, name):
+            return Known(getattr(builtins, name))
+        raise Unsupported
+
+    def value(self, node):
+        """ARG or the Known value of an operand."""
+        if isinstance(node, ast.Constant):
+            return Known(node.value)
+        if isinstance(node, ast.Name):
+            return self.name(node.id)
+        if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+            items = [self.value(item) for item in node.elts]
+            if not all(isinstance(item, Known) for item in items):
+                raise Unsupported
+            items = [item.value for item in items]
+            if isinstance(node, ast.Set):
+                return Known(set(items))
+            return Known(tuple(items))
+        if isinstance(node, ast.Subscript):
+            container, key = self.value(node.value), self.value(node.slice)
+            if not (
+                isinstance(key, Known)
+                and isinstance(container, Known)
+                and isinstance(container.value, SUBSCRIPTABLE_TYPES)
+            ):
+                raise Unsupported
+            try:
+                return Known(container.value[key.value])
+            except Exception:
+                raise Unsupported
+        raise Unsupported
+
+    def compare(self, op, left, right):
+        if op in ("in", "not in"):
+            return self.contains(left, right, op == "not in")
+        if left is ARG and isinstance(right, Known):
+            return Compare(op, right.value)
+        if isinstance(left, Known) and right is ARG:
+            return Compare(SWAPPED_OPS[op], left.value)
+        raise Unsupported
+
+    def contains(self, item, container, negate):
+        if item is ARG and isinstance(container, Known):
+            if not isinstance(container.value, CONTAINER_TYPES):
+                raise Unsupported
+            return In(tuple(container.value), negate)
+        if isinstance(item, Known) and container is ARG:
+            if not isinstance(item.value, str):
+                raise Unsupported
+            return Contains(item.value, negate)
+        raise Unsupported
+
+    def conjuncts(self, node):
+        """The list of predicates whose conjunction is the expression node."""
+        if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+            return [
+                predicate for operand in node.values for predicate in self.conjuncts(operand)
+            ]
+        if isinstance(node, ast.Compare):
+            # a < b < c is a < b and b < c
+            operands = [self.value(operand) for operand in [node.left] + node.comparators]
+            conjuncts = []
+            for op, left, right in zip(node.ops, operands, operands[1:]):
+                if type(op) not in AST_COMPARE_OPS:
+                    raise Unsupported
+                conjuncts.append(self.compare(AST_COMPARE_OPS[type(op)], left, right))
+            return conjuncts
+        raise Unsupported
+
+    def run(self):
+        body = self.node.body
+        if isinstance(body, (ast.Constant, ast.Name)):
+            result = self.value(body)
+            if isinstance(result, Known) and result.value is True:
+                return []
+            if isinstance(result, Known) and result.value is False:
+                return [Const(False)]
+            raise Unsupported
+        return self.conjuncts(body)
+
+
+def compile_predicate(func):
+    """
+    The Predicate equivalent to the filter func, or None if func is not one
+    of the recognised shapes.
+    """
+    if callable(getattr(func, "rows", None)) and callable(getattr(func, "mask", None)):
+        return func
+    if not hasattr(func, "__code__"):
+        return None
+    try:
+        conjuncts = FilterCompiler(func).run()
+    except (Unsupported, TypeError):
+        return None
+    if not conjuncts:
+        return Const(True)
+    if len(conjuncts) == 1:
+        return conjuncts[0]
+    return And(*conjuncts)
+
+
+class ColumnIndex:
+    """
+    Facts about the columns of one table that select() reuses between calls:
+    the kind of each column and, for string columns, a value -> row positions
+    map. Bound to one DataFrame.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.kinds = {}
+        self.value_positions = {}
+
+    def kind(self, key):
+        if key not in self.kinds:
+            column = self.data[key]
+            if (
+                (column.dtype == object or isinstance(column.dtype, pd.StringDtype))
+                and not column.isna().any()
+                and infer_dtype(column, skipna=False) == "string"
+            ):
+                self.kinds[key] = "string"
+            elif is_numeric_dtype(column) and not is_bool_dtype(column):
+                self.kinds[key] = "numeric"
+            else:
+                self.kinds[key] = None
+        return self.kinds[key]
+
+    def positions(self, key):
+        if key not in self.value_positions:
+            column = self.data[key]
+            self.value_positions[key] = column.groupby(column, sort=False).indices
+        return self.value_positions[key]
+
+
+class SelectIndex:
+    """
+    The ColumnIndex of each city of a tool. An index is dropped when the
+    table of its city is replaced.
+    """
+
+    def __init__(self):
+        self.tables = {}
+
+    def table(self, city, data):
+        index = self.tables.get(city)
+        if index is None or index.data is not data:
+            index = self.tables[city] = ColumnIndex(data)
+        return index
+
+    def evict(self, city=None):
+        if city is None:
+            self.tables.clear()
+        else:
+            self.tables.pop(city, None)
+
+    def select(self, city, data, key, func):
+        """
+        data[func(data[key])], i.e. the rows of data whose value of key
+        satisfies func, in their original order.
+        """
+        predicate = compile_predicate(func)
+        if predicate is not None and len(data):
+            try:
+                rows = predicate.rows(self.table(city, data), key)
+            except Exception:
+                rows = None
+            if rows is not None:
+                return data.iloc[rows]
+        bool_list = [func(x) for x in data[key]]
+        return data[bool_list]
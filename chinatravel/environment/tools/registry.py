@@ -0,0 +1,77 @@
+"""
+Process-wide shared instances of the environment tools.
+
+Every tool reads its part of the database when it is constructed, so code
+that only queries the data takes the shared instance from here instead of
+building its own:
+
+    from chinatravel.environment.tools.registry import get_tool
+    attractions = get_tool("attractions")
+
+The shared instances are lazy: the table of a city is read on its first
+access, so taking a tool costs nothing until it is queried.
+"""
+
+import importlib
+import threading
+
+
+TOOL_CLASSES = {
+    "attractions": ("chinatravel.environment.tools.attractions.apis", "Attractions"),
+    "accommodations": (
+        "chinatravel.environment.tools.accommodations.apis",
+        "Accommodations",
+    ),
+    "restaurants": ("chinatravel.environment.tools.restaurants.apis", "Restaurants"),
+    "intercity_transport": (
+        "chinatravel.environment.tools.intercity_transport.apis",
+        "IntercityTransport",
+    ),
+    "transportation": (
+        "chinatravel.environment.tools.transportation.apis",
+        "Transportation",
+    ),
+    "poi": ("chinatravel.environment.tools.poi.apis", "Poi"),
+}
+
+_tools = {}
+# reentrant: building a tool may take other tools from the registry
+_lock = threading.RLock()
+
+
+def get_tool(name: str):
+    """
+    The shared instance of the tool, built on first use.
+    """
+    tool = _tools.get(name)
+    if tool is not None:
+        return tool
+    if name not in TOOL_CLASSES:
+        raise KeyError(
+            "Unknown tool: {}. Available tools: {}".format(
+                name, ", ".join(TOOL_CLASSES)
+            )
+        )
+    with _lock:
+        if name not in _tools:
+            module_name, class_name = TOOL_CLASSES[name]
+            module = importlib.import_module(module_name)
+            _tools[name] = getattr(module, class_name)(lazy=True)
+        return _tools[name]
+
+
+def warm_up(names=None, cities=None):
+    """
+    Load the given tools (all of them by default) for the given cities (all
+    of them by default, Chinese names) ahead of their first use.
+    """
+    for name in names or TOOL_CLASSES:
+        get_tool(name).preload(cities)
+
+
+def clear_tools():
+    """
+    Drop the shared instances, e.g. after the database has changed.
+    """
+    with _lock:
+        _tools.clear()
@@ -2,16 +2,16 @@ import pandas as pd
 from pandas import DataFrame
 from typing import Callable
 import os
-from geopy.distance import geodesic
 
-import sys
+from chinatravel.environment.tools.poi.apis import geodesic_distance, nearest_rows
+from chinatravel.environment.tools.lazy import LazyCityDict, LazyCityTool
+from chinatravel.environment.tools.predicates import Compare, SelectIndex
+from chinatravel.environment.tools.registry import get_tool
+from chinatravel.environment.tools.tables import read_csv_cached
 
-sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-from poi.apis import Poi
 
-
-class Restaurants:
-    def __init__(self, base_path: str = "../../database/restaurants"):
+class Restaurants(LazyCityTool):
+    def __init__(self, base_path: str = "../../database/restaurants", lazy=False):
         city_list = [
             "beijing",
             "shanghai",
@@ -24,22 +24,7 @@ class Restaurants:
             "guangzhou",
             "chongqing",
         ]
-        self.data = {}
         curdir = os.path.dirname(os.path.realpath(__file__))
-        for city in city_list:
-            path = os.path.join(curdir, base_path, city, "restaurants_" + city + ".csv")
-            self.data[city] = pd.read_csv(path)
-
-        self.key_type_tuple_list_map = {}
-        for city in city_list:
-            self.key_type_tuple_list_map[city] = []
-            for key in self.data[city].keys():
-                self.key_type_tuple_list_map[city].append(
-                    (key, type(self.data[city][key][0]))
-                )
-        self.cuisine_list_map = {}
-        for city in city_list:
-            self.cuisine_list_map[city] = self.data[city]["cuisine"].unique()
         city_cn_list = [
             "北京",
             "上海",
@@ -53,14 +38,34 @@ class Restaurants:
             "重庆",
         ]
 
+        # tables are keyed by the Chinese city name and loaded on first access
+        self.data_path = {}
         for i, city in enumerate(city_list):
-            self.data[city_cn_list[i]] = self.data.pop(city)
-            self.key_type_tuple_list_map[city_cn_list[i]] = (
-                self.key_type_tuple_list_map.pop(city)
+            self.data_path[city_cn_list[i]] = os.path.join(
+                curdir, base_path, city, "restaurants_" + city + ".csv"
             )
-            self.cuisine_list_map[city_cn_list[i]] = self.cuisine_list_map.pop(city)
+        self.data = LazyCityDict(city_cn_list, self.load_city)
+        self.key_type_tuple_list_map = LazyCityDict(
+            city_cn_list,
+            lambda city: [
+                (key, type(self.data[city][key][0])) for key in self.data[city].keys()
+            ],
+        )
+        self.cuisine_list_map = LazyCityDict(
+            city_cn_list, lambda city: self.data[city]["cuisine"].unique()
+        )
+
+        self.poi = get_tool("poi")
+        self.select_index = SelectIndex()
+        if not lazy:
+            self.preload()
+
+    def load_city(self, city):
+        return read_csv_cached(self.data_path[city])
 
-        self.poi = Poi()
+    def evict(self, city=None):
+        super().evict(city)
+        self.select_index.evict(city)
 
     def keys(self, city: str):
         return self.key_type_tuple_list_map[city]
@@ -68,8 +73,13 @@ class Restaurants:
     def select(self, city: str, key, func: Callable) -> DataFrame:
         if key not in self.data[city].keys():
             return "Key not found."
-        bool_list = [func(x) for x in self.data[city][key]]
-        return self.data[city][bool_list]
+        return self.select_index.select(city, self.data[city], key, func)
+
+    def get_by_name(self, city: str, name: str) -> DataFrame:
+        # same rows as select(city, "name", lambda x: x == name), from a hash index
+        return self.select_index.select(
+            city, self.data[city], "name", Compare("==", name)
+        )
 
     def id_is_open(self, city: str, id: int, time: str) -> bool:
         match = self.data[city].loc[self.data[city]["id"] == id]
@@ -98,16 +108,14 @@ class Restaurants:
         if isinstance(lat_lon, str):
             return lat_lon
         lat, lon = lat_lon
-        distance = [
-            geodesic((lat, lon), (x, y)).km
-            for x, y in zip(self.data[city]["lat"], self.data[city]["lon"])
-        ]
-        tmp = self.data[city].copy()
-        tmp["distance"] = distance
-        tmp = tmp.sort_values(by=["distance"])
-        if topk is None:
-            return tmp[tmp["distance"] <= dist]
-        return tmp[tmp["distance"] <= dist].head(topk)
+        distance = geodesic_distance(
+            lat,
+            lon,
+            self.data[city]["lat"].to_numpy(),
+            self.data[city]["lon"].to_numpy(),
+        )
+        rows = nearest_rows(distance, distance <= dist, topk)
+        return self.data[city].iloc[rows].assign(distance=distance[rows])
 
     def restaurants_with_recommended_food(self, city: str, food: str):
         return self.data[city][self.data[city]["recommendedfood"].str.contains(food)]
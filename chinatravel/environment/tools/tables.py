@@ -0,0 +1,245 @@
+"""
+Binary columnar cache of the database tables.
+
+read_csv_cached(path) and read_json_cached(path) return the same DataFrame as
+pd.read_csv(path) and pd.read_json(path). The first call converts the table
+to one binary file of column arrays under <cache root>/tables/, keyed by a hash of
+the source file; later calls, in any process, memory-map the numeric columns
+and rebuild the string columns from fixed-width arrays instead of parsing
+CSV or JSON again. A table that cannot be stored exactly is read from its
+source every time.
+
+    python -m chinatravel.environment.tools.tables
+converts the whole database ahead of time.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype
+
+from chinatravel.environment.tools.cache import cache_path, restamp, source_stamp
+
+
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+class Uncacheable(Exception):
+    pass
+
+
+def encode_column(column):
+    """
+    (spec, arrays) of a column: numpy-native columns are stored as they are,
+    string columns as fixed-width unicode plus a mask of the missing values.
+    """
+    values = column.to_numpy()
+    if column.dtype.kind in "biufcmM" and isinstance(column.dtype, np.dtype):
+        return {"kind": "native"}, {"values": values}
+
+    if column.dtype != object and not isinstance(column.dtype, pd.StringDtype):
+        raise Uncacheable(column.dtype)
+    values = column.to_numpy(dtype=object, na_value=None)
+    missing = column.isna().to_numpy()
+    if infer_dtype(values[~missing], skipna=False) not in ("string", "empty"):
+        raise Uncacheable(column.dtype)
+    strings = values[~missing]
+    # fixed-width unicode arrays drop trailing NULs
+    if any(s.endswith("\0") for s in strings):
+        raise Uncacheable(column.dtype)
+
+    na = None
+    if missing.any():
+        na_values = column[missing].tolist()
+        if all(v is None for v in na_values):
+            na = "none"
+        elif all(isinstance(v, float) and v != v for v in na_values):
+            na = "nan"
+        else:
+            raise Uncacheable(column.dtype)
+    filled = values.copy()
+    filled[missing] = ""
+    return {"kind": "string", "dtype": str(column.dtype), "na": na}, {
+        "values": filled.astype(str) if len(filled) else np.array([], dtype="<U1"),
+        "missing": missing,
+    }
+
+
+def decode_column(spec, arrays):
+    if spec["kind"] == "native":
+        return arrays["values"]
+    values = arrays["values"].astype(object)
+    if spec["na"] is not None:
+        values[arrays["missing"]] = None if spec["na"] == "none" else np.nan
+    if spec["dtype"] == "object":
+        return values
+    return pd.array(values, dtype=spec["dtype"])
+
+
+def save_table(table_dir, df, meta):
+    if not all(isinstance(name, str) for name in df.columns):
+        raise Uncacheable("column names")
+    if df.columns.duplicated().any():
+        raise Uncacheable("duplicate columns")
+    arrays = []
+    if isinstance(df.index, pd.RangeIndex):
+        index = {
+            "kind": "range",
+            "start": df.index.start,
+            "stop": df.index.stop,
+            "step": df.index.step,
+        }
+    elif df.index.dtype.kind in "iu":
+        index = {"kind": "native", "values": len(arrays)}
+        arrays.append(df.index.to_numpy())
+    else:
+        raise Uncacheable("index")
+
+    columns = []
+    for name in df.columns:
+        spec, parts = encode_column(df[name])
+        spec["name"] = name
+        if spec.get("na") is None:
+            parts.pop("missing", None)
+        for part, array in parts.items():
+            spec[part] = len(arrays)
+            arrays.append(array)
+        columns.append(spec)
+
+    # all arrays back to back in one file, each at an aligned offset
+    layout = []
+    os.makedirs(table_dir)
+    with open(os.path.join(table_dir, "data.bin"), "wb") as f:
+        for array in arrays:
+            array = np.ascontiguousarray(array)
+            f.write(b"\0" * (-f.tell() % ALIGNMENT))
+            layout.append(
+                {"dtype": array.dtype.str, "count": len(array), "offset": f.tell()}
+            )
+            f.write(array.tobytes())
+    meta = dict(meta, index=index, columns=columns, arrays=layout)
+    with open(os.path.join(table_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def load_table(table_dir, meta):
+    with open(os.path.join(table_dir, "data.bin"), "rb") as f:
+        if os.fstat(f.fileno()).st_size > 0:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = b""
+    arrays = [
+        np.frombuffer(
+            buffer, dtype=np.dtype(a["dtype"]), count=a["count"], offset=a["offset"]
+        )
+        for a in meta["arrays"]
+    ]
+    data = {}
+    for spec in meta["columns"]:
+        parts = {part: arrays[spec[part]] for part in ("values", "missing") if part in spec}
+        data[spec["name"]] = decode_column(spec, parts)
+    index = meta["index"]
+    if index["kind"] == "range":
+        index = pd.RangeIndex(index["start"], index["stop"], index["step"])
+    else:
+        index = pd.Index(arrays[index["values"]])
+    return pd.DataFrame(data, index=index, columns=[c["name"] for c in meta["columns"]])
+
+
+def read_meta(table_dir):
+    try:
+        with open(os.path.join(table_dir, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_table_cached(path, reader, reader_name, **kwargs):
+    """
+    reader(path, **kwargs), served from the columnar cache when it is fresh.
+    """
+    path = os.path.realpath(path)
+    key = json.dumps([path, reader_name, kwargs], sort_keys=True, ensure_ascii=False)
+    table_dir = cache_path(
+        "tables",
+        "{}-{}".format(
+            os.path.basename(path), hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        ),
+    )
+    meta = read_meta(table_dir)
+    stamp = source_stamp([path], meta)
+    expected = {
+        "version": FORMAT_VERSION,
+        "key": key,
+        "fingerprint": stamp["fingerprint"],
+    }
+
+    if meta is not None and all(meta.get(k) == v for k, v in expected.items()):
+        restamp(os.path.join(table_dir, "meta.json"), meta, stamp)
+        if not meta.get("cacheable", True):
+            return reader(path, **kwargs)
+        try:
+            return load_table(table_dir, meta)
+        except Exception:
+            # a damaged entry, or another process is replacing it: rebuild
+            pass
+
+    df = reader(path, **kwargs)
+    try:
+        write_table_entry(table_dir, df, dict(expected, stats=stamp["stats"]))
+    except OSError:
+        # a read-only checkout, a full disk, a bad CHINATRAVEL_CACHE_DIR:
+        # the table is read without the cache
+        pass
+    return df
+
+
+def write_table_entry(table_dir, df, meta):
+    # build next to the final directory and swap it in, so that concurrent
+    # processes never see a half-written entry
+    tmp_dir = "{}.tmp-{}".format(table_dir, os.getpid())
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    try:
+        save_table(tmp_dir, df, meta)
+        if not load_table(tmp_dir, read_meta(tmp_dir)).equals(df):
+            raise Uncacheable("round trip")
+    except Uncacheable:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(dict(meta, cacheable=False), f, ensure_ascii=False)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    shutil.rmtree(table_dir, ignore_errors=True)
+    try:
+        os.replace(tmp_dir, table_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def read_csv_cached(path, **kwargs):
+    return read_table_cached(path, pd.read_csv, "read_csv", **kwargs)
+
+
+def read_json_cached(path, **kwargs):
+    return read_table_cached(path, pd.read_json, "read_json", **kwargs)
+
+
+if __name__ == "__main__":
+    from chinatravel.environment.tools import (
+        Accommodations,
+        Attractions,
+        IntercityTransport,
+        Restaurants,
+    )
+
+    for tool in [Attractions, Restaurants, Accommodations, IntercityTransport]:
+        tool()
+        print("{}: cached".format(tool.__name__))
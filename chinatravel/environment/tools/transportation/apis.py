@@ -1,9 +1,18 @@
 import os
 import json
 import heapq
+from functools import lru_cache
+import numpy as np
 from geopy.distance import geodesic
+from sklearn.neighbors import BallTree
 
-from chinatravel.environment.tools.poi.apis import Poi
+from chinatravel.environment.tools.lazy import LazyCityDict, LazyCityTool
+from chinatravel.environment.tools.registry import get_tool
+from chinatravel.environment.tools.transportation.distance_matrix import (
+    load_distance_matrix,
+)
+from chinatravel.environment.tools.transportation.metro_paths import load_metro_paths
+from chinatravel.environment.tools.transportation.travel_times import TravelTimeTable
 
 
 def get_lines_and_stations(city, SUBWAY_PATH):
@@ -103,6 +112,37 @@ def find_nearest_station(location, stations):
     return nearest_station, min_distance
 
 
+class StationIndex:
+    """
+    Haversine ball tree over the subway stations of a city.
+    The stations found on the sphere are re-ranked with geodesic, so nearest()
+    returns exactly what find_nearest_station returns, ties included.
+    """
+
+    # bound on |geodesic / haversine - 1| over the WGS-84 ellipsoid, with margin
+    SPHERE_ERROR = 0.01
+
+    def __init__(self, stations):
+        self.stations = stations
+        self.tree = None
+        if len(stations) > 0:
+            self.tree = BallTree(
+                np.radians([station["position"] for station in stations]),
+                metric="haversine",
+            )
+
+    def nearest(self, location):
+        if self.tree is None or not isinstance(location, tuple):
+            return find_nearest_station(location, self.stations)
+        point = np.radians([location])
+        dist, _ = self.tree.query(point, k=1)
+        radius = dist[0][0] * (1 + self.SPHERE_ERROR) / (1 - self.SPHERE_ERROR)
+        candidates = np.sort(self.tree.query_radius(point, r=radius + 1e-12)[0])
+        return find_nearest_station(
+            location, [self.stations[idx] for idx in candidates]
+        )
+
+
 def calculate_cost_taxi(distance):
     if distance <= 1.8:
         return 11.0
@@ -135,9 +175,72 @@ def calculate_cost(distance):
         return 9 + extra_cost
 
 
-class Transportation:
+def calculate_cost_taxi_many(distances):
+    # calculate_cost_taxi over an array, with the same operations
+    return np.where(
+        distances <= 1.8,
+        11.0,
+        np.where(
+            distances <= 10,
+            11.0 + (distances - 1.8) * 3.5,
+            11.0 + (10 - 1.8) * 3.5 + (distances - 10) * 4.5,
+        ),
+    )
+
+
+METRO_FARE_STAGES = np.array([4, 9, 14, 21, 28, 37, 48, 61])
+
+
+def calculate_cost_many(distances):
+    # calculate_cost over an array: 2 for the first stage, one more per
+    # stage passed, then one more per 15 kilometers beyond the last one
+    with np.errstate(invalid="ignore"):
+        return np.where(
+            distances <= 61,
+            2 + np.searchsorted(METRO_FARE_STAGES, distances, side="left"),
+            9 + (distances - 61 + 14) // 15,
+        )
+
+
+def round_many(values, ndigits):
+    # Python's round, which is correctly rounded where np.round is not, so
+    # that the values agree with those of goto
+    return np.array([round(value, ndigits) for value in values.tolist()])
+
+
+def schedule_route(route, start_time):
+    """
+    The transports of goto for a route of Transportation.route leaving at
+    start_time.
+    """
+    transports = []
+    for start, end, mode, cost, distance, hours in route:
+        end_time = add_time(start_time, hours)
+        transports.append(
+            {
+                "start": start,
+                "end": end,
+                "mode": mode,
+                "start_time": start_time,
+                "end_time": end_time,
+                "cost": cost,
+                "distance": distance,
+            }
+        )
+        start_time = end_time
+    return transports
+
+
+class Transportation(LazyCityTool):
+    # number of (city, start, end, transport_type) routes goto keeps
+    ROUTE_CACHE_SIZE = 1 << 16
+
     def __init__(
-        self, base_path: str = "../../database/transportation/", en_version=False
+        self,
+        base_path: str = "../../database/transportation/",
+        en_version=False,
+        lazy=False,
+        route_cache_size=ROUTE_CACHE_SIZE,
     ):
         self.city_list = [
             "shanghai",
@@ -165,108 +268,267 @@ class Transportation:
         ]
 
         curdir = os.path.dirname(os.path.realpath(__file__))
-        SUBWAY_PATH = os.path.join(curdir, base_path + "subways.json")
-        self.city_stations_dict = {}
-        self.city_lines_dict = {}
-        self.city_station_to_line = {}
-        for city in self.city_list:
-            stations_all, metro_lines, station_to_line = get_lines_and_stations(
-                city, SUBWAY_PATH
-            )
-            self.city_stations_dict[city] = stations_all
-            self.city_lines_dict[city] = metro_lines
-            self.city_station_to_line[city] = station_to_line
-
-        self.graphs = {}
-        for city in self.city_list:
-            self.graphs[city] = build_graph(self.city_lines_dict[city])
+        self.subway_path = os.path.join(curdir, base_path + "subways.json")
+        self.poi_path = os.path.join(curdir, "../../database/poi/")
+
+        # per-city data, keyed by the English city name and loaded on first access
+        self.metro = LazyCityDict(
+            self.city_list,
+            lambda city: get_lines_and_stations(city, self.subway_path),
+        )
+        self.city_stations_dict = LazyCityDict(
+            self.city_list, lambda city: self.metro[city][0]
+        )
+        self.city_lines_dict = LazyCityDict(
+            self.city_list, lambda city: self.metro[city][1]
+        )
+        self.city_station_to_line = LazyCityDict(
+            self.city_list, lambda city: self.metro[city][2]
+        )
+        self.graphs = LazyCityDict(
+            self.city_list, lambda city: build_graph(self.city_lines_dict[city])
+        )
+        self.station_index = LazyCityDict(
+            self.city_list, lambda city: StationIndex(self.city_stations_dict[city])
+        )
+        # all-pairs station paths, replaces dijkstra() on each metro goto
+        self.metro_paths = LazyCityDict(
+            self.city_list,
+            lambda city: load_metro_paths(city, self.subway_path, self.graphs[city]),
+        )
+        # precomputed POI distances (None if not built), goto falls back to
+        # geodesic without them
+        self.distance_matrices = LazyCityDict(
+            self.city_list,
+            lambda city: load_distance_matrix(
+                city, os.path.join(self.poi_path, city, "poi.json")
+            ),
+        )
+
+        # nearest subway station (and its distance) of each POI, for goto_many
+        self.poi_stations = LazyCityDict(self.city_list, lambda city: {})
+
+        self.poi_search = get_tool("poi")
+        # bounds on the travel times to the hotels and stations, filled on use
+        self.travel_times = LazyCityDict(
+            self.city_list, lambda city: TravelTimeTable(self, city)
+        )
+        # goto only shifts the timestamps of a cached route
+        self.cached_route = lru_cache(maxsize=route_cache_size)(self.route)
+        if not lazy:
+            self.preload()
+
+    def preload(self, cities=None):
+        if cities is not None:
+            cities = [self.to_english(city) for city in cities]
+        super().preload(cities)
+
+    def evict(self, city=None):
+        super().evict(city if city is None else self.to_english(city))
+        self.cached_route.cache_clear()
+
+    def to_english(self, city):
+        if city in self.city_list_chinese:
+            return self.city_list[self.city_list_chinese.index(city)]
+        return city
 
-        self.poi_search = Poi()
+    def poi_distance(self, city, start, end, coordinate_start, coordinate_end):
+        dist_matrix = self.distance_matrices.get(city)
+        if dist_matrix is not None:
+            distance = dist_matrix.distance(start, end)
+            if distance is not None:
+                return distance
+        return geodesic(coordinate_start, coordinate_end).kilometers
 
     def goto(self, city, start, end, start_time, transport_type, verbose=False):
         if transport_type not in ["walk", "metro", "taxi"]:
             return "only support transport_type in ['walk','metro','taxi']"
+        if verbose:
+            route = self.route(city, start, end, transport_type, verbose=True)
+        else:
+            route = self.cached_route(city, start, end, transport_type)
+        if isinstance(route, str):
+            return route
+        return schedule_route(route, start_time)
+
+    def goto_many(self, city, origin, destinations, start_time, transport_type):
+        """
+        goto from origin to each of destinations in one pass. Returns a dict
+        of NumPy arrays aligned with destinations, with the totals over the
+        transports goto returns: "distance" (kilometers), "duration" (hours),
+        "cost" (per person for the metro, per car for a taxi) and "end_time"
+        (the arrival, in minutes after 00:00). NaN where goto has no route: an
+        unknown POI, or a metro ride between POIs with the same nearest
+        station.
+        """
+        if transport_type not in ["walk", "metro", "taxi"]:
+            return "only support transport_type in ['walk','metro','taxi']"
+        destinations = list(destinations)
+        if transport_type == "metro":
+            distance, duration, minutes, cost = self.metro_many(
+                city, origin, destinations
+            )
+        else:
+            distance = self.poi_distance_many(city, origin, destinations)
+            if transport_type == "walk":
+                duration = distance / 5.0
+                cost = np.where(np.isnan(distance), np.nan, 0.0)
+            else:
+                duration = distance / 40.0
+                cost = round_many(calculate_cost_taxi_many(distance), 2)
+                distance = round_many(distance, 2)
+            minutes = np.floor(duration * 60)
+
+        hour, minute = start_time.split(":")
+        return {
+            "distance": distance,
+            "duration": duration,
+            "cost": cost,
+            "end_time": int(hour) * 60 + int(minute) + minutes,
+        }
+
+    def arrival_bounds(self, city, start, end, start_time):
+        """
+        (earliest, latest) arrival at end, in minutes after 00:00, over the
+        walk, taxi and metro routes goto gives from start at start_time; None
+        if a POI is unknown. The bounds may be a minute looser than the
+        routes, see TravelTimeTable.
+        """
+        bounds = self.travel_times[self.to_english(city)].bounds(start, end)
+        if bounds is None:
+            return None
+        hour, minute = start_time.split(":")
+        start_minutes = int(hour) * 60 + int(minute)
+        return start_minutes + bounds[0], start_minutes + bounds[1]
+
+    def poi_distance_many(self, city, origin, destinations):
+        # poi_distance from origin to each of destinations, NaN if unknown
+        dist_matrix = self.distance_matrices.get(self.to_english(city))
+        if dist_matrix is not None:
+            distance = dist_matrix.distances(origin, destinations)
+        else:
+            distance = np.full(len(destinations), np.nan)
+        missing = np.flatnonzero(np.isnan(distance))
+        if len(missing) > 0:
+            coordinate_origin = self.poi_search.search(city, origin)
+            if isinstance(coordinate_origin, tuple):
+                for k in missing:
+                    coordinate = self.poi_search.search(city, destinations[k])
+                    if isinstance(coordinate, tuple):
+                        distance[k] = geodesic(coordinate_origin, coordinate).kilometers
+        return distance
+
+    def nearest_station(self, city, name):
+        # (station, distance) of StationIndex.nearest for the POI, None if it
+        # is unknown
+        stations = self.poi_stations[city]
+        if name not in stations:
+            coordinate = self.poi_search.search(city, name)
+            stations[name] = (
+                self.station_index[city].nearest(coordinate)
+                if isinstance(coordinate, tuple)
+                else None
+            )
+        return stations[name]
+
+    def metro_many(self, city, origin, destinations):
+        # per-leg distances of the metro routes of goto, as route rounds them
+        city = self.to_english(city)
+        n = len(destinations)
+        walk_a, between, walk_b = np.full((3, n), np.nan)
+        nearest_origin = self.nearest_station(city, origin)
+        if nearest_origin is not None:
+            station_a, distance_a = nearest_origin
+            between_stations = {}
+            for k, destination in enumerate(destinations):
+                nearest = self.nearest_station(city, destination)
+                if nearest is None or nearest[0] == station_a:
+                    continue
+                station_b, distance_b = nearest
+                key = station_b["name"], station_b["position"]
+                if key not in between_stations:
+                    between_stations[key] = geodesic(
+                        station_a["position"], station_b["position"]
+                    ).kilometers
+                walk_a[k], between[k], walk_b[k] = (
+                    distance_a,
+                    between_stations[key],
+                    distance_b,
+                )
+
+        time_a, time_between, time_b = walk_a / 5.0, between / 30.0, walk_b / 5.0
+        distance = round_many(walk_a, 2) + round_many(between, 2)
+        distance += round_many(walk_b, 2)
+        duration = time_a + time_between + time_b
+        minutes = np.floor(time_a * 60) + np.floor(time_between * 60)
+        minutes += np.floor(time_b * 60)
+        return distance, duration, minutes, calculate_cost_many(between)
+
+    def route_cache_info(self):
+        """
+        Hits, misses, maxsize and current size of the route cache of goto.
+        """
+        return self.cached_route.cache_info()
+
+    def route(self, city, start, end, transport_type, verbose=False):
+        """
+        The time-independent part of goto: a tuple of legs
+        (start, end, mode, cost, distance, hours), or "No solution".
+        """
         locationA = start
         locationB = end
         coordinate_A = self.poi_search.search(city, locationA)
         coordinate_B = self.poi_search.search(city, locationB)
-        city_cn = city
         if city in self.city_list_chinese:
             city = self.city_list[self.city_list_chinese.index(city)]
         locationA_name, locationB_name = locationA, locationB
         locationA, locationB = coordinate_A, coordinate_B
-        transports = []
         if transport_type == "walk":
-            distance = geodesic(locationA, locationB).kilometers
+            distance = self.poi_distance(
+                city, locationA_name, locationB_name, locationA, locationB
+            )
             walking_speed = 5.0
             time = distance / walking_speed
             cost = 0.0
-            end_time = add_time(start_time, time)
-            transport = {
-                "start": locationA_name,
-                "end": locationB_name,
-                "mode": "walk",
-                "start_time": start_time,
-                "end_time": end_time,
-                "cost": cost,
-                "distance": distance,
-            }
-            transports.append(transport)
             if verbose:
                 print(
                     "Walk Distance {:.3} kilometers, Time {:.3} hour, Cost {}¥".format(
                         distance, time, int(cost)
                     )
                 )
-            return transports
+            return ((locationA_name, locationB_name, "walk", cost, distance, time),)
 
         elif transport_type == "taxi":
-            distance = geodesic(locationA, locationB).kilometers
+            distance = self.poi_distance(
+                city, locationA_name, locationB_name, locationA, locationB
+            )
             taxi_speed = 40.0
             time = distance / taxi_speed
             cost = calculate_cost_taxi(distance)
-            end_time = add_time(start_time, time)
-            transport = {
-                "start": locationA_name,
-                "end": locationB_name,
-                "mode": "taxi",
-                "start_time": start_time,
-                "end_time": end_time,
-                "cost": round(cost, 2),
-                "distance": round(distance, 2),
-            }
-            transports.append(transport)
             if verbose:
                 print(
                     "Taxi Distance {:.3} kilometers, Time {:.2} hour, Cost {}¥".format(
                         distance, time, int(cost)
                     )
                 )
-            return transports
+            return (
+                (
+                    locationA_name,
+                    locationB_name,
+                    "taxi",
+                    round(cost, 2),
+                    round(distance, 2),
+                    time,
+                ),
+            )
 
         elif transport_type == "metro":
-            graph = self.graphs[city]
-            stationA, distanceA = find_nearest_station(
-                locationA, self.city_stations_dict[city]
-            )
-            stationB, distanceB = find_nearest_station(
-                locationB, self.city_stations_dict[city]
-            )
+            stationA, distanceA = self.station_index[city].nearest(locationA)
+            stationB, distanceB = self.station_index[city].nearest(locationB)
             if stationA == stationB:
                 if verbose:
                     print("Too near. Walk.")
                 return "No solution"
-                return self.goto(
-                    city_cn,
-                    locationA_name,
-                    locationB_name,
-                    start_time,
-                    transport_type="walk",
-                    verbose=verbose,
-                )
-            shortest_path = find_shortest_path(
-                graph, stationA["name"], stationB["name"]
-            )
             if stationA and stationB:
                 distance_between_stations = geodesic(
                     stationA["position"], stationB["position"]
@@ -276,47 +538,11 @@ class Transportation:
                 walking_speed = 5.0
                 timeA = distanceA / walking_speed
                 timeB = distanceB / walking_speed
-                total_time = timeA + time_between_stations + timeB
                 cost = calculate_cost(distance_between_stations)
-                distance = distanceA + distance_between_stations + distanceB
-                end_timeA = add_time(start_time, timeA)
-                end_timeB = add_time(end_timeA, time_between_stations)
-                end_time_final = add_time(end_timeB, timeB)
-                end_time = end_time_final
-                transports.append(
-                    {
-                        "start": locationA_name,
-                        "end": stationA["name"] + "-地铁站",
-                        "mode": "walk",
-                        "start_time": start_time,
-                        "end_time": end_timeA,
-                        "cost": 0,
-                        "distance": round(distanceA, 2),
-                    }
-                )
-                transports.append(
-                    {
-                        "start": stationA["name"] + "-地铁站",
-                        "end": stationB["name"] + "-地铁站",
-                        "mode": "metro",
-                        "start_time": end_timeA,
-                        "end_time": end_timeB,
-                        "cost": cost,
-                        "distance": round(distance_between_stations, 2),
-                    }
-                )
-                transports.append(
-                    {
-                        "start": stationB["name"] + "-地铁站",
-                        "end": locationB_name,
-                        "mode": "walk",
-                        "start_time": end_timeB,
-                        "end_time": end_time,
-                        "cost": 0,
-                        "distance": round(distanceB, 2),
-                    }
-                )
                 if verbose:
+                    shortest_path = self.metro_paths[city].path(
+                        stationA["name"], stationB["name"]
+                    )
                     print(
                         "Walk: From starting point to metro {}, Distance: {}.".format(
                             stationA["name"] + "-地铁站", distanceA
@@ -331,6 +557,31 @@ class Transportation:
                             stationB["name"] + "-地铁站", distanceB
                         )
                     )
-                return transports
+                return (
+                    (
+                        locationA_name,
+                        stationA["name"] + "-地铁站",
+                        "walk",
+                        0,
+                        round(distanceA, 2),
+                        timeA,
+                    ),
+                    (
+                        stationA["name"] + "-地铁站",
+                        stationB["name"] + "-地铁站",
+                        "metro",
+                        cost,
+                        round(distance_between_stations, 2),
+                        time_between_stations,
+                    ),
+                    (
+                        stationB["name"] + "-地铁站",
+                        locationB_name,
+                        "walk",
+                        0,
+                        round(distanceB, 2),
+                        timeB,
+                    ),
+                )
             else:
                 raise NotImplementedError
@@ -0,0 +1,125 @@
+import os
+import json
+import numpy as np
+from geopy.distance import geodesic
+
+from chinatravel.environment.tools.cache import (
+    cache_path,
+    restamp,
+    save_array,
+    source_stamp,
+    write_json,
+)
+
+
+class DistanceMatrix:
+    """
+    All-pairs geodesic distances (in kilometers) between the POIs of one city.
+    Rows and columns follow the order of the names in poi.json.
+    """
+
+    def __init__(self, names, matrix):
+        self.index = {name: i for i, name in enumerate(names)}
+        self.matrix = matrix
+
+    def distance(self, start: str, end: str):
+        i = self.index.get(start)
+        j = self.index.get(end)
+        if i is None or j is None:
+            return None
+        return float(self.matrix[i, j])
+
+    def distances(self, start: str, ends):
+        """
+        Distances from start to each of ends, NaN where a POI is unknown.
+        """
+        result = np.full(len(ends), np.nan)
+        i = self.index.get(start)
+        if i is None:
+            return result
+        columns = np.array([self.index.get(end, -1) for end in ends], dtype=np.int64)
+        found = columns >= 0
+        result[found] = self.matrix[i, columns[found]]
+        return result
+
+
+def load_poi_positions(poi_path):
+    # same name -> position mapping as Poi, so the indices agree with Poi.search
+    with open(poi_path, "r", encoding="utf-8") as f:
+        poi_list = json.load(f)
+    positions = {}
+    for name_pos in poi_list:
+        positions[name_pos["name"]] = tuple(name_pos["position"])
+    return positions
+
+
+def build_distance_matrix(positions):
+    # geodesic is symmetric, only the upper triangle is computed
+    n = len(positions)
+    matrix = np.zeros((n, n), dtype=np.float64)
+    for i in range(n):
+        for j in range(i + 1, n):
+            matrix[i, j] = matrix[j, i] = geodesic(
+                positions[i], positions[j]
+            ).kilometers
+    return matrix
+
+
+def load_distance_matrix(city, poi_path, build=False):
+    """
+    Load the distance matrix of the city from the cache, memory-mapped.
+    The cache is stale once poi.json changes. When it is missing or stale,
+    the matrix is rebuilt if build=True, otherwise None is returned. The
+    matrix is optional (goto falls back to geodesic), so an unusable cache
+    directory is a miss, and a rebuilt matrix is kept in memory if it cannot
+    be saved.
+    """
+    meta_path = cache_path("distance", "{}.json".format(city))
+    matrix_path = cache_path("distance", "{}.npy".format(city))
+    try:
+        meta = None
+        if os.path.exists(meta_path) and os.path.exists(matrix_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        if meta is not None or build:
+            stamp = source_stamp([poi_path], meta)
+            if meta is not None and meta["fingerprint"] == stamp["fingerprint"]:
+                restamp(meta_path, meta, stamp)
+                return DistanceMatrix(
+                    meta["names"], np.load(matrix_path, mmap_mode="r")
+                )
+    except OSError:
+        pass
+
+    if not build:
+        return None
+
+    positions = load_poi_positions(poi_path)
+    names = list(positions.keys())
+    matrix = build_distance_matrix([positions[name] for name in names])
+    try:
+        save_array(matrix_path, matrix)
+        write_json(meta_path, dict(source_stamp([poi_path]), names=names))
+        return DistanceMatrix(names, np.load(matrix_path, mmap_mode="r"))
+    except OSError:
+        return DistanceMatrix(names, matrix)
+
+
+if __name__ == "__main__":
+    city_list = [
+        "shanghai",
+        "beijing",
+        "shenzhen",
+        "guangzhou",
+        "chongqing",
+        "suzhou",
+        "chengdu",
+        "hangzhou",
+        "wuhan",
+        "nanjing",
+    ]
+    curdir = os.path.dirname(os.path.realpath(__file__))
+    for city in city_list:
+        poi_path = os.path.join(curdir, "../../database/poi", city, "poi.json")
+        dist_matrix = load_distance_matrix(city, poi_path, build=True)
+        print("{}: {} POIs".format(city, len(dist_matrix.index)))
@@ -0,0 +1,126 @@
+import os
+import json
+import numpy as np
+
+from chinatravel.environment.tools.cache import (
+    cache_path,
+    restamp,
+    save_array,
+    source_stamp,
+    write_json,
+)
+
+
+class MetroPaths:
+    """
+    All-pairs shortest paths (in stations) of the metro graph of one city.
+    hops[i, j] is the number of stops from station i to station j and
+    pred[i, j] the station before j on the path from i (-1 if j is i or is
+    unreachable). The paths are the ones dijkstra() returns, ties included.
+    """
+
+    def __init__(self, names, hops, pred):
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self.hops = hops
+        self.pred = pred
+
+    def distance(self, start: str, end: str):
+        """
+        Number of stops from start to end, None if end is unreachable.
+        """
+        if start == end:
+            return 0
+        i = self.index.get(start)
+        j = self.index.get(end)
+        if i is None or j is None or self.hops[i, j] < 0:
+            return None
+        return int(self.hops[i, j])
+
+    def path(self, start: str, end: str):
+        """
+        The stations from start to end, same as dijkstra(graph, start, end).
+        """
+        if start == end:
+            return [start]
+        i = self.index.get(start)
+        j = self.index.get(end)
+        if i is None or j is None or self.hops[i, j] < 0:
+            return []
+        path = []
+        while j != i:
+            path.append(self.names[j])
+            j = self.pred[i, j]
+        path.append(start)
+        return path[::-1]
+
+
+def build_metro_paths(graph):
+    """
+    BFS from every station. dijkstra() pops its queue in (hops, name, path)
+    order, so the path it finds to a station is the lexicographically
+    smallest among the shortest ones. The BFS keeps each layer sorted by that
+    order, which makes the first parent reaching a station the one on the
+    dijkstra path.
+    """
+    names = list(graph.keys())
+    index = {name: i for i, name in enumerate(names)}
+    adjacency = [[index[next_node] for next_node in graph[name]] for name in names]
+    n = len(names)
+    hops = np.full((n, n), -1, dtype=np.int16)
+    pred = np.full((n, n), -1, dtype=np.int32)
+    for source in range(n):
+        hops_s, pred_s = hops[source], pred[source]
+        hops_s[source] = 0
+        layer = [source]
+        depth = 0
+        while layer:
+            depth += 1
+            parent = {}
+            for node in layer:
+                for next_node in adjacency[node]:
+                    if hops_s[next_node] < 0 and next_node not in parent:
+                        parent[next_node] = node
+            rank = {node: r for r, node in enumerate(layer)}
+            layer = sorted(parent, key=lambda node: (rank[parent[node]], names[node]))
+            for node in layer:
+                hops_s[node] = depth
+                pred_s[node] = parent[node]
+    return names, hops, pred
+
+
+def load_metro_paths(city, subway_path, graph):
+    """
+    Load the metro path table of the city from the cache, memory-mapped.
+    It is built from graph and cached when it is missing or older than
+    subways.json.
+    """
+    meta_path = cache_path("metro", "{}.json".format(city))
+    hops_path = cache_path("metro", "{}.hops.npy".format(city))
+    pred_path = cache_path("metro", "{}.pred.npy".format(city))
+    meta = None
+    try:
+        if all(os.path.exists(path) for path in [meta_path, hops_path, pred_path]):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        stamp = source_stamp([subway_path], meta)
+        if meta is not None and meta["fingerprint"] == stamp["fingerprint"]:
+            restamp(meta_path, meta, stamp)
+            return MetroPaths(
+                meta["names"],
+                np.load(hops_path, mmap_mode="r"),
+                np.load(pred_path, mmap_mode="r"),
+            )
+    except OSError:
+        stamp = None
+
+    names, hops, pred = build_metro_paths(graph)
+    try:
+        # the meta goes last: it only validates tables that are fully written
+        save_array(hops_path, hops)
+        save_array(pred_path, pred)
+        write_json(meta_path, dict(stamp or source_stamp([subway_path]), names=names))
+    except OSError:
+        # an unusable cache directory: the tables are only kept in memory
+        pass
+    return MetroPaths(names, hops, pred)
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+class TravelTimeTable:
+    """
+    Bounds on the minutes goto takes from each POI of a city to a target, a
+    hotel or an intercity station: the least and the most over the walk,
+    taxi and metro routes. The column of a target is computed on its first
+    use, with one goto_many call per mode from the target to all the POIs,
+    and kept.
+
+    The routes are computed from the target, so they are the reverse of
+    those goto takes to it. The legs are the same but a geodesic may differ
+    in its last bits between the two directions, which can move the minutes
+    of a leg by one; the bounds are widened by MARGIN to stay admissible.
+    """
+
+    MARGIN = 1
+
+    def __init__(self, transportation, city):
+        self.transportation = transportation
+        self.city = city
+        city_cn = transportation.city_list_chinese[transportation.city_list.index(city)]
+        self.names = list(transportation.poi_search.data[city_cn])
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.columns = {}
+
+    def column(self, target):
+        if target not in self.columns:
+            minutes = [
+                self.transportation.goto_many(
+                    self.city, target, self.names, "00:00", transport_type
+                )["end_time"]
+                for transport_type in ["walk", "taxi", "metro"]
+            ]
+            # fmin and fmax skip the NaN of the routes that do not exist
+            self.columns[target] = (
+                np.fmin.reduce(minutes) - self.MARGIN,
+                np.fmax.reduce(minutes) + self.MARGIN,
+            )
+        return self.columns[target]
+
+    def bounds(self, start, end):
+        """
+        (lower, upper) bounds on the minutes of the routes from start to end,
+        None if a POI is unknown.
+        """
+        i = self.index.get(start)
+        if i is None or end not in self.index:
+            return None
+        lower, upper = self.column(end)
+        if np.isnan(lower[i]):
+            return None
+        return float(lower[i]), float(upper[i])
@@ -4,6 +4,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append("../..")
 from environment.tools import *
+from chinatravel.environment.tools.registry import get_tool
 from pandas import DataFrame
 from typing import Any
 
@@ -103,12 +104,42 @@ class WorldEnv:
             "武汉",
             "南京",
         ]
-        self.attractions = Attractions()
-        self.accommodations = Accommodations()
-        self.restaurants = Restaurants()
-        self.intercitytransport = IntercityTransport()
-        self.transportation = Transportation()
-        self.poi = Poi()
+        # the tools are shared by every WorldEnv of the process
+        self.attractions = get_tool("attractions")
+        self.accommodations = get_tool("accommodations")
+        self.restaurants = get_tool("restaurants")
+        self.intercitytransport = get_tool("intercity_transport")
+        self.transportation = get_tool("transportation")
+        self.poi = get_tool("poi")
+
+        # API name -> function, shared by the command strings and call()
+        self.apis = {
+            "attractions_keys": self.attractions.keys,
+            "attractions_types": self.attractions.get_type_list,
+            "attractions_select": self.attractions.select,
+            "attractions_id_is_open": self.attractions.id_is_open,
+            "attractions_nearby": self.attractions.nearby,
+            "accommodations_keys": self.accommodations.keys,
+            "accommodations_select": self.accommodations.select,
+            "accommodations_nearby": self.accommodations.nearby,
+            "restaurants_select": self.restaurants.select,
+            "restaurants_keys": self.restaurants.keys,
+            "restaurants_nearby": self.restaurants.nearby,
+            "restaurants_id_is_open": self.restaurants.id_is_open,
+            "restaurants_cuisine": self.restaurants.get_cuisine_list,
+            "restaurants_with_recommended_food": (
+                self.restaurants.restaurants_with_recommended_food
+            ),
+            "goto": self.transportation.goto,
+            "intercity_transport_select": self.intercitytransport.select,
+            "poi_lat_lon_search": self.poi.search,
+        }
+        # only for call(): the batch routing of the symbolic agents, not part
+        # of the commands or of the API list given to the LLM
+        self.agent_apis = {
+            "goto_many": self.transportation.goto_many,
+            "arrival_bounds": self.transportation.arrival_bounds,
+        }
 
         self.results = []
 
@@ -117,34 +148,10 @@ class WorldEnv:
         Call the API by command string in the format of python function call.
         """
         # init env to execute the command directly
-        attractions_keys = self.attractions.keys
-        attractions_types = self.attractions.get_type_list
-        attractions_select = self.attractions.select
-        attractions_id_is_open = self.attractions.id_is_open
-        attractions_nearby = self.attractions.nearby
-
-        accommodations_keys = self.accommodations.keys
-        accommodations_select = self.accommodations.select
-        accommodations_nearby = self.accommodations.nearby
-
-        restaurants_select = self.restaurants.select
-        restaurants_keys = self.restaurants.keys
-        restaurants_nearby = self.restaurants.nearby
-        restaurants_id_is_open = self.restaurants.id_is_open
-        restaurants_cuisine = self.restaurants.get_cuisine_list
-        restaurants_with_recommended_food = (
-            self.restaurants.restaurants_with_recommended_food
-        )
-
-        goto = self.transportation.goto
-        intercity_transport_select = self.intercitytransport.select
-        poi_lat_lon_search = self.poi.search
-
-        next_page = self.next_page
-        Results = self.results
+        apis = dict(self.apis, next_page=self.next_page, Results=self.results)
 
         try:
-            res = eval(cmd_str)
+            res = eval(cmd_str, globals(), apis)
             if not isinstance(res, EnvOutput):
                 res = EnvOutput(True, res)
         except Exception as e:
@@ -152,6 +159,22 @@ class WorldEnv:
         self.results.append(res)
         return self.results[-1]
 
+    def call(self, api: str, *args, **kwargs):
+        """
+        Call the API directly, e.g. call("attractions_select", "上海", "name",
+        lambda x: True), for agents that use the results programmatically.
+        Returns the whole result of the API, not an EnvOutput page, and
+        raises its errors; the call is not recorded in the results history.
+        """
+        apis = self.apis if api in self.apis else self.agent_apis
+        if api not in apis:
+            raise KeyError(
+                "Unknown API: {}. Available APIs: {}".format(
+                    api, ", ".join(list(self.apis) + list(self.agent_apis))
+                )
+            )
+        return apis[api](*args, **kwargs)
+
     def next_page(self):
         """
         Go to the next page.
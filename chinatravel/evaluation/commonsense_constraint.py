@@ -22,6 +22,7 @@ import pandas as pd
 # intercity_transport=IntercityTransport()
 # innercity_transport=Transportation()
 
+from chinatravel.evaluation.parallel import map_queries
 from chinatravel.symbol_verification.commonsense_constraint import Is_intercity_transport_correct, Is_attractions_correct, Is_hotels_correct, Is_restaurants_correct, Is_transport_correct, Is_time_correct, Is_space_correct
 
 '''
@@ -38,10 +39,35 @@ Available
 
 
 
-def evaluate_commonsense_constraints(data_index, symbolic_input_dict, plan_json_dict, verbose=False):
+def check_commonsense(symbolic_input, plan_json, verbose=False):
+    """
+    The results of the commonsense checks for one plan, up to the first check
+    that raises: (results, whether all checks ran).
+    """
+    func_list = [Is_intercity_transport_correct, Is_attractions_correct, Is_hotels_correct, Is_restaurants_correct, Is_transport_correct, Is_time_correct, Is_space_correct]
+
+    if verbose:
+        print(symbolic_input)
+        print(plan_json)
+
+    tables = []
+    try:
+        for func in func_list:
+
+            table_res, error_info = func(symbolic_input, plan_json, verbose=verbose)
+
+            if verbose:
+                print(error_info)
+
+            tables.append(table_res)
+    except Exception:
+        return tables, False
+    return tables, True
+
+
+def evaluate_commonsense_constraints(data_index, symbolic_input_dict, plan_json_dict, verbose=False, pool=None):
     # assert len(symbolic_input_list)==len(plan_json_list)
 
-    func_list = [Is_intercity_transport_correct, Is_attractions_correct, Is_hotels_correct, Is_restaurants_correct, Is_transport_correct, Is_time_correct, Is_space_correct]
     total_correct = 0
 
     individual_results = []
@@ -54,40 +80,25 @@ def evaluate_commonsense_constraints(data_index, symbolic_input_dict, plan_json_
     individual_succ = 0
     pass_id = []
 
-    for ii, idx in tqdm(enumerate(data_index), total=len(data_index)):
-    # for i,(symbolic_input,plan_json) in enumerate(zip(symbolic_input_list,plan_json_list)):
-        
-
-
-        symbolic_input, plan_json = symbolic_input_dict[idx], plan_json_dict[idx]  
-        
-        if verbose:
-            print(symbolic_input)
-            print(plan_json)
-        try:
-            for func in func_list:
-
-                table_res, error_info = func(symbolic_input, plan_json, verbose=verbose)
-                
-                if verbose:
-                    print(error_info)
-                
-                for colum_i in table_res.columns:
-                    if colum_i not in result_agg.columns:
-                        result_agg[colum_i] = 0
-
-                    result_agg.loc[ii, colum_i] = table_res[colum_i].loc[0]
-
-                # print(info)
-            if result_agg.loc[ii][1:].sum() == 0:
-                individual_succ += 1
-                pass_id.append(idx)
-        except Exception as message:
-            pass
-            # print("Error: ", message)
-            # print(symbolic_input)
-            # print(plan_json)
-        
+    check_results = map_queries(
+        check_commonsense,
+        [(symbolic_input_dict[idx], plan_json_dict[idx], verbose) for idx in data_index],
+        pool=pool,
+    )
+
+    for ii, idx in enumerate(data_index):
+        tables, all_checked = check_results[ii]
+        for table_res in tables:
+            for colum_i in table_res.columns:
+                if colum_i not in result_agg.columns:
+                    result_agg[colum_i] = 0
+
+                result_agg.loc[ii, colum_i] = table_res[colum_i]
+
+        # a plan on which a check raises does not pass
+        if all_checked and result_agg.loc[ii][1:].sum() == 0:
+            individual_succ += 1
+            pass_id.append(idx)
                             
 
     total_count=len(data_index)
@@ -11,6 +11,7 @@ import os
 # from chinatravel.environment.tools.transportation.apis import Transportation
 
 from chinatravel.evaluation.utils import load_json_file
+from chinatravel.evaluation.parallel import map_queries
 
 from chinatravel.symbol_verification.hard_constraint import get_symbolic_concepts, evaluate_constraints, evaluate_constraints_py
 
@@ -132,7 +133,7 @@ def evaluate_hard_constraints(data_index, symbolic_input_dict, plan_json_dict, v
     return macro*100, micro*100, result_agg, passed_id
 
 
-def evaluate_hard_constraints_v2(data_index, symbolic_input_dict, plan_json_dict, env_pass_id, verbose=False):
+def evaluate_hard_constraints_v2(data_index, symbolic_input_dict, plan_json_dict, env_pass_id, verbose=False, pool=None):
 
 
     max_logic_num = 0
@@ -152,13 +153,17 @@ def evaluate_hard_constraints_v2(data_index, symbolic_input_dict, plan_json_dict
     
     conditional_micro_succ_count, conditional_macro_succ_count = 0, 0
 
-    results=[]
     passed_id = []
 
-    for ii, idx in enumerate(tqdm(data_index)):
+    results = map_queries(
+        evaluate_constraints_py,
+        [(symbolic_input_dict[idx]["hard_logic_py"], plan_json_dict[idx], verbose) for idx in data_index],
+        pool=pool,
+    )
+
+    for ii, idx in enumerate(data_index):
         symbolic_input, plan_json = symbolic_input_dict[idx], plan_json_dict[idx]  
-        result_ii = evaluate_constraints_py(symbolic_input["hard_logic_py"], plan_json, verbose=verbose)
-        results.append(result_ii)
+        result_ii = results[ii]
 
         # print(symbolic_input)
         # print(plan_json)
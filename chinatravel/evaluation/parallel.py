@@ -0,0 +1,43 @@
+"""
+Process pool for evaluating the queries of a split in parallel.
+
+Each worker loads the sandbox database once, when it starts. map_queries()
+returns the per-query results in the order of the queries, so the tables
+built from them are the same as in a serial run.
+"""
+
+from multiprocessing import Pool
+
+from tqdm import tqdm
+
+from chinatravel.environment.tools.registry import warm_up
+
+
+def init_worker():
+    warm_up()
+
+
+def apply(job):
+    func, args = job
+    return func(*args)
+
+
+def create_pool(workers):
+    """
+    A pool of worker processes, or None to evaluate in this process.
+    """
+    if workers is None or workers <= 1:
+        return None
+    return Pool(workers, initializer=init_worker)
+
+
+def map_queries(func, args_list, pool=None):
+    """
+    [func(*args) for args in args_list], computed by the pool if one is given.
+    func must be a module-level function so that it can be sent to the
+    workers.
+    """
+    if pool is None:
+        return [func(*args) for args in tqdm(args_list)]
+    jobs = [(func, args) for args in args_list]
+    return list(tqdm(pool.imap(apply, jobs), total=len(jobs)))
@@ -11,11 +11,12 @@ if project_root_path not in sys.path:
 
 import json
 from chinatravel.environment.world_env import WorldEnv
-from chinatravel.evaluation.utils import Attractions
+from chinatravel.environment.tools.registry import get_tool
 
 from chinatravel.symbol_verification.preference import evaluate_preference_py
+from chinatravel.evaluation.parallel import map_queries
 env = WorldEnv()
-attractions = Attractions()
+attractions = get_tool("attractions")
 goto = env.transportation.goto
 
 city_dict = {
@@ -298,17 +299,13 @@ def evaluate_preference(query_index, query_data, result_data, commonsense_pass):
     result_df = pd.DataFrame(result)
     return result_df
 
-def evaluate_preference_v2(query_index, query_data, result_data, pass_id):
-    result = []
+def evaluate_preference_v2(query_index, query_data, result_data, pass_id, pool=None):
+    jobs = []
     for i in range(len(query_index)):
         if query_index[i] not in pass_id:
-            result.append(
-                {"data_id": query_index[i], "concept": -1}
-            )
             continue
         
         
-        evaluate_preference_py
         symbolic_input = query_data[query_index[i]]
         plan_json = result_data[query_index[i]]
         # print("symbolic_input", symbolic_input, "plan_json", plan_json)
@@ -326,11 +323,19 @@ def evaluate_preference_v2(query_index, query_data, result_data, pass_id):
         op_concept = concept.split(" ")[1]
         code = pre_py[index + 1 :]
 
-        res = evaluate_preference_py([(op, op_concept, code)], plan_json)[0]
+        jobs.append(([(op, op_concept, code)], plan_json))
 
-        result.append(
-            {"data_id": query_index[i], "concept": res}
-        )
+    scores = iter(map_queries(evaluate_preference_py, jobs, pool=pool))
+    result = []
+    for i in range(len(query_index)):
+        if query_index[i] not in pass_id:
+            result.append(
+                {"data_id": query_index[i], "concept": -1}
+            )
+        else:
+            result.append(
+                {"data_id": query_index[i], "concept": next(scores)[0]}
+            )
     result_df = pd.DataFrame(result)
     return result_df
 
@@ -12,7 +12,7 @@ project_root_path = os.path.dirname(
 if project_root_path not in sys.path:
     sys.path.insert(0, project_root_path)
 
-from chinatravel.agent.utils import Logger, NpEncoder
+from chinatravel.agent.utils import NpEncoder
 from chinatravel.environment.tools import Attractions
 
 
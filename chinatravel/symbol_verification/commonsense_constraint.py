@@ -2,13 +2,10 @@
 import sys
 
 
-from chinatravel.environment.tools.accommodations.apis import Accommodations
-from chinatravel.environment.tools.restaurants.apis import Restaurants
-from chinatravel.environment.tools.attractions.apis import Attractions
-from chinatravel.environment.tools.intercity_transport.apis import IntercityTransport
-from chinatravel.environment.tools.transportation.apis import Transportation
+from chinatravel.environment.tools.registry import get_tool
 # from env.tools.transportation.apis import GoTo
 # from envs import goto
+import copy
 import json
 import os
 import sys
@@ -18,11 +15,11 @@ from chinatravel.evaluation.utils import load_json_file
     
 import pandas as pd
 
-accommodation = Accommodations()
-restaurants = Restaurants()
-attractions = Attractions()
-intercity_transport=IntercityTransport()
-innercity_transport=Transportation()
+accommodation = get_tool("accommodations")
+restaurants = get_tool("restaurants")
+attractions = get_tool("attractions")
+intercity_transport=get_tool("intercity_transport")
+innercity_transport=get_tool("transportation")
 
 
 '''
@@ -37,6 +34,60 @@ Available
 7. space
 '''
 
+class CheckResult:
+    """
+    Result of one Is_*_correct check: one 0/1 violation flag per column.
+    The checks run thousands of times per query during search, so they fill
+    this record instead of a one-row DataFrame; to_dataframe() builds the
+    DataFrame for reports.
+    """
+
+    __slots__ = ("columns", "values")
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        # None until the flags are set
+        self.values = None
+
+    def set_all(self, values):
+        if len(values) != len(self.columns):
+            raise ValueError("cannot set a row with mismatched columns")
+        self.values = list(values)
+
+    def mark(self, column, value=1):
+        if self.values is None:
+            self.values = [float("nan")] * len(self.columns)
+        if column in self.columns:
+            self.values[self.columns.index(column)] = value
+        else:
+            self.columns.append(column)
+            self.values.append(value)
+
+    def __getitem__(self, column):
+        if self.values is None:
+            raise KeyError(column)
+        return self.values[self.columns.index(column)]
+
+    def sum(self):
+        """
+        Number of violations (flags that are not set are skipped).
+        """
+        if self.values is None:
+            raise IndexError("the check result is empty")
+        return sum(value for value in self.values if value == value)
+
+    def to_dataframe(self):
+        table = pd.DataFrame(columns=self.columns)
+        if self.values is not None:
+            table.loc[0] = self.values
+        return table
+
+    def __str__(self):
+        return str(self.to_dataframe())
+
+    __repr__ = __str__
+
+
 def return_info_debug(flag, info):
     return flag, info
 
@@ -51,17 +102,17 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
     # print("input: ", symbolic_input)
     # print("plan: ", plan_json)
     
-    table_statistics = pd.DataFrame(columns=['Intercity transportation events must occur', 'Invalid Trains or Airplanes, given TrainID/FlightID, origin and destination', 'Incorrect Information of Intercity Transport on price or duration', 'Incorrect Cost on Intercity Transportation'])
+    table_statistics = CheckResult(['Intercity transportation events must occur', 'Invalid Trains or Airplanes, given TrainID/FlightID, origin and destination', 'Incorrect Information of Intercity Transport on price or duration', 'Incorrect Cost on Intercity Transportation'])
 
     error_info = []
 
     if not isinstance(plan_json, dict):
-        table_statistics.loc[0] = [1, 1, 1, 1]
+        table_statistics.set_all([1, 1, 1, 1])
         error_info = ["Error plan type, must be python dict"]
         return table_statistics, error_info
     try:plan_json["itinerary"]
     except:
-        table_statistics.loc[0] = [1, 1, 1, 1]
+        table_statistics.set_all([1, 1, 1, 1])
         error_info = ["Error plan type, must provide itinerary"]
         return table_statistics, error_info
     
@@ -73,7 +124,7 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
 
     # must contain intecity transport
     if len(first_day_plan["activities"])==0 or len(last_day_plan["activities"])==0: 
-        table_statistics.loc[0] = [1, 1, 1, 1]
+        table_statistics.set_all([1, 1, 1, 1])
         error_info = ["It must contain intecity transport"]
         return table_statistics, error_info
     
@@ -82,13 +133,13 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
     back_intercity_transport_plan=last_day_plan["activities"][-1]
     if("FlightID" not in go_intercity_transport_plan.keys()) and ("TrainID" not in go_intercity_transport_plan.keys()): 
         # return return_info(False, "The first activity should be a transport.") # "The first transport should be from origin to destination.")
-        table_statistics.loc[0] = [1, 1, 1, 1]
+        table_statistics.set_all([1, 1, 1, 1])
         error_info = ["The first activity should be an intercity transport."]
         return table_statistics, error_info
     
     if("FlightID" not in back_intercity_transport_plan.keys()) and ("TrainID" not in back_intercity_transport_plan.keys()): 
         # return return_info(False, "The last activity should be a transport.") # "The last transport should be from destination to origin.")
-        table_statistics.loc[0] = [1, 1, 1, 1]
+        table_statistics.set_all([1, 1, 1, 1])
         error_info = ["The last activity should be an intercity transport."]
         return table_statistics, error_info
 
@@ -96,31 +147,31 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
     go_type=go_intercity_transport_plan['type']
     if go_type!='airplane' and go_type!='train':
         # return return_info(False, "Intercity transport type should be airplane or train")
-        table_statistics.loc[0] = [0, 1, 1, 1]
+        table_statistics.set_all([0, 1, 1, 1])
         error_info = ["Intercity transport type should be airplane or train in the sandbox."]
         return table_statistics, error_info
     
     back_type=back_intercity_transport_plan['type']
     if back_type!='airplane' and back_type!='train':
         # return return_info(False, "Intercity transport type should be airplane or train")
-        table_statistics.loc[0] = [0, 1, 1, 1]
+        table_statistics.set_all([0, 1, 1, 1])
         error_info = ["Intercity transport type should be airplane or train in the sandbox."]
         return table_statistics, error_info
     
 
-    table_statistics.loc[0] = [0, 0, 0, 0]
+    table_statistics.set_all([0, 0, 0, 0])
 
     go_df=intercity_transport.select(start_pos,target_city,go_type)
 
     if not ("start" in go_intercity_transport_plan and "end" in go_intercity_transport_plan):
         # return return_info(False, "intercity-transport should provide start and end position.")
-        table_statistics.loc[0] = [0, 1, 1, 1]
+        table_statistics.set_all([0, 1, 1, 1])
         error_info.append("Intercity-transport Go should provide start and end position.")
         return table_statistics, error_info
     
     if not ("start" in back_intercity_transport_plan and "end" in back_intercity_transport_plan):
         # return return_info(False, "intercity-transport should provide start and end position.")
-        table_statistics.loc[0] = [0, 1, 1, 1]
+        table_statistics.set_all([0, 1, 1, 1])
         error_info.append("Intercity-transport Back should provide start and end position.")
         return table_statistics, error_info
     
@@ -131,7 +182,7 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
             try: 
                 go_intercity_transport_plan['FlightID']
             except: 
-                table_statistics.loc[0] = [0, 1, 1, 1]
+                table_statistics.set_all([0, 1, 1, 1])
                 error_info.append("Iintercity airplane (Go) should provide the valid FlightID.")
                 break
 
@@ -143,10 +194,10 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
                     if row['BeginTime'] == go_intercity_transport_plan['start_time'] and row['EndTime'] == go_intercity_transport_plan['end_time']:
                         pass
                     else:
-                        table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                        table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                         error_info.append("Incorrect duration information of given intercity airplane (Go) [start_time -> end_time].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                    table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                     error_info.append("Iintercity airplane (Go) should provide the duration information.")
                 
                 try: 
@@ -154,10 +205,10 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
                     if row['Cost']==go_intercity_transport_plan['price']:
                         pass                    
                     else:
-                        table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                        table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                         error_info.append("Incorrect price information of given intercity airplane [origin -> destination].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                    table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                     error_info.append("Iintercity airplane (Go) should provide the price information.")
                 
 
@@ -165,10 +216,10 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
                     go_intercity_transport_plan['tickets']
                     go_intercity_transport_plan['cost']
                     if abs(go_intercity_transport_plan['price'] * go_intercity_transport_plan['tickets'] - go_intercity_transport_plan['cost']) > .1:
-                        table_statistics.loc[0,  "Incorrect Cost on Intercity Transportation"] = 1
+                        table_statistics.mark("Incorrect Cost on Intercity Transportation")
                         error_info.append("Incorrect cost information of given intercity airplane (Go) [cost = price * tickets].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Cost on Intercity Transportation"] = 1
+                    table_statistics.mark("Incorrect Cost on Intercity Transportation")
                     error_info.append("Iintercity airplane (Go) should provide the tickets and cost information.")
 
                 break
@@ -176,7 +227,7 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
             try: 
                 go_intercity_transport_plan['TrainID']
             except: 
-                table_statistics.loc[0] = [0, 1, 1, 1]
+                table_statistics.set_all([0, 1, 1, 1])
                 error_info.append("Iintercity train (Go) should provide the valid TrainID.")
                 break
 
@@ -188,10 +239,10 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
                     if row['BeginTime'] == go_intercity_transport_plan['start_time'] and row['EndTime'] == go_intercity_transport_plan['end_time']:
                         pass
                     else:
-                        table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                        table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                         error_info.append("Incorrect duration information of given intercity train (Go) [start_time -> end_time].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                    table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                     error_info.append("Iintercity train (Go) should provide the duration information.")
                 
                 try: 
@@ -199,10 +250,10 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
                     if row['Cost']==go_intercity_transport_plan['price']:
                         pass                    
                     else:
-                        table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                        table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                         error_info.append("Incorrect price information of given intercity train [origin -> destination].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                    table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                     error_info.append("Iintercity train (Go) should provide the price information.")
                 
 
@@ -211,16 +262,16 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
                     go_intercity_transport_plan['tickets']
                     go_intercity_transport_plan['cost']
                     if abs(go_intercity_transport_plan['price'] * go_intercity_transport_plan['tickets'] - go_intercity_transport_plan['cost']) > .1:
-                        table_statistics.loc[0,  "Incorrect Cost on Intercity Transportation"] = 1
+                        table_statistics.mark("Incorrect Cost on Intercity Transportation")
                         error_info.append("Incorrect cost information of given intercity train (Go) [cost = price * tickets].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Cost on Intercity Transportation"] = 1
+                    table_statistics.mark("Incorrect Cost on Intercity Transportation")
                     error_info.append("Iintercity train (Go) should provide the tickets and cost information.")
 
                 break
 
     if go_flag==0:
-        table_statistics.loc[0] = [0, 1, 1, 1]
+        table_statistics.set_all([0, 1, 1, 1])
         error_info.append("No information found given transport ID.")
 
     
@@ -233,7 +284,7 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
             try: 
                 back_intercity_transport_plan['FlightID']
             except: 
-                table_statistics.loc[0] = [0, 1, 1, 1]
+                table_statistics.set_all([0, 1, 1, 1])
                 error_info.append("Iintercity airplane (Back) should provide the valid FlightID.")
                 break
             if back_intercity_transport_plan['FlightID']==row['FlightID'] and back_intercity_transport_plan['start']==row['From'] and back_intercity_transport_plan['end']==row['To']:
@@ -244,10 +295,10 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
                     if row['BeginTime'] == back_intercity_transport_plan['start_time'] and row['EndTime'] == back_intercity_transport_plan['end_time']:
                         pass
                     else:
-                        table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                        table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                         error_info.append("Incorrect duration information of given intercity airplane (Back) [start_time -> end_time].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                    table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                     error_info.append("Iintercity airplane (Back) should provide the duration information.")
                 
                 try: 
@@ -255,10 +306,10 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
                     if row['Cost']==back_intercity_transport_plan['price']:
                         pass                    
                     else:
-                        table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                        table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                         error_info.append("Incorrect price information of given intercity airplane [destination -> origin].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                    table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                     error_info.append("Iintercity airplane (Back) should provide the price information.")
 
                 
@@ -266,10 +317,10 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
                     back_intercity_transport_plan['tickets']
                     back_intercity_transport_plan['cost']
                     if abs(back_intercity_transport_plan['price'] * back_intercity_transport_plan['tickets'] - back_intercity_transport_plan['cost']) > .1:
-                        table_statistics.loc[0,  "Incorrect Cost on Intercity Transportation"] = 1
+                        table_statistics.mark("Incorrect Cost on Intercity Transportation")
                         error_info.append("Incorrect cost information of given intercity airplane (Back) [cost = price * tickets].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Cost on Intercity Transportation"] = 1
+                    table_statistics.mark("Incorrect Cost on Intercity Transportation")
                     error_info.append("Iintercity airplane (Back) should provide the tickets and cost information.")
                 break
 
@@ -277,7 +328,7 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
             try: 
                 back_intercity_transport_plan['TrainID']
             except: 
-                table_statistics.loc[0] = [1, 1, 1, 1]
+                table_statistics.set_all([1, 1, 1, 1])
                 error_info.append("Iintercity train (Back) should provide the valid TrainID.")
                 break
                 
@@ -290,10 +341,10 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
                     if row['BeginTime'] == back_intercity_transport_plan['start_time'] and row['EndTime'] == back_intercity_transport_plan['end_time']:
                         pass
                     else:
-                        table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                        table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                         error_info.append("Incorrect time information of given intercity train [destination -> origin].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                    table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                     error_info.append("Iintercity train (Back) should provide the duration information.")
 
                 try: 
@@ -301,30 +352,30 @@ def Is_intercity_transport_correct(symbolic_input, plan_json, verbose=False):
                     if row['Cost']==back_intercity_transport_plan['price']:
                         pass                    
                     else:
-                        table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                        table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                         error_info.append("Incorrect price information of given intercity train [origin -> destination].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Information of Intercity Transport on price or duration"] = 1
+                    table_statistics.mark("Incorrect Information of Intercity Transport on price or duration")
                     error_info.append("Iintercity train (Back) should provide the price information.")
 
                 try:
                     back_intercity_transport_plan['tickets']
                     back_intercity_transport_plan['cost']
                     if abs(back_intercity_transport_plan['price'] * back_intercity_transport_plan['tickets'] - back_intercity_transport_plan['cost']) > .1:
-                        table_statistics.loc[0,  "Incorrect Cost on Intercity Transportation"] = 1
+                        table_statistics.mark("Incorrect Cost on Intercity Transportation")
                         error_info.append("Incorrect cost information of given intercity train (Back) [cost = price * tickets].")
                 except: 
-                    table_statistics.loc[0,  "Incorrect Cost on Intercity Transportation"] = 1
+                    table_statistics.mark("Incorrect Cost on Intercity Transportation")
                     error_info.append("Iintercity train (Back) should provide the tickets and cost information.")
 
                 break
     
     if back_flag==0:
-        table_statistics.loc[0] = [0, 1, 1, 1]
+        table_statistics.set_all([0, 1, 1, 1])
         error_info.append("No information found given transport ID.")
 
     if verbose:
-        if table_statistics.loc[0].sum() == 0:
+        if table_statistics.sum() == 0:
             print("Intercity_transport passed!")
         else:
             print(error_info)
@@ -338,19 +389,19 @@ def Is_attractions_correct(symbolic_input, plan_json, verbose=False):
     target_city = symbolic_input["target_city"]
 
 
-    table_statistics = pd.DataFrame(columns=['Unavailable attractions', 'Visiting attraction in their closed time', 'Repeated attraction Choices', 'Incorrect price Information of attraction', 'Incorrect cost Information of attraction'])
+    table_statistics = CheckResult(['Unavailable attractions', 'Visiting attraction in their closed time', 'Repeated attraction Choices', 'Incorrect price Information of attraction', 'Incorrect cost Information of attraction'])
 
     error_info = []    
     try: 
         plan_json["itinerary"]
     except: 
-        table_statistics.loc[0] = [1, 1, 1, 1, 1]
+        table_statistics.set_all([1, 1, 1, 1, 1])
         error_info = ["Error plan type, must be python dict"]
         return table_statistics, error_info
 
     plan = plan_json["itinerary"]
     
-    table_statistics.loc[0] = [0, 0, 0, 0, 0]
+    table_statistics.set_all([0, 0, 0, 0, 0])
     attraction_list = []
 
     for day_plan_i in plan:
@@ -366,16 +417,16 @@ def Is_attractions_correct(symbolic_input, plan_json, verbose=False):
             # print(activity_i)
             try: activity_i["position"]
             except: 
-                table_statistics.loc[0] = [1, 1, 1, 1, 1]
+                table_statistics.set_all([1, 1, 1, 1, 1])
                 error_info.append("No position information!")
                 return table_statistics, error_info
             
-            select_attraction=attractions.select(target_city,key='name',func=lambda x:x==activity_i["position"])
+            select_attraction=attractions.get_by_name(target_city, activity_i["position"])
 
             # print(select_attraction)
 
             if select_attraction.empty:
-                table_statistics.loc[0] = [1, 1, 1, 1, 1]
+                table_statistics.set_all([1, 1, 1, 1, 1])
                 error_info.append("No information found given attraction [{}]".format(activity_i["position"]))
                 return table_statistics, error_info
 
@@ -393,10 +444,10 @@ def Is_attractions_correct(symbolic_input, plan_json, verbose=False):
                 # if time_compare_if_earlier_equal(endtime, activity_i["start_time"]) or time_compare_if_earlier_equal(activity_i["end_time"], opentime): 
                 if not (time_compare_if_earlier_equal(opentime, activity_i["start_time"]) and time_compare_if_earlier_equal(activity_i["end_time"], endtime)):
                     # return return_info(False, "The attraction is closed now. {}, open time: [{} -- {}]".format(activity_i["position"], opentime, endtime))
-                    table_statistics.loc[0,  'Visiting attraction in their closed time'] = 1
+                    table_statistics.mark('Visiting attraction in their closed time')
                     error_info.append("The attraction is closed now. {}, open time: [{} -- {}]".format(activity_i["position"], opentime, endtime))
             except:
-                table_statistics.loc[0,  'Visiting attraction in their closed time'] = 1
+                table_statistics.mark('Visiting attraction in their closed time')
                 error_info.append("The activity in attraction shoud provide the visiting time.")
 
             # 返回信息保证一致: price
@@ -404,11 +455,11 @@ def Is_attractions_correct(symbolic_input, plan_json, verbose=False):
                 activity_i["price"]
                 if int(activity_i["price"]) != int(select_attraction["price"].values[0]):
                     # return return_info(False, "Incorrect cost infomation of attraction [{}], cost: {} ".format(activity_i["position"], activity_i["cost"]))
-                    table_statistics.loc[0,  'Incorrect price Information of attraction'] = 1
+                    table_statistics.mark('Incorrect price Information of attraction')
                     error_info.append("Incorrect price infomation of attraction [{}], price: {} ".format(activity_i["position"], activity_i["price"]))
                         
             except: 
-                table_statistics.loc[0,  'Incorrect price Information of attraction'] = 1
+                table_statistics.mark('Incorrect price Information of attraction')
                 error_info.append("Attraction price should be provided")
 
             
@@ -416,11 +467,11 @@ def Is_attractions_correct(symbolic_input, plan_json, verbose=False):
                 activity_i["tickets"]
                 activity_i["cost"]
                 if abs(activity_i["price"] * activity_i["tickets"] - activity_i["cost"]) > .1:
-                    table_statistics.loc[0,  'Incorrect cost Information of attraction'] = 1
+                    table_statistics.mark('Incorrect cost Information of attraction')
                     error_info.append("Incorrect cost information of attraction [cost = price * tickets].")
                         
             except: 
-                table_statistics.loc[0,  'Incorrect cost Information of attraction'] = 1
+                table_statistics.mark('Incorrect cost Information of attraction')
                 error_info.append("Incorrect cost Information of attraction")
 
             # if not select_attraction_type.empty:
@@ -428,11 +479,11 @@ def Is_attractions_correct(symbolic_input, plan_json, verbose=False):
             # attraction_names.add(activity["position"])
 
     if len(set(attraction_list)) != len(attraction_list):
-        table_statistics.loc[0,  'Repeated attraction Choices'] = 1
+        table_statistics.mark('Repeated attraction Choices')
         error_info.append("Attraction choices should not be repeated throughout the trip.")
 
     if verbose:
-        if table_statistics.loc[0].sum() == 0:
+        if table_statistics.sum() == 0:
             print("Attractions passed!")
         else:
             print(error_info)
@@ -443,17 +494,17 @@ def Is_attractions_correct(symbolic_input, plan_json, verbose=False):
 def Is_hotels_correct(symbolic_input, plan_json, verbose=False): 
 
     target_city = symbolic_input["target_city"]
-    table_statistics = pd.DataFrame(columns=['Unavailable Accommodation', 'Incorrect Information of Accommodation on price or room type', 'Incorrect cost Information of Accommodation', 'Accomondation is necessary for trips longer than one day'])
+    table_statistics = CheckResult(['Unavailable Accommodation', 'Incorrect Information of Accommodation on price or room type', 'Incorrect cost Information of Accommodation', 'Accomondation is necessary for trips longer than one day'])
 
     error_info = []    
     try: 
         plan_json["itinerary"]
     except: 
-        table_statistics.loc[0] = [1, 1, 1, 1]
+        table_statistics.set_all([1, 1, 1, 1])
         error_info = ["Error plan type, must be python dict"]
         return table_statistics, error_info
 
-    table_statistics.loc[0] = [0, 0, 0, 0]
+    table_statistics.set_all([0, 0, 0, 0])
 
     plan = plan_json["itinerary"]
     
@@ -472,15 +523,15 @@ def Is_hotels_correct(symbolic_input, plan_json, verbose=False):
             
             try: activity_i["position"]
             except: 
-                table_statistics.loc[0] = [1, 1, 1, 1]
+                table_statistics.set_all([1, 1, 1, 1])
                 error_info.append("No position information!")
                 return table_statistics, error_info
             
-            select_hotel=accommodation.select(target_city,key='name',func=lambda x:x==activity_i["position"])
+            select_hotel=accommodation.get_by_name(target_city, activity_i["position"])
             # print(select_hotel)
 
             if select_hotel.empty:
-                table_statistics.loc[0] = [1, 1, 1, 1]
+                table_statistics.set_all([1, 1, 1, 1])
                 error_info.append("No information found given hotel [{}]".format(activity_i["position"]))
                 return table_statistics, error_info
 
@@ -491,11 +542,11 @@ def Is_hotels_correct(symbolic_input, plan_json, verbose=False):
             try: 
                 activity_i["price"]
                 if activity_i["price"] != select_hotel["price"].values[0]:
-                    table_statistics.loc[0,  'Incorrect Information of Accommodation on price or room type'] = 1
+                    table_statistics.mark('Incorrect Information of Accommodation on price or room type')
                     error_info.append("Incorrect price infomation of accommodation [{}], price: {} ".format(activity_i["position"], select_hotel["price"].values[0]))
             
             except: 
-                table_statistics.loc[0,  'Incorrect Information of Accommodation on price or room type'] = 1
+                table_statistics.mark('Incorrect Information of Accommodation on price or room type')
                 error_info.append("Hotel price should be provided")
                 
 
@@ -503,33 +554,33 @@ def Is_hotels_correct(symbolic_input, plan_json, verbose=False):
             try: 
                 activity_i["room_type"]    
                 if activity_i["room_type"] != select_hotel["numbed"].values[0]:
-                    table_statistics.loc[0,  'Incorrect Information of Accommodation on price or room type'] = 1
+                    table_statistics.mark('Incorrect Information of Accommodation on price or room type')
                     error_info.append("Incorrect room infomation of accommodation [{}], numbed: {} ".format(activity_i["position"], select_hotel["numbed"].values[0]))
             except: 
-                table_statistics.loc[0,  'Incorrect Information of Accommodation on price or room type'] = 1
+                table_statistics.mark('Incorrect Information of Accommodation on price or room type')
                 error_info.append("Room information should be provided")
             
             try:
                 activity_i["rooms"]
                 if abs(activity_i["rooms"] * activity_i["price"] - activity_i["cost"]) > .1:
-                    table_statistics.loc[0,  'Incorrect cost Information of Accommodation'] = 1
+                    table_statistics.mark('Incorrect cost Information of Accommodation')
                     error_info.append("Incorrect cost information of accommodation [cost = price * rooms].")
             except: 
-                table_statistics.loc[0,  'Incorrect cost Information of Accommodation'] = 1
+                table_statistics.mark('Incorrect cost Information of Accommodation')
                 error_info.append("Cost and rooms information should be provided")
 
 
     # if len(set(hotel_list)) > 1:
     #     # return return_info(False, "Hotel should be unique during the trip.")
-    #     table_statistics.loc[0] = [1, 1, 1]
+    #     table_statistics.set_all([1, 1, 1])
     #     error_info.append("Hotel should be unique during the trip.")
     
     if len(plan_json["itinerary"]) > 1 and len(hotel_list) == 0:
-        table_statistics.loc[0, 'Accomondation is necessary for trips longer than one day'] = 1
+        table_statistics.mark('Accomondation is necessary for trips longer than one day')
         error_info.append("We need a hotel for a trip more than one day.")
         
     if verbose:
-        if table_statistics.loc[0].sum() == 0:
+        if table_statistics.sum() == 0:
             print("Hotels passed!")
         else:
             print(error_info)
@@ -539,17 +590,17 @@ def Is_hotels_correct(symbolic_input, plan_json, verbose=False):
 def Is_restaurants_correct(symbolic_input, plan_json, verbose=False): 
     
     target_city = symbolic_input["target_city"]
-    table_statistics = pd.DataFrame(columns=['Unavailable Restruants', 'Visiting Restruants in their closed time', 'Repeated Restruants Choices', 'Incorrect price Information of Restruants', 'Incorrect cost Information of Restruants', 'Inappropriate Meal Times'])
+    table_statistics = CheckResult(['Unavailable Restruants', 'Visiting Restruants in their closed time', 'Repeated Restruants Choices', 'Incorrect price Information of Restruants', 'Incorrect cost Information of Restruants', 'Inappropriate Meal Times'])
 
     error_info = []    
     try: 
         plan_json["itinerary"]
     except: 
-        table_statistics.loc[0] = [1, 1, 1, 1, 1, 1]
+        table_statistics.set_all([1, 1, 1, 1, 1, 1])
         error_info = ["Error plan type, must be python dict"]
         return table_statistics, error_info
 
-    table_statistics.loc[0] = [0, 0, 0, 0, 0, 0]
+    table_statistics.set_all([0, 0, 0, 0, 0, 0])
 
     plan = plan_json["itinerary"]
     
@@ -566,29 +617,29 @@ def Is_restaurants_correct(symbolic_input, plan_json, verbose=False):
             # print(activity_i)
             try: activity_i["position"]
             except: 
-                table_statistics.loc[0] = [1, 1, 1, 1, 1, 1]
+                table_statistics.set_all([1, 1, 1, 1, 1, 1])
                 error_info.append("No position information!")
                 return table_statistics, error_info
             
 
-            select_restaurant=restaurants.select(target_city,key='name',func=lambda x:x==activity_i["position"])
+            select_restaurant=restaurants.get_by_name(target_city, activity_i["position"])
 
             # print(select_restaurant)
 
             if activity_i["type"] == "breakfast" and select_restaurant.empty:
 
-                select_hotel=accommodation.select(target_city,key='name',func=lambda x:x==activity_i["position"])
+                select_hotel=accommodation.get_by_name(target_city, activity_i["position"])
     
                 if select_hotel.empty:
-                    table_statistics.loc[0] = [1, 1, 1, 1, 1, 1]
+                    table_statistics.set_all([1, 1, 1, 1, 1, 1])
                     error_info.append("No information found given restaurant [{}]".format(activity_i["position"]))
                 try:
                     activity_i["price"]
                     if activity_i["price"] != 0:
-                        table_statistics.loc[0,  'Incorrect price Information of Restruants'] = 1
+                        table_statistics.mark('Incorrect price Information of Restruants')
                         error_info.append("Have breakfast at hotel, price 0")
                 except: 
-                    table_statistics.loc[0,  'Incorrect price Information of Restruants'] = 1
+                    table_statistics.mark('Incorrect price Information of Restruants')
                     error_info.append("price of breakfast should be provided")
 
                 try:
@@ -597,59 +648,59 @@ def Is_restaurants_correct(symbolic_input, plan_json, verbose=False):
 
                     if time_compare_if_earlier_equal("09:00", activity_i["start_time"]) or time_compare_if_earlier_equal(activity_i["end_time"], "06:00"):
                     
-                        table_statistics.loc[0,  'Inappropriate Meal Times'] = 1
+                        table_statistics.mark('Inappropriate Meal Times')
                         error_info.append("The time of breakfast should be in [06:00 -- 09:00]")
                 except:
-                    table_statistics.loc[0,  'Inappropriate Meal Times'] = 1
+                    table_statistics.mark('Inappropriate Meal Times')
                     error_info.append("The time of breakfast should be provided")
 
                 try:
                     activity_i["cost"]
                     if abs(symbolic_input["people_number"] * activity_i["price"] - activity_i["cost"]) > .1:
-                        table_statistics.loc[0,  'Incorrect cost Information of Restruants'] = 1
+                        table_statistics.mark('Incorrect cost Information of Restruants')
                         error_info.append("Incorrect cost information of Restruants Events [cost = price * people_number].")
                 except:
-                    table_statistics.loc[0,  'Incorrect cost Information of Restruants'] = 1
+                    table_statistics.mark('Incorrect cost Information of Restruants')
                     error_info.append("The Restruants Events should provide cost information")
 
                 continue
             
             if select_restaurant.empty:
                 # return return_info(False, "No information found given restaurant [{}]".format(activity_i["position"]))
-                table_statistics.loc[0] = [1, 1, 1, 1, 1, 1]
+                table_statistics.set_all([1, 1, 1, 1, 1, 1])
                 error_info.append("No information found given restaurant [{}]".format(activity_i["position"]))
                 continue
             
             try:
                 activity_i["price"]
                 if activity_i["price"] != select_restaurant["price"].values[0]:
-                    table_statistics.loc[0,  'Incorrect price Information of Restruants'] = 1
+                    table_statistics.mark('Incorrect price Information of Restruants')
                     error_info.append("Incorrect price infomation of restaurant [{}], price: {} ".format(activity_i["position"], select_restaurant["price"].values[0]))
             except:
-                table_statistics.loc[0,  'Incorrect price Information of Restruants'] = 1
+                table_statistics.mark('Incorrect price Information of Restruants')
                 error_info.append("price of Restruants should be provided")
             
             try:
                 activity_i["start_time"]
                 activity_i["end_time"]
                 if activity_i["type"] == "lunch" and (time_compare_if_earlier_equal("14:00", activity_i["start_time"]) or time_compare_if_earlier_equal(activity_i["end_time"], "11:00")):
-                    table_statistics.loc[0, 'Inappropriate Meal Times'] = 1
+                    table_statistics.mark('Inappropriate Meal Times')
                     error_info.append("The time of lunch should be in [11:00 -- 14:00]")
                 if activity_i["type"] == "dinner" and (time_compare_if_earlier_equal("20:00", activity_i["start_time"]) or time_compare_if_earlier_equal(activity_i["end_time"], "17:00")):
-                    table_statistics.loc[0,  'Inappropriate Meal Times'] = 1
+                    table_statistics.mark('Inappropriate Meal Times')
                     error_info.append("The time of dinner should be in [17:00 -- 20:00]")
             except:
-                table_statistics.loc[0,  'Inappropriate Meal Times'] = 1
+                table_statistics.mark('Inappropriate Meal Times')
                 error_info.append("Schedule of Restruants should be provided")
         
 
             try:
                 activity_i["cost"]
                 if abs(symbolic_input["people_number"] * activity_i["price"] - activity_i["cost"]) > .1:
-                    table_statistics.loc[0,  'Incorrect cost Information of Restruants'] = 1
+                    table_statistics.mark('Incorrect cost Information of Restruants')
                     error_info.append("Incorrect cost information of Restruants Events [cost = price * people_number].")
             except:
-                table_statistics.loc[0,  'Incorrect cost Information of Restruants'] = 1
+                table_statistics.mark('Incorrect cost Information of Restruants')
                 error_info.append("The Restruants Events should provide cost information")
             
             # 开放时间
@@ -661,24 +712,24 @@ def Is_restaurants_correct(symbolic_input, plan_json, verbose=False):
                 activity_i["end_time"]
                 # if time_compare_if_earlier_equal(endtime, activity_i["start_time"]) or time_compare_if_earlier_equal(activity_i["end_time"], opentime): 
                 if not (time_compare_if_earlier_equal(opentime, activity_i["start_time"]) and time_compare_if_earlier_equal(activity_i["end_time"], endtime)):
-                    table_statistics.loc[0,  'Visiting Restruants in their closed time'] = 1
+                    table_statistics.mark('Visiting Restruants in their closed time')
                     error_info.append("The attraction is closed now. open time: [{} -- {}]".format(opentime, endtime))
             except:
-                table_statistics.loc[0,  'Visiting Restruants in their closed time'] = 1
+                table_statistics.mark('Visiting Restruants in their closed time')
                 error_info.append("Schedule of Restruants should be provided")
             restaurants_list.append(activity_i["position"])
             # restaurants_time_list.append(activity_i["start_time"])
 
     if len(set(restaurants_list)) != len(restaurants_list):
 
-        table_statistics.loc[0,  'Repeated Restruants Choices'] = 1
+        table_statistics.mark('Repeated Restruants Choices')
         error_info.append("Restaurants choices should not be repeated throughout the trip.")
 
     # print(restaurants_list)
     # print(restaurants_time_list)
 
     if verbose:
-        if table_statistics.loc[0].sum() == 0:
+        if table_statistics.sum() == 0:
             print("Restaurants passed!")
         else:
             print(error_info)
@@ -690,17 +741,17 @@ def Is_transport_correct(symbolic_input, plan_json, verbose=False):
     
 
     target_city = symbolic_input["target_city"]
-    table_statistics = pd.DataFrame(columns=['Unavailable Inner-City Transport', 'Incorrect Information of Inner-City Transporton on price, distance, and duration', 'Inccorrect cost information of Inner-City Transport'])
+    table_statistics = CheckResult(['Unavailable Inner-City Transport', 'Incorrect Information of Inner-City Transporton on price, distance, and duration', 'Inccorrect cost information of Inner-City Transport'])
 
     error_info = []    
     try: 
         plan_json["itinerary"]
     except: 
-        table_statistics.loc[0] = [1, 1, 1]
+        table_statistics.set_all([1, 1, 1])
         error_info = ["Error plan type, must be python dict"]
         return table_statistics, error_info
 
-    table_statistics.loc[0] = [0, 0, 0]
+    table_statistics.set_all([0, 0, 0])
 
     plan = plan_json["itinerary"]
     for day_plan_i in plan:
@@ -720,7 +771,7 @@ def Is_transport_correct(symbolic_input, plan_json, verbose=False):
                     transport_i[0]["start_time"]
                     transport_i[-1]["end_time"]
                 except:
-                    table_statistics.loc[0] = [1, 1, 1]
+                    table_statistics.set_all([1, 1, 1])
                     error_info.append("Key Error: [start, end, start_time, end_time]")
                 
                 source_poi = transport_i[0]["start"]
@@ -738,7 +789,7 @@ def Is_transport_correct(symbolic_input, plan_json, verbose=False):
                     try:
                         tools_return = innercity_transport.goto(city=target_city, start=source_poi, end=target_poi, start_time=start_time, transport_type="metro", verbose=False)
                     except:
-                        table_statistics.loc[0] = [1, 1, 1]
+                        table_statistics.set_all([1, 1, 1])
                         error_info.append("GoTo error city [{}], start [{}], end [{}], start_time [{}], transport_type [metro]".format(target_city, source_poi, target_poi, start_time))
                         continue
 
@@ -747,43 +798,43 @@ def Is_transport_correct(symbolic_input, plan_json, verbose=False):
                         
                         try:
                             if trans_ii["start"] != tools_return[idx]["start"]:
-                                table_statistics.loc[0,  'Unavailable Inner-City Transport'] = 1
+                                table_statistics.mark('Unavailable Inner-City Transport')
                                 error_info.append("Incorrect infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
                         
                             if trans_ii["end"] != tools_return[idx]["end"]:
-                                table_statistics.loc[0,  'Unavailable Inner-City Transport'] = 1
+                                table_statistics.mark('Unavailable Inner-City Transport')
                                 error_info.append("Incorrect infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
                         except:
-                            table_statistics.loc[0,  'Unavailable Inner-City Transport'] = 1
+                            table_statistics.mark('Unavailable Inner-City Transport')
                             error_info.append("Incorrect infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
 
                         try:
 
                             if trans_ii["start_time"] != tools_return[idx]["start_time"] or trans_ii["end_time"] != tools_return[idx]["end_time"]:
-                                table_statistics.loc[0,  'Incorrect Information of Inner-City Transporton on price, distance, and duration'] = 1
+                                table_statistics.mark('Incorrect Information of Inner-City Transporton on price, distance, and duration')
                                 error_info.append("Incorrect duration infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
                             
                         except:
-                            table_statistics.loc[0,  'Incorrect Information of Inner-City Transporton on price, distance, and duration'] = 1
+                            table_statistics.mark('Incorrect Information of Inner-City Transporton on price, distance, and duration')
                             error_info.append("Incorrect duration infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
 
 
                         try:
 
                             if abs(trans_ii["price"] - tools_return[idx]["cost"]) > 0.1:
-                                table_statistics.loc[0,  'Incorrect Information of Inner-City Transporton on price, distance, and duration'] = 1
+                                table_statistics.mark('Incorrect Information of Inner-City Transporton on price, distance, and duration')
                                 error_info.append("Incorrect price infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
                         except:
-                            table_statistics.loc[0, 'Incorrect Information of Inner-City Transporton on price, distance, and duration'] = 1
+                            table_statistics.mark('Incorrect Information of Inner-City Transporton on price, distance, and duration')
                             error_info.append("Incorrect price infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
 
                         try:
 
                             if abs(trans_ii["distance"] - tools_return[idx]["distance"]) > 0.1:
-                                table_statistics.loc[0,  'Incorrect Information of Inner-City Transporton on price, distance, and duration'] = 1
+                                table_statistics.mark('Incorrect Information of Inner-City Transporton on price, distance, and duration')
                                 error_info.append("Incorrect distance infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
                         except:
-                            table_statistics.loc[0,  'Incorrect Information of Inner-City Transporton on price, distance, and duration'] = 1
+                            table_statistics.mark('Incorrect Information of Inner-City Transporton on price, distance, and duration')
                             error_info.append("Incorrect distance infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
                         
                         if trans_ii['mode'] == 'metro':
@@ -791,27 +842,27 @@ def Is_transport_correct(symbolic_input, plan_json, verbose=False):
                                 trans_ii['tickets']
                                 trans_ii['cost']
                                 if abs(trans_ii['price'] * trans_ii['tickets'] - trans_ii['cost']) > .1:
-                                    table_statistics.loc[0,  'Incorrect cost information of Inner-City Transport'] = 1
+                                    table_statistics.mark('Incorrect cost information of Inner-City Transport')
                                     error_info.append("Incorrect cost information of transport {} -> {}".format(source_poi, target_poi) + "  [{}], [cost=price*tickets] ".format(trans_ii))
                             except:
-                                table_statistics.loc[0,  'Incorrect cost information of Inner-City Transport'] = 1
+                                table_statistics.mark('Incorrect cost information of Inner-City Transport')
                                 error_info.append("Incorrect cost information of transport {} -> {}".format(source_poi, target_poi) + "  [{}], [cost=price*tickets] ".format(trans_ii))
                         elif trans_ii['mode'] == 'walk':
                             try:
                                 trans_ii['cost']
                                 if trans_ii['cost']!= 0:
-                                    table_statistics.loc[0,  'Incorrect cost information of Inner-City Transport'] = 1
+                                    table_statistics.mark('Incorrect cost information of Inner-City Transport')
                                     error_info.append("Incorrect cost information of transport {} -> {}".format(source_poi, target_poi) + "  [{}], [cost=0] ".format(trans_ii))
                             except:
-                                table_statistics.loc[0,  'Incorrect cost information of Inner-City Transport'] = 1
+                                table_statistics.mark('Incorrect cost information of Inner-City Transport')
                                 error_info.append("Incorrect cost information of transport {} -> {}".format(source_poi, target_poi) + "  [{}], [cost=0] ".format(trans_ii))
 
                     try:
                         if transport_i[0]["mode"] != "walk" or transport_i[2]["mode"] != "walk" or transport_i[1]["mode"] != "metro":
-                            table_statistics.loc[0,  'Unavailable Inner-City Transport'] = 1
+                            table_statistics.mark('Unavailable Inner-City Transport')
                             error_info.append("Incorrect transport type of transport {} -> {}".format(source_poi, target_poi))
                     except:
-                        table_statistics.loc[0,  'Unavailable Inner-City Transport'] = 1
+                        table_statistics.mark('Unavailable Inner-City Transport')
                         error_info.append("Incorrect transport type of transport {} -> {}".format(source_poi, target_poi))
 
                 elif len(transport_i)==1 and transport_i[0]["mode"] in ["walk", "taxi"]:
@@ -819,80 +870,80 @@ def Is_transport_correct(symbolic_input, plan_json, verbose=False):
                     try:
                         tools_return = innercity_transport.goto(city=target_city, start=source_poi, end=target_poi, start_time=start_time, transport_type=transport_i[0]["mode"], verbose=False)
                         if not isinstance(tools_return, list):
-                            table_statistics.loc[0] = [1, 1, 1]
+                            table_statistics.set_all([1, 1, 1])
                             error_info.append("Can not find a path of transport {} -> {}".format(source_poi, target_poi))
                     except:
-                        table_statistics.loc[0] = [1, 1, 1]
+                        table_statistics.set_all([1, 1, 1])
                         error_info.append("GoTo error city [{}], start [{}], end [{}], start_time [{}], transport_type [metro]".format(target_city, source_poi, target_poi, start_time))
                         continue
                     for idx, trans_ii in enumerate(transport_i):
                         try:
                             if trans_ii["start"] != tools_return[idx]["start"]:
-                                table_statistics.loc[0,  'Unavailable Inner-City Transport'] = 1
+                                table_statistics.mark('Unavailable Inner-City Transport')
                                 error_info.append("Incorrect infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
                         
                             if trans_ii["end"] != tools_return[idx]["end"]:
-                                table_statistics.loc[0,  'Unavailable Inner-City Transport'] = 1
+                                table_statistics.mark('Unavailable Inner-City Transport')
                                 error_info.append("Incorrect infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
                         except:
-                            table_statistics.loc[0,  'Unavailable Inner-City Transport'] = 1
+                            table_statistics.mark('Unavailable Inner-City Transport')
                             error_info.append("Incorrect infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
 
                         try:
 
                             if trans_ii["start_time"] != tools_return[idx]["start_time"] or trans_ii["end_time"] != tools_return[idx]["end_time"]:
-                                table_statistics.loc[0,  'Incorrect Information of Inner-City Transporton on price, distance, and duration'] = 1
+                                table_statistics.mark('Incorrect Information of Inner-City Transporton on price, distance, and duration')
                                 error_info.append("Incorrect duration infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
                             
                         except:
-                            table_statistics.loc[0,  'Incorrect Duration Information of Inner-City Transport'] = 1
+                            table_statistics.mark('Incorrect Duration Information of Inner-City Transport')
                             error_info.append("Incorrect duration infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
 
 
                         try:
 
                             if abs(trans_ii["price"] - tools_return[idx]["cost"]) > 0.1:
-                                table_statistics.loc[0,  'Incorrect Information of Inner-City Transporton on price, distance, and duration'] = 1
+                                table_statistics.mark('Incorrect Information of Inner-City Transporton on price, distance, and duration')
                                 error_info.append("Incorrect price infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
                         except:
-                            table_statistics.loc[0,  'Incorrect Information of Inner-City Transporton on price, distance, and duration'] = 1
+                            table_statistics.mark('Incorrect Information of Inner-City Transporton on price, distance, and duration')
                             error_info.append("Incorrect price infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
 
                         try:
                             if abs(trans_ii["distance"] - tools_return[idx]["distance"]) > 0.1:
-                                table_statistics.loc[0,  'Incorrect Information of Inner-City Transporton on price, distance, and duration'] = 1
+                                table_statistics.mark('Incorrect Information of Inner-City Transporton on price, distance, and duration')
                                 error_info.append("Incorrect distance infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
                         except:
-                            table_statistics.loc[0,  'Incorrect Information of Inner-City Transporton on price, distance, and duration'] = 1
+                            table_statistics.mark('Incorrect Information of Inner-City Transporton on price, distance, and duration')
                             error_info.append("Incorrect distance infomation of transport {} -> {}".format(source_poi, target_poi) + "  [{}], Tool: [{}]".format(trans_ii, tools_return[idx]))
 
                         if trans_ii['mode'] == 'walk':
                             try:
                                 trans_ii['cost']
                                 if trans_ii['cost']!= 0:
-                                    table_statistics.loc[0,  'Incorrect cost information of Inner-City Transport'] = 1
+                                    table_statistics.mark('Incorrect cost information of Inner-City Transport')
                                     error_info.append("Incorrect cost information of transport {} -> {}".format(source_poi, target_poi) + "  [{}], [cost=0] ".format(trans_ii))
                             except:
-                                table_statistics.loc[0,  'Incorrect cost information of Inner-City Transport'] = 1
+                                table_statistics.mark('Incorrect cost information of Inner-City Transport')
                                 error_info.append("Incorrect cost information of transport {} -> {}".format(source_poi, target_poi) + "  [{}], [cost=0] ".format(trans_ii))
                         elif trans_ii['mode'] == 'taxi':
                             try:
                                 trans_ii['cost']
                                 trans_ii['cars']
                                 if abs(trans_ii['price'] * trans_ii['cars'] - trans_ii['cost']) > .1:
-                                    table_statistics.loc[0,  'Incorrect cost information of Inner-City Transport'] = 1
+                                    table_statistics.mark('Incorrect cost information of Inner-City Transport')
                                     error_info.append("Incorrect cost information of transport {} -> {}".format(source_poi, target_poi) + "  [{}], [cost=price*cars] ".format(trans_ii))
                             except:
-                                table_statistics.loc[0,  'Incorrect cost information of Inner-City Transport'] = 1
+                                table_statistics.mark('Incorrect cost information of Inner-City Transport')
                                 error_info.append("Incorrect cost information of transport {} -> {}".format(source_poi, target_poi) + "  [{}], [cost=price*cars] ".format(trans_ii))
                 else:
-                    table_statistics.loc[0] = [1, 1, 1]
+                    table_statistics.set_all([1, 1, 1])
                     error_info.append("Metro transport should be three-stages, Taxi or walk should be one-stage. {} -> {}".format(source_poi, target_poi))
 
                 # print("passed")
 
     if verbose:
-        if table_statistics.loc[0].sum() == 0:
+        if table_statistics.sum() == 0:
             print("Innercity transport  passed!")
         else:
             print(error_info)
@@ -918,17 +969,17 @@ def Is_time_correct(symbolic_input, plan_json, verbose=False):
     target_city = symbolic_input["target_city"]
 
 
-    table_statistics = pd.DataFrame(columns=['Invalid duration information of each activity', 'Does not follow Chronological Order'])
+    table_statistics = CheckResult(['Invalid duration information of each activity', 'Does not follow Chronological Order'])
 
     error_info = []    
     try: 
         plan_json["itinerary"]
     except: 
-        table_statistics.loc[0] = [1, 1]
+        table_statistics.set_all([1, 1])
         error_info = ["Error plan type, must be python dict"]
         return table_statistics, error_info
 
-    table_statistics.loc[0] = [0, 0]
+    table_statistics.set_all([0, 0])
 
     plan = plan_json["itinerary"]
     for day_plan_i in plan:
@@ -937,7 +988,7 @@ def Is_time_correct(symbolic_input, plan_json, verbose=False):
             # print(activity_i)
             try: activity_i["start_time"] and activity_i["end_time"]
             except: 
-                table_statistics.loc[0, 'Invalid duration information of each activity'] = 1
+                table_statistics.mark('Invalid duration information of each activity')
                 error_info = ["Activity should provide start_time and end_time"]
                 return table_statistics, error_info
     
@@ -945,7 +996,7 @@ def Is_time_correct(symbolic_input, plan_json, verbose=False):
             activity_ed_time = activity_i["end_time"]
 
             if time2real(activity_st_time) >= time2real(activity_ed_time) and (not activity_i["type"] in ["train", "airplane"]): # 可能出现次日到达
-                table_statistics.loc[0, 'Does not follow Chronological Order'] = 1
+                table_statistics.mark('Does not follow Chronological Order')
                 error_info.append("Activities must cost time: " + str(activity_i))
             
 
@@ -958,13 +1009,13 @@ def Is_time_correct(symbolic_input, plan_json, verbose=False):
             
                 if time2real(activity_st_time) < time2real(transport_ed_time):
 
-                    table_statistics.loc[0, 'Does not follow Chronological Order'] = 1
+                    table_statistics.mark('Does not follow Chronological Order')
                     error_info.append("Must arrive at the location before starting the activity: " + str(activity_i))
 
             
 
     if verbose:
-        if table_statistics.loc[0].sum() == 0:
+        if table_statistics.sum() == 0:
             print("Time passed!")
         else:
             print(error_info)
@@ -979,17 +1030,17 @@ def Is_space_correct(symbolic_input, plan_json, verbose=False):
     target_city = symbolic_input["target_city"]
 
 
-    table_statistics = pd.DataFrame(columns=['Invalid Transport information across positions'])
+    table_statistics = CheckResult(['Invalid Transport information across positions'])
 
     error_info = []    
     try: 
         plan_json["itinerary"]
     except: 
-        table_statistics.loc[0] = [1]
+        table_statistics.set_all([1])
         error_info = ["Error plan type, must be python dict"]
         return table_statistics, error_info
 
-    table_statistics.loc[0] = [0]
+    table_statistics.set_all([0])
 
     plan = plan_json["itinerary"]
     
@@ -1002,7 +1053,7 @@ def Is_space_correct(symbolic_input, plan_json, verbose=False):
                 if "start" in activity_i:
                     current_position = activity_i["start"]
                 else:
-                    table_statistics.loc[0, 'Invalid Transport information across positions'] = 1
+                    table_statistics.mark('Invalid Transport information across positions')
                     error_info.append("Every activity need a position key: ".format(activity_i))
                     continue
 
@@ -1011,7 +1062,7 @@ def Is_space_correct(symbolic_input, plan_json, verbose=False):
                 
             if not "transports" in activity_i:
                 # print(activity_i)
-                table_statistics.loc[0, 'Invalid Transport information across positions'] = 1
+                table_statistics.mark('Invalid Transport information across positions')
                 error_info.append("Need trasnports: ".format(activity_i))
 
             # try: activity_i["position"] and activity_i["transports"]
@@ -1024,26 +1075,26 @@ def Is_space_correct(symbolic_input, plan_json, verbose=False):
             if (len(position_list) > 0) and position_i != position_list[-1]:
 
                 if not "transports" in activity_i:
-                    table_statistics.loc[0, 'Invalid Transport information across positions'] = 1
+                    table_statistics.mark('Invalid Transport information across positions')
                     error_info.append("There must be transport between activities in different possitions: " + str(activity_i))
                     # continue
 
                 elif (len(activity_i["transports"]) < 1):
 
-                    table_statistics.loc[0, 'Invalid Transport information across positions'] = 1
+                    table_statistics.mark('Invalid Transport information across positions')
                     error_info.append("There must be transport between activities in different possitions: " + str(activity_i))
                     # continue
 
                 else:
                     if activity_i["transports"][0]["start"] != position_list[-1]:
 
-                        table_statistics.loc[0, 'Invalid Transport information across positions'] = 1
+                        table_statistics.mark('Invalid Transport information across positions')
                         error_info.append("The origin of the transport must be equal to the position of the previous activity.: " + str(activity_i))
                         # continue
 
                     if activity_i["transports"][-1]["end"] != position_i:
 
-                        table_statistics.loc[0, 'Invalid Transport information across positions'] = 1
+                        table_statistics.mark('Invalid Transport information across positions')
                         error_info.append("The destination of the transport must be equal to the position of the current activity.: " + str(activity_i))
                         # continue
 
@@ -1058,7 +1109,7 @@ def Is_space_correct(symbolic_input, plan_json, verbose=False):
 
 
     if verbose:
-        if table_statistics.loc[0].sum() == 0:
+        if table_statistics.sum() == 0:
             print("Space passed!")
         else:
             print(error_info)
@@ -1076,7 +1127,7 @@ def func_commonsense_constraints(symbolic_input, plan_json, verbose=False):
     for func in func_list:
         table_res, error_info = func(symbolic_input, plan_json, verbose=verbose)
         
-        if table_res.iloc[0].sum() > 0:
+        if table_res.sum() > 0:
             succ_flag = False
         error_list.append(error_info)
             
@@ -1091,6 +1142,179 @@ def func_commonsense_constraints(symbolic_input, plan_json, verbose=False):
             print(err_info)
 
     return succ_flag            
+
+
+ACTIVITY_CHECKS = [Is_attractions_correct, Is_hotels_correct, Is_restaurants_correct, Is_transport_correct, Is_time_correct, Is_space_correct]
+
+
+def check_activity(symbolic_input, activity, previous_position=None):
+    """
+    Violations of the commonsense constraints that only depend on the activity
+    itself and on the position before it. It runs the Is_*_correct checks
+    on a plan made of the activity alone, after a placeholder activity at
+    previous_position for Is_space_correct.
+    Return (number of violations, error_info).
+    """
+    violations = 0
+    error_list = []
+    single_plan = {"itinerary": [{"day": 1, "activities": [activity]}]}
+    for func in ACTIVITY_CHECKS:
+        if func is Is_space_correct and previous_position is not None:
+            plan_json = {"itinerary": [{"day": 1, "activities": [{"position": previous_position, "transports": []}, activity]}]}
+        else:
+            plan_json = single_plan
+        table_res, error_info = func(symbolic_input, plan_json, verbose=False)
+        violations += table_res.sum()
+        error_list.extend(error_info)
+    return violations, error_list
+
+
+class IncrementalCommonsense:
+    """
+    Commonsense verifier of the plans of one query that the search builds by
+    appending and popping activities. push() checks the new activity against
+    the position before it and adds it to the running state (violations,
+    visited attractions and restaurants, hotels), pop() removes the last one,
+    so a check of a complete plan only verifies the activities that changed
+    since the last one, and does not query the tools again for the others.
+
+    check() gives the same verdict as func_commonsense_constraints: the checks
+    are the same Is_*_correct functions, applied to one activity, and the
+    constraints across activities (intercity transports, repeated
+    attractions and restaurants, required hotel) are kept in the running
+    state.
+    """
+
+    def __init__(self, symbolic_input):
+        self.symbolic_input = symbolic_input
+        self.activities = []
+        # per activity: (violations, error_info, attraction, restaurant, hotel, position after it)
+        self.entries = []
+        self.violations = 0
+        self.attraction_count = {}
+        self.restaurant_count = {}
+        self.repeated = 0
+        self.hotels = 0
+        self.intercity_results = {}
+
+    def position(self):
+        return self.entries[-1][5] if self.entries else None
+
+    def push(self, activity):
+        previous_position = self.position()
+        violations, error_info = check_activity(self.symbolic_input, activity, previous_position)
+
+        # what the whole-plan checks collect for their repetition and hotel
+        # rules; an activity that fails fails the plan anyway
+        attraction, restaurant, hotel = None, None, False
+        if violations == 0:
+            activity_type = activity.get("type")
+            if activity_type == "attraction":
+                attraction = activity["position"]
+            elif activity_type in ["breakfast", "lunch", "dinner"]:
+                # breakfast in the hotel is not a restaurant choice
+                if not restaurants.get_by_name(self.symbolic_input["target_city"], activity["position"]).empty:
+                    restaurant = activity["position"]
+            elif activity_type == "accommodation":
+                hotel = True
+
+        if "position" in activity:
+            position = activity["position"]
+        elif "start" in activity:
+            position = activity["end"]
+        else:
+            position = previous_position
+
+        # a snapshot: the search may change the activity after the check
+        self.activities.append(copy.deepcopy(activity))
+        self.entries.append((violations, error_info, attraction, restaurant, hotel, position))
+        self.violations += violations
+        self._count(self.attraction_count, attraction, 1)
+        self._count(self.restaurant_count, restaurant, 1)
+        self.hotels += hotel
+
+    def pop(self):
+        self.activities.pop()
+        violations, _, attraction, restaurant, hotel, _ = self.entries.pop()
+        self.violations -= violations
+        self._count(self.attraction_count, attraction, -1)
+        self._count(self.restaurant_count, restaurant, -1)
+        self.hotels -= hotel
+
+    def _count(self, counter, name, step):
+        if name is None:
+            return
+        count = counter.get(name, 0)
+        if step > 0 and count >= 1:
+            self.repeated += 1
+        elif step < 0 and count >= 2:
+            self.repeated -= 1
+        if count + step == 0:
+            del counter[name]
+        else:
+            counter[name] = count + step
+
+    def sync(self, plan_json):
+        """
+        Pop and push activities until the state is the one of the itinerary
+        of plan_json. Activities are matched in order, by equality with the
+        snapshot taken when they were checked, so copies of the plan keep
+        their checked prefix and an activity changed in place is checked
+        again.
+        """
+        activities = [activity for day_plan_i in plan_json["itinerary"] for activity in day_plan_i["activities"]]
+        common = 0
+        for old, new in zip(self.activities, activities):
+            if old != new:
+                break
+            common += 1
+        while len(self.activities) > common:
+            self.pop()
+        for activity in activities[common:]:
+            self.push(activity)
+
+    def intercity_result(self, plan_json):
+        """
+        Is_intercity_transport_correct only reads the first and the last
+        activity of the trip, so its result is kept for each pair of them.
+        """
+        plan = plan_json["itinerary"]
+        if len(plan) == 0 or len(plan[0]["activities"]) == 0 or len(plan[-1]["activities"]) == 0:
+            return Is_intercity_transport_correct(self.symbolic_input, plan_json)
+        go, back = plan[0]["activities"][0], plan[-1]["activities"][-1]
+        key = json.dumps(
+            [{k: v for k, v in activity.items() if k != "transports"} for activity in [go, back]],
+            sort_keys=True, ensure_ascii=False, default=str)
+        if key not in self.intercity_results:
+            self.intercity_results[key] = Is_intercity_transport_correct(
+                self.symbolic_input, {"itinerary": [{"day": 1, "activities": [go]}, {"day": 2, "activities": [back]}]})
+        return self.intercity_results[key]
+
+    def check(self, plan_json, verbose=False):
+        if not isinstance(plan_json, dict) or "itinerary" not in plan_json:
+            return func_commonsense_constraints(self.symbolic_input, plan_json, verbose=verbose)
+
+        self.sync(plan_json)
+
+        table_res, error_info = self.intercity_result(plan_json)
+        succ_flag = table_res.sum() == 0 and self.violations == 0 and self.repeated == 0
+        if len(plan_json["itinerary"]) > 1 and self.hotels == 0:
+            succ_flag = False
+
+        if verbose:
+            if succ_flag:
+                print("Commonsense constraints passed!")
+            else:
+                print("Commonsense constraints failed!")
+                print(error_info)
+                for entry in self.entries:
+                    if entry[0] > 0:
+                        print(entry[1])
+                if self.repeated > 0:
+                    print("Attraction and restaurant choices should not be repeated throughout the trip.")
+                if len(plan_json["itinerary"]) > 1 and self.hotels == 0:
+                    print("We need a hotel for a trip more than one day.")
+        return succ_flag
     
     
     
@@ -1127,7 +1351,7 @@ def evaluate_commonsense_constraints(data_index, symbolic_input_dict, plan_json_
                 if colum_i not in result_agg.columns:
                     result_agg[colum_i] = 0
 
-                result_agg.loc[ii, colum_i] = table_res[colum_i].loc[0]
+                result_agg.loc[ii, colum_i] = table_res[colum_i]
 
             # print(info)
         if result_agg.loc[ii][1:].sum() == 0:
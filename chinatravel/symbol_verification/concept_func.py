@@ -1,6 +1,6 @@
-from chinatravel.environment.tools.accommodations.apis import Accommodations
-from chinatravel.environment.tools.restaurants.apis import Restaurants
-from chinatravel.environment.tools.attractions.apis import Attractions
+from functools import lru_cache
+
+from chinatravel.environment.tools.registry import get_tool
 
 
 def day_count(plan):
@@ -85,16 +85,13 @@ def activity_time(activity):
 
 
 def poi_recommend_time(city, poi):
-    select = Attractions().select
-    attrction_info = select(city, key="name", func=lambda x: x == poi).iloc[0]
+    attrction_info = get_tool("attractions").get_by_name(city, poi).iloc[0]
     recommend_time = (attrction_info["recommendmintime"]) * 60
     return recommend_time
 
 
 def poi_distance(city, poi1, poi2, start_time="00:00", transport_type="walk"):
-    from chinatravel.environment.tools.transportation.apis import Transportation
-
-    goto = Transportation().goto
+    goto = get_tool("transportation").goto
     return goto(city, poi1, poi2, start_time, transport_type)[0]["distance"]
 
 
@@ -170,11 +167,9 @@ def room_type(activity):
 
 
 def restaurant_type(activity, target_city):
-    from chinatravel.environment.tools.restaurants.apis import Restaurants
-
-    restaurants = Restaurants()
-    select_food_type = restaurants.select(
-        target_city, key="name", func=lambda x: x == activity["position"]
+    restaurants = get_tool("restaurants")
+    select_food_type = restaurants.get_by_name(
+        target_city, activity["position"]
     )["cuisine"]
     if not select_food_type.empty:
         return select_food_type.iloc[0]
@@ -182,11 +177,9 @@ def restaurant_type(activity, target_city):
 
 
 def attraction_type(activity, target_city):
-    from chinatravel.environment.tools.attractions.apis import Attractions
-
-    attractions = Attractions()
-    select_attr_type = attractions.select(
-        target_city, key="name", func=lambda x: x == activity["position"]
+    attractions = get_tool("attractions")
+    select_attr_type = attractions.get_by_name(
+        target_city, activity["position"]
     )["type"]
     if not select_attr_type.empty:
         return select_attr_type.iloc[0]
@@ -194,11 +187,9 @@ def attraction_type(activity, target_city):
 
 
 def accommodation_type(activity, target_city):
-    from chinatravel.environment.tools.accommodations.apis import Accommodations
-
-    accommodations = Accommodations()
-    select_hotel_type = accommodations.select(
-        target_city, key="name", func=lambda x: x == activity["position"]
+    accommodations = get_tool("accommodations")
+    select_hotel_type = accommodations.get_by_name(
+        target_city, activity["position"]
     )["featurehoteltype"]
     if not select_hotel_type.empty:
         return select_hotel_type.iloc[0]
@@ -277,3 +268,13 @@ func_dict = {
     "intercity_transport_destination": intercity_transport_destination, 
     "innercity_transport_time": innercity_transport_time,
 }
+
+
+@lru_cache(maxsize=4096)
+def compile_concept_code(source):
+    """
+    Code object of a hard_logic_py constraint or a preference snippet,
+    compiled once per source string. Run it with exec() in a namespace made
+    by dict(func_dict); the functions are shared, so no deep copy is needed.
+    """
+    return compile(source, "<string>", "exec")
@@ -1,22 +1,20 @@
 import sys
 import os
 
-from chinatravel.environment.tools.accommodations.apis import Accommodations
-from chinatravel.environment.tools.restaurants.apis import Restaurants
-from chinatravel.environment.tools.attractions.apis import Attractions
-from chinatravel.environment.tools.intercity_transport.apis import IntercityTransport
-from chinatravel.environment.tools.transportation.apis import Transportation
+from chinatravel.environment.tools.registry import get_tool
 
-from chinatravel.symbol_verification.concept_func import func_dict
+from chinatravel.symbol_verification.concept_func import (
+    func_dict,
+    compile_concept_code,
+)
 from chinatravel.evaluation.utils import load_json_file
 
 import pandas as pd
 
-from copy import deepcopy
 
-accommodation = Accommodations()
-restaurants = Restaurants()
-attractions = Attractions()
+accommodation = get_tool("accommodations")
+restaurants = get_tool("restaurants")
+attractions = get_tool("attractions")
 
 
 def calc_cost_from_itinerary_wo_intercity(itinerary, people_number):
@@ -184,8 +182,8 @@ def get_symbolic_concepts(symbolic_input, plan_json, need_ood=False):
                 or activity["type"] == "lunch"
                 or activity["type"] == "dinner"
             ):
-                select_food_type = restaurants.select(
-                    target_city, key="name", func=lambda x: x == activity["position"]
+                select_food_type = restaurants.get_by_name(
+                    target_city, activity["position"]
                 )["cuisine"]
                 if not select_food_type.empty:
                     food_type.add(select_food_type.iloc[0])
@@ -198,8 +196,8 @@ def get_symbolic_concepts(symbolic_input, plan_json, need_ood=False):
                     missing_cost = True
 
             if activity["type"] == "accommodation":
-                select_hotel_type = accommodation.select(
-                    target_city, key="name", func=lambda x: x == activity["position"]
+                select_hotel_type = accommodation.get_by_name(
+                    target_city, activity["position"]
                 )["featurehoteltype"]
                 if not select_hotel_type.empty:
                     hotel_feature.add(select_hotel_type.iloc[0])
@@ -218,8 +216,8 @@ def get_symbolic_concepts(symbolic_input, plan_json, need_ood=False):
                 room_types_list.append(room_type)
 
             if activity["type"] == "attraction":
-                select_attraction_type = attractions.select(
-                    target_city, key="name", func=lambda x: x == activity["position"]
+                select_attraction_type = attractions.get_by_name(
+                    target_city, activity["position"]
                 )["type"]
                 if not select_attraction_type.empty:
                     spot_type.add(select_attraction_type.iloc[0])
@@ -417,14 +415,14 @@ for activity in allactivities(plan):
 """
     # hard_logic_py.append(debug_logic_py)
     for constraint in hard_logic_py:
-        vars_dict = deepcopy(func_dict)
+        vars_dict = dict(func_dict)
         vars_dict["plan"] = plan
         # exec(constraint, {"__builtins__": {"set": set, "print": print}}, vars_dict)
         # results.append(vars_dict.get("result", False))
         try:
             # Evaluate the constraint in a safe manner
             exec(
-                constraint,
+                compile_concept_code(constraint),
                 {
                     "__builtins__": {
                         "set": set,
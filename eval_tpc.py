@@ -19,6 +19,7 @@ from chinatravel.evaluation.schema_constraint import evaluate_schema_constraints
 from chinatravel.evaluation.commonsense_constraint import evaluate_commonsense_constraints
 from chinatravel.evaluation.hard_constraint import evaluate_hard_constraints, evaluate_hard_constraints_v2
 from chinatravel.evaluation.preference import evaluate_preference, evaluate_preference_v2
+from chinatravel.evaluation.parallel import create_pool
 
 
 
@@ -150,6 +151,9 @@ if __name__ == "__main__":
         "--method", "-m", type=str, default="travel_agent"
     )  # , choices=METHOD_LIST)
     parser.add_argument("--preference", "-p", action="store_true", default=False)
+    parser.add_argument(
+        "--workers", "-w", type=int, default=1, help="number of evaluation processes"
+    )
     args = parser.parse_args()
 
     # print(args.splits)
@@ -165,6 +169,9 @@ if __name__ == "__main__":
 
 
     scores = {}
+    # the queries are sharded across worker processes if --workers > 1
+    pool = create_pool(args.workers)
+
     for method in method_list:
 
 
@@ -181,7 +188,7 @@ if __name__ == "__main__":
         # print("Schema Pass Rate:", schema_rate)
 
         macro_comm, micro_comm, common_result_agg, commonsense_pass_id = evaluate_commonsense_constraints(
-            query_index, query_data, result_data[method], verbose=False
+            query_index, query_data, result_data[method], verbose=False, pool=pool
         )
 
         # print("Commonsense constraints:")
@@ -192,7 +199,7 @@ if __name__ == "__main__":
 
         # print("Logical constraints (python version):")
         macro_logi, micro_logi, conditional_macro_logi, conditional_micro_logi, logi_result_agg, logi_pass_id = evaluate_hard_constraints_v2(
-            query_index, query_data, result_data[method], env_pass_id=commonsense_pass_id, verbose=False
+            query_index, query_data, result_data[method], env_pass_id=commonsense_pass_id, verbose=False, pool=pool
         )
 
 
@@ -231,5 +238,9 @@ if __name__ == "__main__":
                 query_data,
                 result_data[method],
                 list(set(commonsense_pass_id) & set(logi_pass_id)),
+                pool=pool,
             )
 
+    if pool is not None:
+        pool.close()
+        pool.join()
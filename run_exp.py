@@ -15,6 +15,63 @@ from copy import deepcopy
 from chinatravel.data.load_datasets import load_query, save_json_file
 from chinatravel.agent.load_model import init_agent, init_llm
 from chinatravel.environment.world_env import WorldEnv
+from chinatravel.agent.parallel import create_pool, map_queries
+from chinatravel.agent.utils import close_query_log
+
+
+def build_agent(args, cache_dir, log_dir):
+    if args.agent in ["LLM-modulo"]:
+        max_model_len = 65536
+    elif args.agent in ["LLMNeSy"]:
+        max_model_len = 8192
+    else:
+        max_model_len = None
+    kwargs = {
+        "method": args.agent,
+        "env": WorldEnv(),
+        "backbone_llm": init_llm(args.llm, max_model_len=max_model_len),
+        "cache_dir": cache_dir,
+        "log_dir": log_dir, 
+        "debug": True,
+        "refine_steps": args.refine_steps,
+    }
+    return init_agent(kwargs)
+
+
+def solve_query(agent, args, data_idx, query_i, res_dir, log_dir):
+    """
+    Solve one query and save its plan. Returns whether it succeeded.
+    """
+    if args.agent in ["ReAct", "ReAct0", "Act"]:
+        plan_log = agent(query_i["nature_language"])
+        plan = plan_log["ans"]
+        if isinstance(plan, str):
+            try:
+                plan = json.loads(plan)
+            except:
+                plan = {"plan": plan}
+        plan["input_token_count"] = agent.backbone_llm.input_token_count
+        plan["output_token_count"] = agent.backbone_llm.output_token_count
+        plan["input_token_maxx"] = agent.backbone_llm.input_token_maxx
+        log = plan_log["log"]
+        save_json_file(
+            json_data=log, file_path=os.path.join(log_dir, f"{data_idx}.json")
+        )
+        succ = 1
+    elif args.agent in ["LLM-modulo"]:
+        
+        succ, plan = agent.solve(query_i, prob_idx=data_idx, oracle_verifier=True)
+
+    elif args.agent in ["LLMNeSy", "RuleNeSy"]:
+        succ, plan = agent.run(query_i, load_cache=True, oralce_translation=args.oracle_translation, preference_search=args.preference_search)
+    
+    elif args.agent == "TPCAgent":
+        succ, plan = agent.run(query_i, prob_idx=data_idx, oralce_translation=args.oracle_translation)
+
+    save_json_file(
+        json_data=plan, file_path=os.path.join(res_dir, f"{data_idx}.json")
+    )
+    return succ
 
 
 if __name__ == "__main__":
@@ -49,6 +106,13 @@ if __name__ == "__main__":
     parser.add_argument('--oracle_translation', action='store_true', help='Set this flag to enable oracle translation.')
     parser.add_argument('--preference_search', action='store_true', help='Set this flag to enable preference search.')
     parser.add_argument('--refine_steps', type=int, default=10, help='Steps for refine-based method, such as LLM-modulo, Reflection')
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="number of worker processes solving queries in parallel",
+    )
     
 
     args = parser.parse_args()
@@ -89,27 +153,16 @@ if __name__ == "__main__":
     print("res_dir: ", res_dir)
     print("log_dir:", log_dir)
 
-    if args.agent in ["LLM-modulo"]:
-        max_model_len = 65536
-    elif args.agent in ["LLMNeSy"]:
-        max_model_len = 8192
-    else:
-        max_model_len = None
-    kwargs = {
-        "method": args.agent,
-        "env": WorldEnv(),
-        "backbone_llm": init_llm(args.llm, max_model_len=max_model_len),
-        "cache_dir": cache_dir,
-        "log_dir": log_dir, 
-        "debug": True,
-        "refine_steps": args.refine_steps,
-    }
-    agent = init_agent(kwargs)
+    # with several workers, each of them builds its own agent
+    pool = create_pool(args.workers, build_agent, (args, cache_dir, log_dir))
+    if pool is None:
+        agent = build_agent(args, cache_dir, log_dir)
 
 
     white_list = []
 
     succ_count, eval_count = 0, 0
+    jobs = {}
 
     for i, data_idx in enumerate(query_index):
         if (args.restart_from is not None) and (data_idx != args.restart_from):
@@ -117,51 +170,41 @@ if __name__ == "__main__":
         else:
             args.restart_from = None
 
-        sys.stdout = sys.__stdout__
-        print("------------------------------")
-        print(
-            "Process [{}/{}], Success [{}/{}]:".format(
-                i, len(query_index), succ_count, eval_count
+        if pool is None:
+            print("------------------------------")
+            print(
+                "Process [{}/{}], Success [{}/{}]:".format(
+                    i, len(query_index), succ_count, eval_count
+                )
             )
-        )
-        print("data uid: ", data_idx)
+            print("data uid: ", data_idx)
 
         if args.skip and os.path.exists(os.path.join(res_dir, f"{data_idx}.json")):
             continue
         if i in white_list:
             continue
-        eval_count += 1
         query_i = query_data[data_idx]
+        if pool is not None:
+            jobs[data_idx] = (args, data_idx, query_i, res_dir, log_dir)
+            continue
+        eval_count += 1
         print(query_i)
-        if args.agent in ["ReAct", "ReAct0", "Act"]:
-            plan_log = agent(query_i["nature_language"])
-            plan = plan_log["ans"]
-            if isinstance(plan, str):
-                try:
-                    plan = json.loads(plan)
-                except:
-                    plan = {"plan": plan}
-            plan["input_token_count"] = agent.backbone_llm.input_token_count
-            plan["output_token_count"] = agent.backbone_llm.output_token_count
-            plan["input_token_maxx"] = agent.backbone_llm.input_token_maxx
-            log = plan_log["log"]
-            save_json_file(
-                json_data=log, file_path=os.path.join(log_dir, f"{data_idx}.json")
-            )
-            succ = 1
-        elif args.agent in ["LLM-modulo"]:
-            
-            succ, plan = agent.solve(query_i, prob_idx=data_idx, oracle_verifier=True)
-
-        elif args.agent in ["LLMNeSy", "RuleNeSy"]:
-            succ, plan = agent.run(query_i, load_cache=True, oralce_translation=args.oracle_translation, preference_search=args.preference_search)
-        
-        elif args.agent == "TPCAgent":
-            succ, plan = agent.run(query_i, prob_idx=data_idx, oralce_translation=args.oracle_translation)
+        succ = solve_query(agent, args, data_idx, query_i, res_dir, log_dir)
+        close_query_log(getattr(agent, "log", None))
 
         if succ:
             succ_count += 1
 
-        save_json_file(
-            json_data=plan, file_path=os.path.join(res_dir, f"{data_idx}.json")
-        )
+    if pool is not None:
+        print(len(jobs), "queries to solve with", args.workers, "workers")
+        for data_idx, succ in map_queries(solve_query, jobs, pool):
+            eval_count += 1
+            if succ:
+                succ_count += 1
+            print(
+                "Done [{}/{}], Success [{}/{}]: {}".format(
+                    eval_count, len(jobs), succ_count, eval_count, data_idx
+                )
+            )
+        pool.close()
+        pool.join()
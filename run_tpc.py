@@ -16,6 +16,49 @@ from copy import deepcopy
 from chinatravel.data.load_datasets import load_query, save_json_file
 from chinatravel.agent.load_model import init_agent, init_llm
 from chinatravel.environment.world_env import WorldEnv
+from chinatravel.agent.parallel import create_pool, map_queries
+from chinatravel.agent.utils import close_query_log
+
+
+def build_agent(args, cache_dir, log_dir):
+    kwargs = {
+        "method": args.agent,
+        "env": WorldEnv(),
+        "backbone_llm": init_llm(args.llm),
+        "cache_dir": cache_dir,
+        "log_dir": log_dir, 
+        "debug": True,
+    }
+    return init_agent(kwargs)
+
+
+def solve_query(agent, args, data_idx, query_i, res_dir, log_dir):
+    """
+    Solve one query within args.timeout and save its plan. Returns whether it
+    succeeded.
+    """
+    try:
+        # succ, plan = agent.run(query_i, prob_idx=data_idx, oralce_translation=args.oracle_translation)
+        succ, plan = func_timeout(
+            args.timeout,
+            agent.run,
+            args=(query_i,),
+            kwargs=dict(
+                prob_idx=data_idx, oralce_translation=args.oracle_translation
+            ),
+        )
+    except FunctionTimedOut:
+        # print(f"⚠️ 任务 {data_idx} 超过 {args.timeout}s 被中断。")
+        succ, plan = 0, {"error": f"timeout after {args.timeout}s"}
+
+    except Exception as e:
+        # print(f"❌ 执行任务 {data_idx} 出错: {e}")
+        succ, plan = 0, {"error": str(e)}
+
+    save_json_file(
+        json_data=plan, file_path=os.path.join(res_dir, f"{data_idx}.json")
+    )
+    return succ
 
 
 if __name__ == "__main__":
@@ -52,6 +95,13 @@ if __name__ == "__main__":
         default=300,
         help="Timeout in seconds for each query",
     )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="number of worker processes solving queries in parallel",
+    )
 
     parser.add_argument('--oracle_translation', action='store_true', help='Set this flag to enable oracle translation.')
 
@@ -91,55 +141,49 @@ if __name__ == "__main__":
     print("res_dir: ", res_dir)
     print("log_dir:", log_dir)
 
-    kwargs = {
-        "method": args.agent,
-        "env": WorldEnv(),
-        "backbone_llm": init_llm(args.llm),
-        "cache_dir": cache_dir,
-        "log_dir": log_dir, 
-        "debug": True,
-    }
-    agent = init_agent(kwargs)
+    # with several workers, each of them builds its own agent
+    pool = create_pool(args.workers, build_agent, (args, cache_dir, log_dir))
+    if pool is None:
+        agent = build_agent(args, cache_dir, log_dir)
 
     succ_count, eval_count = 0, 0
+    jobs = {}
 
     for i, data_idx in enumerate(query_index):
 
-        sys.stdout = sys.__stdout__
-        print("------------------------------")
-        print(
-            "Process [{}/{}], Success [{}/{}]:".format(
-                i, len(query_index), succ_count, eval_count
+        if pool is None:
+            print("------------------------------")
+            print(
+                "Process [{}/{}], Success [{}/{}]:".format(
+                    i, len(query_index), succ_count, eval_count
+                )
             )
-        )
-        print("data uid: ", data_idx)
+            print("data uid: ", data_idx)
 
         if args.skip and os.path.exists(os.path.join(res_dir, f"{data_idx}.json")):
             continue
-        eval_count += 1
         query_i = query_data[data_idx]
+        if pool is not None:
+            jobs[data_idx] = (args, data_idx, query_i, res_dir, log_dir)
+            continue
+        eval_count += 1
         print(query_i)
-        try:
-            # succ, plan = agent.run(query_i, prob_idx=data_idx, oralce_translation=args.oracle_translation)
-            succ, plan = func_timeout(
-                args.timeout,
-                agent.run,
-                args=(query_i,),
-                kwargs=dict(
-                    prob_idx=data_idx, oralce_translation=args.oracle_translation
-                ),
-            )
-        except FunctionTimedOut:
-            # print(f"⚠️ 任务 {data_idx} 超过 {args.timeout}s 被中断。")
-            succ, plan = 0, {"error": f"timeout after {args.timeout}s"}
-
-        except Exception as e:
-            # print(f"❌ 执行任务 {data_idx} 出错: {e}")
-            succ, plan = 0, {"error": str(e)}
+        succ = solve_query(agent, args, data_idx, query_i, res_dir, log_dir)
+        close_query_log(agent.log)
 
         if succ:
             succ_count += 1
 
-        save_json_file(
-            json_data=plan, file_path=os.path.join(res_dir, f"{data_idx}.json")
-        )
+    if pool is not None:
+        print(len(jobs), "queries to solve with", args.workers, "workers")
+        for data_idx, succ in map_queries(solve_query, jobs, pool):
+            eval_count += 1
+            if succ:
+                succ_count += 1
+            print(
+                "Done [{}/{}], Success [{}/{}]: {}".format(
+                    eval_count, len(jobs), succ_count, eval_count, data_idx
+                )
+            )
+        pool.close()
+        pool.join()